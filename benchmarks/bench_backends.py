@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_backends.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Twisted vs asyncio command server backends, side by side.
+
+Starts both backends in one process with an actor that finishes every command
+immediately, then measures for each: lock-step round-trip latency, and
+throughput with --window commands pipelined per write. The asyncio backend uses
+uvloop if it is installed, unless --no-uvloop is given.
+
+    python benchmarks/bench_backends.py -n 10000
+
+"""
+
+import argparse
+import socket
+import statistics
+import time
+
+from twisted.internet import reactor
+
+from actorcore import AsyncCommandLink
+from actorcore import Command as actorCmd
+from actorcore import CommandLinkManager as cmdLinkManager
+
+
+class DummyActor(object):
+    """Finishes every command as soon as it arrives."""
+
+    def newCmd(self, cmd):
+        cmd.finish("")
+
+
+class Client(object):
+    def __init__(self, port):
+        self.sock = socket.create_connection(("localhost", port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buf = b""
+        self.mid = 0
+        self.waitForFinished(1)  # yourUserNum
+
+    def waitForFinished(self, n):
+        seen = 0
+        while seen < n:
+            data = self.sock.recv(1 << 16)
+            if not data:
+                raise RuntimeError("connection closed")
+            lines = (self.buf + data).split(b"\n")
+            self.buf = lines.pop()
+            seen += sum(1 for line in lines if line.split(b" ", 3)[2:3] == [b":"])
+
+    def send(self, n):
+        mids = range(self.mid + 1, self.mid + n + 1)
+        self.mid += n
+        self.sock.sendall(b"".join(b"%d ping\n" % (mid,) for mid in mids))
+
+    def latency(self, nCmds):
+        times = []
+        for _ in range(nCmds):
+            t0 = time.perf_counter()
+            self.send(1)
+            self.waitForFinished(1)
+            times.append(time.perf_counter() - t0)
+        return sorted(times)
+
+    def throughput(self, nCmds, window):
+        t0 = time.perf_counter()
+        for start in range(0, nCmds, window):
+            n = min(window, nCmds - start)
+            self.send(n)
+            self.waitForFinished(n)
+        return nCmds / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--commands", type=int, default=10000)
+    parser.add_argument("--window", type=int, default=100)
+    parser.add_argument("--no-uvloop", action="store_true")
+    opts = parser.parse_args()
+
+    twistedActor = DummyActor()
+    twistedMgr = cmdLinkManager.listen(twistedActor, port=0, interface="localhost")
+    twistedActor.bcast = actorCmd.Command(twistedMgr, "self.0", 0, 0, None, True)
+
+    asyncActor = DummyActor()
+    asyncMgr = AsyncCommandLink.listen(
+        asyncActor, port=0, interface="localhost", useUvloop=not opts.no_uvloop
+    )
+    asyncActor.bcast = actorCmd.Command(asyncMgr, "self.0", 0, 0, None, True)
+
+    ports = [
+        ("twisted", twistedMgr.port.getHost().port),
+        (type(asyncMgr.loop).__module__, asyncMgr.server.sockets[0].getsockname()[1]),
+    ]
+
+    results = []
+
+    def run():
+        try:
+            for name, port in ports:
+                client = Client(port)
+                times = client.latency(opts.commands)
+                rate = client.throughput(opts.commands, opts.window)
+                results.append((name, times, rate))
+        finally:
+            reactor.callFromThread(reactor.stop)
+
+    reactor.callWhenRunning(reactor.callInThread, run)
+    reactor.run()
+    asyncMgr.stop()
+
+    print(
+        "%-20s %10s %10s %10s %14s"
+        % ("backend", "mean us", "p50 us", "p99 us", "pipelined/s")
+    )
+    for name, times, rate in results:
+        print(
+            "%-20s %10.1f %10.1f %10.1f %14.0f"
+            % (
+                name,
+                1e6 * statistics.mean(times),
+                1e6 * times[len(times) // 2],
+                1e6 * times[int(len(times) * 0.99)],
+                rate,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
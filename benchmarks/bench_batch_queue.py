@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_batch_queue.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Moving bursts of Msgs between two threads, with queue.Queue and BatchQueue.
+
+A producer thread sends --msgs Msgs in bursts of --burst to a consumer thread,
+which takes them one at a time (queue.Queue, BatchQueue) or a burst at a time
+(BatchQueue.put_many and get_batch). Prints the time per Msg.
+
+    python benchmarks/bench_batch_queue.py --msgs 200000 --burst 1 10 100
+
+"""
+
+import argparse
+import queue
+import threading
+import time
+
+from actorcore.Actor import Msg
+from actorcore.utility.queues import BatchQueue
+
+
+def oneByOne(q, msgs, burst):
+    def producer():
+        for i in range(0, len(msgs), burst):
+            for msg in msgs[i : i + burst]:
+                q.put(msg)
+
+    def consumer():
+        for _ in range(len(msgs)):
+            q.get()
+
+    return timeThreads(producer, consumer)
+
+
+def batched(q, msgs, burst):
+    def producer():
+        for i in range(0, len(msgs), burst):
+            q.put_many(msgs[i : i + burst])
+
+    def consumer():
+        n = 0
+        while n < len(msgs):
+            n += len(q.get_batch(burst))
+
+    return timeThreads(producer, consumer)
+
+
+def timeThreads(producer, consumer):
+    threads = [threading.Thread(target=consumer), threading.Thread(target=producer)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--msgs", type=int, default=200000)
+    parser.add_argument("--burst", type=int, nargs="+", default=[1, 10, 100])
+    opts = parser.parse_args()
+
+    msgs = [Msg(Msg.DONE, None) for _ in range(opts.msgs)]
+
+    print(
+        "%8s %16s %16s %16s"
+        % ("burst", "Queue us/msg", "BatchQueue us", "get_batch us")
+    )
+    for burst in opts.burst:
+        times = [
+            oneByOne(queue.Queue(), msgs, burst),
+            oneByOne(BatchQueue(), msgs, burst),
+            batched(BatchQueue(), msgs, burst),
+        ]
+        print(
+            "%8d %16.2f %16.2f %16.2f"
+            % ((burst,) + tuple(1e6 * t / len(msgs) for t in times))
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_command_dispatch.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Actor command dispatch throughput, with and without the command cache.
+
+Runs Actor.runActorCmd on a stream of commands drawn from a few polled strings
+(--distinct of them), as an actor sees from the hub, with the validated command
+cache turned off and on.
+
+    python benchmarks/bench_command_dispatch.py -n 20000
+
+"""
+
+import argparse
+import logging
+import time
+
+import opscore.protocols.keys as keys
+import opscore.protocols.types as types
+import opscore.protocols.validation as validation
+
+from actorcore.Actor import Actor
+
+
+COMMANDS = [
+    "status",
+    "ping",
+    "status full",
+    "expose object time=15.0",
+    "expose object time=900.0 window=10,100",
+    "move axis=az position=121.5 speed=2",
+    "move axis=alt position=60.25",
+    "shutter open",
+    "shutter close",
+    "lamps ne=on hgcd=off ff=on",
+]
+
+
+class Cmd(object):
+    """The few bits of actorcore.Command that the dispatch path uses."""
+
+    cmdr = "bench"
+    mid = 1
+
+    def __init__(self, rawCmd):
+        self.rawCmd = rawCmd
+
+    def fail(self, response):
+        raise RuntimeError(response)
+
+    def warn(self, response):
+        pass
+
+    def finish(self, response=""):
+        pass
+
+
+class BenchActor(Actor):
+    """Just the command handling of an Actor, with a fixed vocabulary."""
+
+    def __init__(self, cacheSize):
+        self.logger = logging.getLogger("actor")
+        self.cmdLog = logging.getLogger("cmds")
+        self.initCommandHandling(dict(commandCacheSize=cacheSize, grammarCache=False))
+
+        def done(cmd):
+            cmd.finish()
+
+        for verb, args in (
+            ("status", "[full]"),
+            ("ping", ""),
+            ("expose", "@(object|flat|arc) <time> [<window>]"),
+            ("move", "<axis> <position> [<speed>]"),
+            ("shutter", "@(open|close)"),
+            ("lamps", "[<ne>] [<hgcd>] [<ff>]"),
+        ):
+            self.handler.addConsumers(validation.Cmd(verb, args) >> done)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--commands", type=int, default=20000)
+    parser.add_argument("--distinct", type=int, default=len(COMMANDS))
+    parser.add_argument("--cache-size", type=int, default=256)
+    opts = parser.parse_args()
+
+    onOff = types.Enum("on", "off")
+    keys.CmdKey.addKeys(
+        keys.KeysDictionary(
+            "bench_dispatch",
+            (1, 1),
+            keys.Key("full"),
+            keys.Key("object"),
+            keys.Key("flat"),
+            keys.Key("arc"),
+            keys.Key("open"),
+            keys.Key("close"),
+            keys.Key("time", types.Float()),
+            keys.Key("window", types.Int() * 2),
+            keys.Key("axis", types.String()),
+            keys.Key("position", types.Float()),
+            keys.Key("speed", types.Float()),
+            keys.Key("ne", onOff),
+            keys.Key("hgcd", onOff),
+            keys.Key("ff", onOff),
+        )
+    )
+
+    commands = [Cmd(COMMANDS[i % opts.distinct]) for i in range(opts.commands)]
+
+    print("%-8s %12s %10s %10s" % ("cache", "cmds/s", "hits", "misses"))
+    for cacheSize in 0, opts.cache_size:
+        actor = BenchActor(cacheSize)
+        t0 = time.perf_counter()
+        for cmd in commands:
+            actor.runActorCmd(cmd)
+        rate = len(commands) / (time.perf_counter() - t0)
+        stats = actor.commandCache.stats()
+        print(
+            "%-8s %12.0f %10d %10d"
+            % ("on" if cacheSize else "off", rate, stats["hits"], stats["misses"])
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_command_input.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Command throughput through a real CommandLinkManager socket.
+
+A client thread sends N commands to an actor which finishes each one
+immediately, either one at a time (waiting for the ':' reply before sending the
+next, the only safe mode before CommandLink did its own framing) or pipelined in
+windows of --window commands per write. Reports commands/s for both.
+
+    python benchmarks/bench_command_input.py -n 20000 --window 100
+
+"""
+
+import argparse
+import socket
+import time
+
+from twisted.internet import reactor
+
+from actorcore import Command as actorCmd
+from actorcore import CommandLinkManager as cmdLinkManager
+
+
+class DummyActor(object):
+    """Finishes every command as soon as it arrives."""
+
+    def newCmd(self, cmd):
+        cmd.finish("")
+
+
+def readReplies(sock, buf, nFinished):
+    """Read from sock until nFinished ':' replies are seen. Returns leftover bytes."""
+
+    seen = 0
+    while seen < nFinished:
+        data = sock.recv(1 << 16)
+        if not data:
+            raise RuntimeError("connection closed")
+        buf += data
+        lines = buf.split(b"\n")
+        buf = lines.pop()
+        seen += sum(1 for line in lines if line.split(b" ", 3)[2:3] == [b":"])
+    return buf
+
+
+def runClient(port, nCmds, window):
+    sock = socket.create_connection(("localhost", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    buf = readReplies(sock, b"", 1)  # yourUserNum
+
+    t0 = time.perf_counter()
+    sent = 0
+    while sent < nCmds:
+        n = min(window, nCmds - sent)
+        sock.sendall(
+            b"".join(b"%d status\n" % (mid,) for mid in range(sent + 1, sent + n + 1))
+        )
+        buf = readReplies(sock, buf, n)
+        sent += n
+    dt = time.perf_counter() - t0
+
+    sock.close()
+    return dt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--commands", type=int, default=20000)
+    parser.add_argument("--window", type=int, default=100)
+    opts = parser.parse_args()
+
+    actor = DummyActor()
+    mgr = cmdLinkManager.listen(actor, port=0, interface="localhost")
+    actor.bcast = actorCmd.Command(mgr, "self.0", 0, 0, None, immortal=True)
+    port = mgr.port.getHost().port
+
+    results = []
+
+    def run():
+        try:
+            for window in 1, opts.window:
+                dt = runClient(port, opts.commands, window)
+                results.append((window, dt))
+        finally:
+            reactor.callFromThread(reactor.stop)
+
+    reactor.callWhenRunning(reactor.callInThread, run)
+    reactor.run()
+
+    for window, dt in results:
+        print(
+            "window=%-5d %10.0f cmds/s  (%d commands in %.3fs)"
+            % (window, opts.commands / dt, opts.commands, dt)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_command_match.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Command match latency against vocabulary size.
+
+Builds vocabularies of --verbs verbs, each taking a few keywords, and times
+Actor.matchActorCmd (with the command cache off) on a known verb, on a known
+verb with arguments which do not validate, and on an unknown verb.
+
+    python benchmarks/bench_command_match.py --verbs 10 100 1000
+
+"""
+
+import argparse
+import logging
+import time
+
+import opscore.protocols.keys as keys
+import opscore.protocols.types as types
+import opscore.protocols.validation as validation
+
+from actorcore.Actor import Actor
+
+
+class Cmd(object):
+    """The few bits of actorcore.Command that the match path uses."""
+
+    cmdr = "bench"
+    mid = 1
+
+    def __init__(self, rawCmd):
+        self.rawCmd = rawCmd
+
+    def fail(self, response):
+        pass
+
+
+class BenchActor(Actor):
+    """Just the command matching of an Actor, with nVerbs verbs."""
+
+    def __init__(self, nVerbs):
+        self.logger = logging.getLogger("actor")
+        self.cmdLog = logging.getLogger("cmds")
+        self.initCommandHandling(dict(commandCacheSize=0, grammarCache=False))
+
+        def done(cmd):
+            pass
+
+        for i in range(nVerbs):
+            self.handler.addConsumers(
+                validation.Cmd("verb%d" % (i), "<time> [<window>] [(fast)]") >> done,
+                validation.Cmd("verb%d" % (i), "@(open|close)") >> done,
+            )
+
+
+def timeMatch(actor, cmdStr, n):
+    cmd = Cmd(cmdStr)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        actor.matchActorCmd(cmd)
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--matches", type=int, default=2000)
+    parser.add_argument("--verbs", type=int, nargs="+", default=[10, 100, 1000])
+    opts = parser.parse_args()
+
+    keys.CmdKey.addKeys(
+        keys.KeysDictionary(
+            "bench_match",
+            (1, 1),
+            keys.Key("time", types.Float()),
+            keys.Key("window", types.Int() * 2),
+            keys.Key("fast"),
+            keys.Key("open"),
+            keys.Key("close"),
+        )
+    )
+
+    print("%8s %14s %14s %14s" % ("verbs", "match us", "invalid us", "unknown us"))
+    for nVerbs in opts.verbs:
+        actor = BenchActor(nVerbs)
+        verb = "verb%d" % (nVerbs - 1)
+        print(
+            "%8d %14.1f %14.1f %14.1f"
+            % (
+                nVerbs,
+                1e6 * timeMatch(actor, "%s close" % (verb), opts.matches),
+                1e6 * timeMatch(actor, "%s time=1 speed=2" % (verb), opts.matches),
+                1e6 * timeMatch(actor, "nosuch time=1 window=3,4", opts.matches),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_import_time.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Import time of the main actorcore modules, from python -X importtime.
+
+Imports each module --runs times, each in a new process, and prints the median
+cumulative import time and the slowest modules it pulled in. Exits with status
+1 if a module imports any of the packages which should only be loaded on first
+use (astropy, IPython, actorcore.help), or if, given a --baseline saved earlier
+with --save, its median import time has grown by more than --tolerance.
+
+    python benchmarks/bench_import_time.py --save /tmp/imports.json
+    ... change things ...
+    python benchmarks/bench_import_time.py --baseline /tmp/imports.json
+
+Baselines are only meaningful on the machine and environment they were saved on.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+MODULES = ["actorcore.Actor", "actorcore.ICC", "actorcore.utility.fits"]
+
+# Loaded only when first used; importing any of them is a regression.
+DEFERRED = ["astropy", "IPython", "actorcore.help"]
+
+
+def importTimes(module):
+    """Return {name: (self us, cumulative us)} for one import of module."""
+
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % (module)],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        selfUs, cumulativeUs, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(selfUs), int(cumulativeUs))
+
+    return times
+
+
+def measure(module, runs):
+    totals = []
+    for _ in range(runs):
+        times = importTimes(module)
+        totals.append(times[module][1])
+
+    return statistics.median(totals), times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to list")
+    parser.add_argument("--baseline", help="JSON file of earlier median times")
+    parser.add_argument("--save", help="save the median times to this JSON file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed growth over the baseline, as a fraction",
+    )
+    opts = parser.parse_args()
+
+    baseline = {}
+    if opts.baseline:
+        with open(opts.baseline) as fp:
+            baseline = json.load(fp)
+
+    failures = []
+    medians = {}
+    for module in opts.modules:
+        median, times = measure(module, opts.runs)
+        medians[module] = median
+
+        print("%-28s %9.1f ms" % (module, median / 1e3))
+        slowest = sorted(times.items(), key=lambda t: t[1][0], reverse=True)
+        for name, (selfUs, cumulativeUs) in slowest[: opts.top]:
+            print("    %-40s self %7.1f ms" % (name, selfUs / 1e3))
+
+        for name in DEFERRED:
+            if name in times:
+                failures.append("%s imports %s" % (module, name))
+
+        if module in baseline:
+            limit = baseline[module] * (1 + opts.tolerance)
+            if median > limit:
+                failures.append(
+                    "%s took %0.1f ms to import, more than %0.1f ms (baseline %0.1f ms)"
+                    % (module, median / 1e3, limit / 1e3, baseline[module] / 1e3)
+                )
+
+    if opts.save:
+        with open(opts.save, "w") as fp:
+            json.dump(medians, fp, indent=2)
+
+    for failure in failures:
+        print("FAIL: %s" % (failure))
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_modloader.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Time ModLoader.load_module loading N controller modules from one package.
+
+Writes a package whose __init__ takes --init-ms to run (standing in for the
+imports a real package makes) and N controller modules, then loads each module
+with the cached package (the default) and with reload=True, which re-executes
+the package every time, as load_module used to.
+
+    python benchmarks/bench_modloader.py --controllers 10 50 --init-ms 20
+
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from actorcore.Actor import ModLoader
+
+
+PACKAGE_INIT = """
+import time
+
+time.sleep(%g)
+"""
+
+CONTROLLER = """
+class %s(object):
+    def __init__(self, actor, name):
+        self.name = name
+"""
+
+
+def writePackage(root, pkgName, nControllers, initTime):
+    pkgDir = os.path.join(root, pkgName, "Controllers")
+    os.makedirs(pkgDir)
+    with open(os.path.join(root, pkgName, "__init__.py"), "w") as fp:
+        fp.write(PACKAGE_INIT % (initTime))
+    with open(os.path.join(pkgDir, "__init__.py"), "w") as fp:
+        fp.write(PACKAGE_INIT % (initTime))
+
+    names = ["ctrl%d" % (i) for i in range(nControllers)]
+    for name in names:
+        with open(os.path.join(pkgDir, name + ".py"), "w") as fp:
+            fp.write(CONTROLLER % (name))
+
+    return names
+
+
+def timeLoads(pkgName, names, reload):
+    loader = ModLoader()
+    t0 = time.perf_counter()
+    for name in names:
+        loader.load_module("%s.Controllers.%s" % (pkgName, name), name, reload=reload)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--controllers", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--init-ms", type=float, default=20.0)
+    opts = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    sys.path.insert(0, root)
+
+    print("%12s %14s %14s" % ("controllers", "reload ms", "cached ms"))
+    for nControllers in opts.controllers:
+        pkgName = "benchpkg%d" % (nControllers)
+        names = writePackage(root, pkgName, nControllers, opts.init_ms / 1e3)
+
+        reloaded = timeLoads(pkgName, names, True)
+        cached = timeLoads(pkgName, names, False)
+        print("%12d %14.1f %14.1f" % (nControllers, 1e3 * reloaded, 1e3 * cached))
+
+
+if __name__ == "__main__":
+    main()
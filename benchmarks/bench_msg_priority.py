@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_msg_priority.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""How long a CRITICAL Msg waits behind a backlog of NORMAL ones.
+
+A consumer thread takes Msgs from its queue, spending --work microseconds on
+each. --backlog NORMAL Msgs and then a CRITICAL one are queued, and we time from
+when the consumer starts until it picks up the CRITICAL Msg, with a FIFO
+queue.Queue and with a MsgPriorityQueue.
+
+    python benchmarks/bench_msg_priority.py --backlog 1000 10000
+
+"""
+
+import argparse
+import queue
+import threading
+import time
+
+from actorcore.Actor import Msg
+from actorcore.utility.queues import MsgPriorityQueue
+
+
+def criticalWait(q, backlog, work):
+    """Return how long a CRITICAL Msg waited behind backlog NORMAL ones."""
+
+    go = threading.Event()
+    picked = threading.Event()
+    pickedAt = []
+
+    def consumer():
+        go.wait()
+        while True:
+            msg = q.get()
+            if msg.type == Msg.EXIT:
+                pickedAt.append(time.perf_counter())
+                picked.set()
+                continue
+            if msg.type == Msg.DONE:
+                return
+            end = time.perf_counter() + work
+            while time.perf_counter() < end:
+                pass
+
+    for _ in range(backlog):
+        q.put(Msg(Msg.REPLY, None))
+
+    t = threading.Thread(target=consumer, daemon=True)
+    t.start()
+
+    critical = Msg(Msg.EXIT, None)
+    critical.priority = Msg.CRITICAL
+    q.put(critical)
+
+    # Time from when the consumer starts on the queue.
+    t0 = time.perf_counter()
+    go.set()
+    picked.wait()
+
+    # Stop the consumer without waiting for whatever backlog is left.
+    done = Msg(Msg.DONE, None)
+    done.priority = Msg.CRITICAL
+    q.put(done)
+    t.join()
+
+    return pickedAt[0] - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--backlog", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--work", type=float, default=20, help="us per Msg")
+    opts = parser.parse_args()
+
+    print("%10s %14s %14s" % ("backlog", "fifo ms", "priority ms"))
+    for backlog in opts.backlog:
+        fifo = criticalWait(queue.Queue(), backlog, 1e-6 * opts.work)
+        prio = criticalWait(MsgPriorityQueue("bench"), backlog, 1e-6 * opts.work)
+        print("%10d %14.3f %14.3f" % (backlog, 1e3 * fifo, 1e3 * prio))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_reply_fanout.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Cost of broadcasting replies through CommandLinkManager to 1-16 connections.
+
+Measures the time an actor thread spends in CommandLinkManager.sendResponse,
+with the cmds log at INFO going to /dev/null, for the legacy
+format-log-encode-per-connection loop and for the current encode-once fan-out.
+Output is not flushed, so only the per-reply work on the calling thread counts.
+
+    python benchmarks/bench_reply_fanout.py -n 20000
+
+"""
+
+import argparse
+import logging
+import os
+import time
+import types
+
+import actorcore.CommandLink
+from actorcore.CommandLinkManager import CommandLinkManager
+
+
+class NoReactor(object):
+    def callFromThread(self, func, *args, **kwargs):
+        pass
+
+
+def legacySendResponse(mgr, cmd, flag, response):
+    """The pre-fan-out CommandLinkManager.sendResponse."""
+
+    for c in mgr.activeConnections:
+        c.sendResponse(cmd, flag, response)
+
+
+def makeManager(nConns):
+    mgr = CommandLinkManager(brains=None, maxQueueLines=0, maxQueueBytes=0)
+    for _ in range(nConns):
+        mgr.buildProtocol(None)
+    return mgr
+
+
+def timeOne(send, nConns, nReplies):
+    mgr = makeManager(nConns)
+    cmd = types.SimpleNamespace(cid=0, mid=0)
+
+    t0 = time.perf_counter()
+    for ii in range(nReplies):
+        send(mgr, cmd, "i", 'text="a typical status line"; n=%d' % (ii))
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--replies", type=int, default=20000)
+    opts = parser.parse_args()
+
+    actorcore.CommandLink.reactor = NoReactor()
+
+    cmdLog = logging.getLogger("cmds")
+    cmdLog.setLevel(logging.INFO)
+    cmdLog.addHandler(logging.StreamHandler(open(os.devnull, "w")))
+    cmdLog.propagate = False
+
+    print("%5s %14s %14s %8s" % ("conns", "legacy us/rep", "fanout us/rep", "speedup"))
+    for nConns in 1, 2, 4, 8, 16:
+        legacy = timeOne(legacySendResponse, nConns, opts.replies)
+        fanout = timeOne(CommandLinkManager.sendResponse, nConns, opts.replies)
+        print(
+            "%5d %14.2f %14.2f %7.1fx"
+            % (
+                nConns,
+                1e6 * legacy / opts.replies,
+                1e6 * fanout / opts.replies,
+                legacy / fanout,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
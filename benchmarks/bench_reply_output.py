@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_reply_output.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Microbenchmark of the CommandLink reply path.
+
+An actor thread pushes N reply lines through CommandLink.sendResponse while the
+reactor drains them into an in-memory transport. Reports lines/s, reactor
+wakeups and transport writes for the legacy one-flush-per-line path and for the
+current batched path.
+
+    python benchmarks/bench_reply_output.py -n 100000
+
+"""
+
+import argparse
+import threading
+import time
+import types
+
+from twisted.internet import reactor
+
+from actorcore.CommandLink import CommandLink
+
+
+class CountingTransport(object):
+    """A minimal transport which counts what it is asked to write."""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.nbytes = 0
+        self.nwrites = 0
+        self.done = threading.Event()
+
+    def write(self, data):
+        self.nwrites += 1
+        self.nbytes += len(data)
+        if self.nbytes >= self.expected:
+            self.done.set()
+
+    def writeSequence(self, seq):
+        self.nwrites += 1
+        self.nbytes += sum(len(d) for d in seq)
+        if self.nbytes >= self.expected:
+            self.done.set()
+
+
+class LegacyCommandLink(CommandLink):
+    """The pre-batching output path: one reactor call and one write per line."""
+
+    def __init__(self, *args, **kwargs):
+        CommandLink.__init__(self, *args, **kwargs)
+        self.outputQueue = []
+
+    def sendQueuedResponses(self):
+        self.flushes += 1
+        with self.outputQueueLock:
+            while len(self.outputQueue) > 0:
+                self.transport.write(self.outputQueue.pop(0))
+
+    def queueOutput(self, line, isBroadcast=False):
+        with self.outputQueueLock:
+            self.outputQueue.append(line)
+        reactor.callFromThread(self.sendQueuedResponses)
+
+
+class BatchedCommandLink(CommandLink):
+    """The current output path, counting flushes."""
+
+    def sendQueuedResponses(self):
+        self.flushes += 1
+        CommandLink.sendQueuedResponses(self)
+
+
+def runOne(linkClass, nLines):
+    cmd = types.SimpleNamespace(cid=1, mid=1)
+    response = 'text="a typical status line"; guideState=on'
+    lineLength = len("%d %d %s %s\n" % (cmd.cid, cmd.mid, "i", response))
+
+    link = linkClass(brains=None, connID=1)
+    link.flushes = 0
+    link.transport = CountingTransport(nLines * lineLength)
+
+    t0 = time.perf_counter()
+    for _ in range(nLines):
+        link.sendResponse(cmd, "i", response)
+    link.transport.done.wait()
+    dt = time.perf_counter() - t0
+
+    return dict(
+        name=linkClass.__name__,
+        seconds=dt,
+        rate=nLines / dt,
+        flushes=link.flushes,
+        writes=link.transport.nwrites,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--lines", type=int, default=100000)
+    opts = parser.parse_args()
+
+    results = []
+
+    def run():
+        try:
+            for linkClass in LegacyCommandLink, BatchedCommandLink:
+                results.append(runOne(linkClass, opts.lines))
+        finally:
+            reactor.callFromThread(reactor.stop)
+
+    reactor.callWhenRunning(reactor.callInThread, run)
+    reactor.run()
+
+    for r in results:
+        print(
+            "%-20s %10.0f lines/s  %8d flushes  %8d writes  (%.3fs)"
+            % (r["name"], r["rate"], r["flushes"], r["writes"], r["seconds"])
+        )
+
+
+if __name__ == "__main__":
+    main()
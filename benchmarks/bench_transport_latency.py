@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_transport_latency.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Command round-trip latency over the TCP and Unix-domain command ports.
+
+A client sends one command at a time to an actor which finishes it
+immediately, and times each command until its ':' reply arrives.
+
+    python benchmarks/bench_transport_latency.py -n 10000
+
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+from twisted.internet import reactor
+
+from actorcore import Command as actorCmd
+from actorcore import CommandLinkManager as cmdLinkManager
+
+
+class DummyActor(object):
+    """Finishes every command as soon as it arrives."""
+
+    def newCmd(self, cmd):
+        cmd.finish("")
+
+
+def roundTrips(sock, nCmds):
+    """Run nCmds lock-step commands, returning each round-trip time in seconds."""
+
+    buf = b""
+
+    def waitForFinish(buf):
+        while True:
+            lines = buf.split(b"\n")
+            for i, line in enumerate(lines[:-1]):
+                if line.split(b" ", 3)[2:3] == [b":"]:
+                    return b"\n".join(lines[i + 1 :])
+            data = sock.recv(1 << 16)
+            if not data:
+                raise RuntimeError("connection closed")
+            buf += data
+
+    buf = waitForFinish(buf)  # yourUserNum
+
+    times = []
+    for mid in range(1, nCmds + 1):
+        t0 = time.perf_counter()
+        sock.sendall(b"%d ping\n" % (mid,))
+        buf = waitForFinish(buf)
+        times.append(time.perf_counter() - t0)
+
+    sock.close()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--commands", type=int, default=10000)
+    opts = parser.parse_args()
+
+    socketPath = os.path.join(tempfile.mkdtemp(), "actor.sock")
+
+    actor = DummyActor()
+    mgr = cmdLinkManager.listen(
+        actor, port=0, interface="localhost", socketPath=socketPath
+    )
+    actor.bcast = actorCmd.Command(mgr, "self.0", 0, 0, None, immortal=True)
+    port = mgr.port.getHost().port
+
+    results = []
+
+    def run():
+        try:
+            tcp = socket.create_connection(("localhost", port))
+            tcp.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            results.append(("tcp", roundTrips(tcp, opts.commands)))
+
+            unix = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            unix.connect(socketPath)
+            results.append(("unix", roundTrips(unix, opts.commands)))
+        finally:
+            reactor.callFromThread(reactor.stop)
+
+    reactor.callWhenRunning(reactor.callInThread, run)
+    reactor.run()
+
+    print("%-5s %10s %10s %10s %10s" % ("", "mean us", "p50 us", "p99 us", "cmds/s"))
+    for name, times in results:
+        times = sorted(times)
+        print(
+            "%-5s %10.1f %10.1f %10.1f %10.0f"
+            % (
+                name,
+                1e6 * statistics.mean(times),
+                1e6 * times[len(times) // 2],
+                1e6 * times[int(len(times) * 0.99)],
+                len(times) / sum(times),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: bench_vocab_startup.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Time to attach a command set with a large vocabulary, with the grammar cache.
+
+Writes a command set with --verbs verbs, then times Actor.attachCmdSet in fresh
+processes: with the grammar cache turned off, with an empty cache (which is
+filled), and with the filled cache.
+
+    python benchmarks/bench_vocab_startup.py --verbs 100 1000
+
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from actorcore.Actor import Actor
+
+
+CMDSET = '''
+import opscore.protocols.keys as keys
+import opscore.protocols.types as types
+
+
+class bigCmd(object):
+    def __init__(self, actor):
+        self.keys = keys.KeysDictionary(
+            "bench_big",
+            (1, 1),
+            keys.Key("exptime", types.Float()),
+            keys.Key("window", types.Int() * 2),
+            keys.Key("speed", types.Float()),
+            keys.Key("name", types.String() * (1, None)),
+            keys.Key("open"),
+            keys.Key("close"),
+            keys.Key("force"),
+        )
+        self.vocab = (
+%s
+        )
+
+    def run(self, cmd):
+        """Do something."""
+        cmd.finish()
+'''
+
+VOCAB_ENTRY = (
+    '            ("verb%d", "@(open|close) [<exptime>] [<window>] [<speed>] '
+    '[<name>] [(force)]", self.run),'
+)
+
+
+class BenchActor(Actor):
+    """Just enough of an Actor to attach command sets."""
+
+    def __init__(self, cacheDir):
+        self.logger = logging.getLogger("actor")
+        self.cmdLog = logging.getLogger("cmds")
+        self.initCommandHandling(
+            dict(
+                commandCacheSize=0,
+                grammarCache=bool(cacheDir),
+                grammarCacheDir=cacheDir,
+            )
+        )
+
+
+def child(cmdDir, cacheDir):
+    actor = BenchActor(cacheDir)
+    t0 = time.perf_counter()
+    actor.attachCmdSet("bigCmd", [cmdDir])
+    print(time.perf_counter() - t0)
+
+
+def timeChild(cmdDir, cacheDir):
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", cmdDir, cacheDir or ""],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--verbs", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    if opts.child:
+        child(opts.child[0], opts.child[1] or None)
+        return
+
+    print("%8s %12s %12s %12s" % ("verbs", "off ms", "cold ms", "warm ms"))
+    for nVerbs in opts.verbs:
+        tmpDir = tempfile.mkdtemp()
+        cmdDir = os.path.join(tmpDir, "Commands")
+        cacheDir = os.path.join(tmpDir, "cache")
+        os.mkdir(cmdDir)
+        with open(os.path.join(cmdDir, "bigCmd.py"), "w") as fp:
+            fp.write(CMDSET % "\n".join(VOCAB_ENTRY % (i,) for i in range(nVerbs)))
+
+        off = timeChild(cmdDir, None)
+        cold = timeChild(cmdDir, cacheDir)
+        warm = timeChild(cmdDir, cacheDir)
+        print("%8d %12.1f %12.1f %12.1f" % (nVerbs, 1e3 * off, 1e3 * cold, 1e3 * warm))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,16 +13,19 @@ a twisted reactor, depending on the value of runInReactorThread.
 """
 
 import abc
+import concurrent.futures
+import copy
 import importlib
 import importlib.util
 import inspect
+import itertools
 import logging
 import os
 import queue
 import re
-import socket
 import sys
 import threading
+import time
 import traceback
 
 import opscore
@@ -32,20 +35,36 @@ from opscore.protocols.parser import CommandParser
 from opscore.utility.qstr import qstr
 from opscore.utility.sdss3logging import setConsoleLevel, setupRootLogger
 from opscore.utility.tback import tback
-from sdsstools import read_yaml_file
 from twisted.internet import reactor
 
 from . import CmdrConnection
 from . import Command as actorCmd
 from . import CommandLinkManager as cmdLinkManager
+from .CommandCache import CommandCache
+from .CommandLoop import CommandLoop
+from .CommandPool import PARALLEL, SERIAL, CommandPool
+from .CommandWatcher import CommandWatcher
+from .ConfigManager import ConfigManager
+from .GrammarCache import GrammarCache
+from .ThreadSupervisor import ThreadSupervisor, nextThreadName
+from .utility.cmdsets import findCmdSetFile, scanVocabVerbs
+from .utility.queues import InstrumentedQueue, MsgPriorityQueue, flushQueue
+from .utility.startup import PhaseTimer, getfqdn
 
 
 class Msg(object):
     """
     Messages that an actor can pass to its threads.
     Subclass it and add more command types for your actor.
+
+    Messages sort by priority (lowest value first), then by creation order, so
+    a MsgPriorityQueue hands out CRITICAL messages before NORMAL ones, and
+    messages of equal priority in FIFO order.
     """
 
+    # Creation order, for a stable tie-break between equal priorities.
+    _sequence = itertools.count()
+
     # Priorities
     CRITICAL = 0
     HIGH = 2
@@ -66,6 +85,7 @@ class Msg(object):
         self.type = type
         self.cmd = cmd
         self.priority = Msg.NORMAL
+        self.seq = next(Msg._sequence)
 
         # how long this command is expected to take (may be overridden by data)
         self.duration = 0
@@ -82,77 +102,60 @@ class Msg(object):
 
         return "{}, {}: {{{}}}".format(self.type.__name__, self.cmd, ", ".join(values))
 
-    def __cmp__(self, rhs):
+    def __lt__(self, rhs):
         """Used when sorting the messages in a priority queue"""
-        return self.priority - rhs.priority
+        return (self.priority, self.seq) < (rhs.priority, rhs.seq)
 
 
 class ModLoader(object):
-    def load_module(self, fullpath, name):
-        """Try to load a named module in the given path.
+    """Load modules, e.g. controllers, from a package named by a dotted path.
 
-        Uses importlib to load modules dynamically.
-        """
+    The package and its parents are imported once, as usual, and where each
+    module was found is remembered, so that load_module only executes the module
+    itself. Pass reload=True to re-execute the packages and look again.
+    """
 
-        self.icclog.info("trying to load module path=%s name=%s", fullpath, name)
+    # Shared by all loaders, like sys.modules: {package name: its __path__} and
+    # {(package name, module name): module spec}.
+    packagePaths = {}
+    moduleSpecs = {}
+    loaderLock = threading.Lock()
 
-        parts = fullpath.split(".")
-        path = None
-        while len(parts) > 1:
-            pname = parts[0]
-            self.icclog.debug("pre-loading path=%s pname=%s", path, pname)
+    def load_module(self, fullpath, name, reload=False):
+        """Load a named module in the package of the given path.
 
-            # Find module spec
-            if path is None:
-                spec = importlib.util.find_spec(pname)
-            else:
-                # For submodules, construct the full module name
-                idx = fullpath.split(".").index(pname)
-                parent_parts = fullpath.split(".")[: idx + 1]
-                spec = importlib.util.find_spec(
-                    pname,
-                    package=".".join(parent_parts[:-1])
-                    if len(parent_parts) > 1
-                    else None,
-                )
+        Args:
+            fullpath - the dotted path of the module, e.g. "myActor.Controllers.cam":
+                all but its last part name the package to load it from.
+            name - the module's name, which it is loaded (and put in sys.modules) as.
+            reload - also reload the package and its parents, and find the
+                module again, instead of using what was cached.
+
+        Returns:
+            the newly executed module.
+        """
 
+        logger = logging.getLogger("actor")
+        logger.info("trying to load module path=%s name=%s", fullpath, name)
+
+        package = fullpath.rpartition(".")[0] or None
+        with self.loaderLock:
+            if package and (reload or package not in self.packagePaths):
+                logger.debug("pre-loading package %s (reload=%s)", package, reload)
+                mod = importlib.import_module(package)
+                if reload:
+                    parts = package.split(".")
+                    for i in range(1, len(parts) + 1):
+                        importlib.reload(sys.modules[".".join(parts[:i])])
+                    mod = sys.modules[package]
+                self.packagePaths[package] = list(mod.__path__)
+
+            spec = None if reload else self.moduleSpecs.get((package, name))
             if spec is None:
-                raise ImportError(f"No module named '{pname}'")
+                spec = self.findModuleSpec(package, name)
+                self.moduleSpecs[(package, name)] = spec
 
-            self.icclog.debug(
-                "pre-loading package spec.name=%s spec.origin=%s",
-                spec.name,
-                spec.origin,
-            )
-
-            # Load the module
-            mod = importlib.util.module_from_spec(spec)
-            sys.modules[spec.name] = mod
-            spec.loader.exec_module(mod)
-
-            if hasattr(mod, "__path__"):
-                path = mod.__path__
-            parts = parts[1:]
-
-        self.icclog.debug("trying to find path=%s class=%s", path, name)
-
-        # Find and load the final module
-        if path is None:
-            spec = importlib.util.find_spec(name)
-        else:
-            # Search in the given path
-            for p in path:
-                module_file = os.path.join(p, name + ".py")
-                if os.path.exists(module_file):
-                    spec = importlib.util.spec_from_file_location(name, module_file)
-                    break
-            else:
-                raise ImportError(f"No module named '{name}' in path {path}")
-
-        if spec is None:
-            raise ImportError(f"No module named '{name}'")
-
-        self.icclog.debug(
+        logger.debug(
             "trying to attach spec.name=%s spec.origin=%s",
             spec.name,
             spec.origin,
@@ -163,6 +166,23 @@ class ModLoader(object):
         spec.loader.exec_module(mod)
         return mod
 
+    def findModuleSpec(self, package, name):
+        """Return the spec of module name in package (or at the top level if None)."""
+
+        if package is None:
+            spec = importlib.util.find_spec(name)
+            if spec is None:
+                raise ImportError(f"No module named '{name}'")
+            return spec
+
+        path = self.packagePaths[package]
+        for p in path:
+            module_file = os.path.join(p, name + ".py")
+            if os.path.exists(module_file):
+                return importlib.util.spec_from_file_location(name, module_file)
+
+        raise ImportError(f"No module named '{name}' in path {path}")
+
 
 class ActorState(object):
     """An object to hold globally useful state for an actor"""
@@ -207,6 +227,9 @@ class Actor(object):
             makeCmdrConnection (bool): establish self.cmdr as a command connection
                 to the hub.
         """
+        # How long each part of the startup takes; see coreStatus.
+        self.startupTimer = PhaseTimer()
+
         # Define/save the actor name, the product name, the product_DIR, and the
         # configuration file.
         self.name = name
@@ -226,9 +249,17 @@ class Actor(object):
             self.product_dir, f"etc/{self.name}.yaml"
         )
 
+        self.startupTimer.mark("product")
         self.read_config_files()
+        self.startupTimer.mark("config")
 
         self.configureLogs()
+        self.startupTimer.mark("logs")
+
+        # reloadConfiguration only calls whoever subscribed to what changed.
+        self.configManager = ConfigManager(self)
+        self.configManager.subscribe("logging", self.loggingConfigChanged)
+        self.configManager.subscribe("tron", self.tronConfigChanged)
 
         self.logger.info("%s starting up...." % (name))
         self.parser = CommandParser()
@@ -236,8 +267,29 @@ class Actor(object):
         # The list of all connected sources.
         tronInterface = self.config["tron"]["interface"] or ""
         tronPort = self.config["tron"]["port"]
-        self.commandSources = cmdLinkManager.listen(
-            self, port=tronPort, interface=tronInterface
+        linkOptions = {
+            k: self.config["tron"][k]
+            for k in ("maxLineLength", "maxQueueLines", "maxQueueBytes", "queuePolicy")
+            if self.config["tron"].get(k, None) is not None
+        }
+        tronSocket = self.config["tron"].get("socketPath", None)
+        backend = self.config["tron"].get("backend", "twisted")
+        if backend == "asyncio":
+            from . import AsyncCommandLink
+
+            listen = AsyncCommandLink.listen
+            linkOptions["useUvloop"] = self.config["tron"].get("uvloop", True)
+        elif backend == "twisted":
+            listen = cmdLinkManager.listen
+        else:
+            raise RuntimeError("unknown tron backend: %s" % (backend))
+        self.commandSources = listen(
+            self,
+            port=tronPort,
+            interface=tronInterface,
+            socketPath=os.path.expandvars(tronSocket) if tronSocket else None,
+            routeReplies=self.config["tron"].get("routeReplies", True),
+            **linkOptions,
         )
         # The Command which we send uncommanded output to.
         self.bcast = actorCmd.Command(
@@ -247,6 +299,58 @@ class Actor(object):
         # IDs to send commands to ourself.
         self.selfCID = self.commandSources.fetchCid()
         self.synthMID = 1
+        self.startupTimer.mark("listen")
+
+        actorConfig = self.config.get(self.name, None) or {}
+        self.initCommandHandling(actorConfig)
+        self.startupTimer.mark("handler")
+
+        self.commandQueue = InstrumentedQueue("commands")
+        self.shuttingDown = False
+
+        # Set once the command sets are attached. Until then commands are queued,
+        # and with runInReactorThread only run once dispatchReady is set. If
+        # attaching them in the background fails, cmdSetsError is set instead.
+        self.cmdSetsAttached = threading.Event()
+        self.cmdSetsError = None
+        self.dispatchReady = False
+
+        if actorConfig.get("overlappedStartup", False):
+            # Attach the command sets in the background, so that run() can start
+            # the reactor, and with it the hub connection and command port,
+            # without waiting for them.
+            self.makeCmdrConnection(makeCmdrConnection)
+            self.startupTimer.mark("cmdr")
+            threading.Thread(
+                target=self.attachCmdSetsInBackground, name="attachCmdSets", daemon=True
+            ).start()
+        else:
+            self.logger.info("Attaching actor command sets...")
+            self.attachAllCmdSets()
+            self.logger.info("All command sets attached...")
+            self.startupTimer.mark("cmdSets")
+            self.cmdSetsReady()
+            self.dispatchReady = True
+
+            self.makeCmdrConnection(makeCmdrConnection)
+            self.startupTimer.mark("cmdr")
+
+        self.startupTimer.finish()
+        self.logger.info(
+            "started in %0.3fs: %s",
+            self.startupTimer.total(),
+            self.startupTimer.summary(),
+        )
+
+    def initCommandHandling(self, actorConfig):
+        """Set up everything the command sets and command dispatching use.
+
+        Args:
+            actorConfig - the actor's own configuration section.
+
+        Called by __init__; also lets benchmarks and tests build an Actor
+        with nothing but its command handling.
+        """
 
         # commandSets are the command handler packages. Each handles
         # a vocabulary, which it registers when loaded.
@@ -254,23 +358,143 @@ class Actor(object):
         # can find the others.
         self.commandSets = {}
 
+        # How long each command set took to (attach, import), in seconds.
+        self.cmdSetTimes = {}
+
+        # The concurrency group of each command function, see CommandPool.
+        self.commandGroups = {}
+        self.commandPool = None
+
+        # Where commands with async def callbacks run; started when first needed.
+        self.commandLoop = None
+
+        # Without a commandPool, the future of the async command which later
+        # commands wait for; see holdCommandsFor.
+        self.asyncCmd = None
+
         self.logger.info("Creating validation handler...")
         self.handler = validation.CommandHandler()
 
-        self.logger.info("Attaching actor command sets...")
-        self.attachAllCmdSets()
-        self.logger.info("All command sets attached...")
+        # attachCmdSet replaces self.handler with an updated copy, under this lock.
+        self.handlerLock = threading.Lock()
 
-        self.commandQueue = queue.Queue()
-        self.shuttingDown = False
+        # Re-attaches command sets when their files change; see watchCommands.
+        self.commandWatcher = None
+
+        # Runs the threads started by SDSSActor.startThreads; see ThreadSupervisor.
+        self.threadSupervisor = None
+
+        # Recently validated commands; commandCacheSize: 0 turns the cache off.
+        self.commandCache = CommandCache(actorConfig.get("commandCacheSize", 256))
+
+        # With lazyCommands, command sets are only imported when one of their
+        # verbs is first used. Until then they are listed here, see deferCmdSet.
+        self.lazyCommands = actorConfig.get("lazyCommands", False)
+        self.deferredCmdSets = {}
+        self.deferredVerbs = {}
+
+        # Compiled command grammars, kept on disk; grammarCache: false to disable.
+        if actorConfig.get("grammarCache", True):
+            self.grammarCache = GrammarCache(actorConfig.get("grammarCacheDir", None))
+        else:
+            self.grammarCache = None
+
+    def makeCmdrConnection(self, makeCmdrConnection=True):
+        """Establish self.cmdr, our command connection to the hub, if wanted."""
 
         if makeCmdrConnection:
-            self.cmdr = CmdrConnection.Cmdr(name, self)
+            self.cmdr = CmdrConnection.Cmdr(self.name, self)
             self.cmdr.connectionMade = self._connectionMade
             self.cmdr.connect()
         else:
             self.cmdr = None
 
+    def attachCmdSetsInBackground(self):
+        """Attach all command sets, then run the commands queued meanwhile.
+
+        This runs after Actor.__init__ has returned, and possibly alongside
+        run(), so command sets must not depend on any state which is set up
+        after Actor.__init__ returns. If attaching them fails, the actor never
+        becomes ready: the queued commands and all later ones are failed.
+        """
+
+        t0 = time.monotonic()
+        self.logger.info("Attaching actor command sets...")
+        try:
+            self.attachAllCmdSets()
+        except Exception as e:
+            self.logger.error("failed to attach all command sets: %s", e)
+            tback("attachAllCmdSets", e)
+            self.cmdSetsError = e
+            reactor.callFromThread(self.failQueuedCmds)
+            return
+        self.logger.info("All command sets attached...")
+        self.startupTimer.add("cmdSets", time.monotonic() - t0)
+
+        self.cmdSetsReady()
+        reactor.callFromThread(self.dispatchQueuedCmds)
+
+    def rejectCmd(self, cmd):
+        """Fail a command because the command sets could not be attached."""
+
+        msg = "command sets failed to attach: %s" % (self.cmdSetsError)
+        cmd.fail("text=%s" % (qstr(msg)))
+
+    def failQueuedCmds(self):
+        """In the reactor thread, fail the commands queued before attaching the
+        command sets failed."""
+
+        while True:
+            try:
+                cmd = self.commandQueue.get(block=False)
+            except queue.Empty:
+                break
+            self.rejectCmd(cmd)
+
+    def cmdSetsReady(self):
+        self.startupTimer.ready()
+        self.cmdSetsAttached.set()
+        self.logger.info(
+            "ready for commands after %0.3fs", self.startupTimer.timeToReady()
+        )
+
+        actorConfig = self.config.get(self.name, None) or {}
+        if actorConfig.get("watchCommands", False):
+            self.startCommandWatcher(float(actorConfig.get("watchInterval", 1.0)))
+
+    def startCommandWatcher(self, interval=1.0):
+        """Re-attach command sets when their files change, until the reactor stops."""
+
+        self.commandWatcher = CommandWatcher(
+            self,
+            [
+                os.path.join(os.path.dirname(__file__), "Commands"),
+                os.path.join(self.product_dir, "Commands"),
+            ],
+            interval=interval,
+        )
+        self.commandWatcher.start()
+        # We may be in the thread attaching the command sets.
+        reactor.callFromThread(
+            reactor.addSystemEventTrigger,
+            "before",
+            "shutdown",
+            self.commandWatcher.stop,
+        )
+
+    def dispatchQueuedCmds(self):
+        """In the reactor thread, run the commands queued before we were ready,
+        or while an async command held them up."""
+
+        if getattr(self, "runInReactorThread", False):
+            while not self.asyncCmdRunning():
+                try:
+                    cmd = self.commandQueue.get(block=False)
+                except queue.Empty:
+                    break
+                self.runActorCmd(cmd)
+        self.dispatchReady = True
+
     def read_config_files(self):
         """Read the config file(s) in etc/"""
 
@@ -278,6 +502,8 @@ class Actor(object):
         self.configFile = os.path.expandvars(self.configFile)
         logging.warn("reading config file %s", self.configFile)
 
+        from sdsstools import read_yaml_file
+
         self.config = read_yaml_file(self.configFile)
 
     def configureLogs(self, cmd=None):
@@ -314,6 +540,17 @@ class Actor(object):
         if cmd:
             cmd.inform('text="reconfigured logs"')
 
+    def loggingConfigChanged(self, changes, cmd=None):
+        self.configureLogs(cmd)
+
+    def tronConfigChanged(self, changes, cmd=None):
+        """The command port and the hub connection are only set up at startup."""
+
+        warnStr = "tron configuration changes only take effect on restart"
+        self.logger.warning(warnStr)
+        if cmd:
+            cmd.warn("text=%s" % (qstr(warnStr)))
+
     def versionString(self, cmd):
         """Return the version key value.
 
@@ -376,18 +613,14 @@ class Actor(object):
             path = [os.path.join(self.product_dir, "Commands")]
 
         self.logger.info("attaching command set %s from path %s", cname, path)
+        t0 = time.monotonic()
 
         try:
             # Search for the module in the given path
-            spec = None
-            for p in path:
-                module_file = os.path.join(p, cname + ".py")
-                if os.path.exists(module_file):
-                    spec = importlib.util.spec_from_file_location(cname, module_file)
-                    break
-
-            if spec is None:
+            module_file = findCmdSetFile(cname, path)
+            if module_file is None:
                 raise ImportError(f"No module named '{cname}' in path {path}")
+            spec = importlib.util.spec_from_file_location(cname, module_file)
 
             self.logger.debug(
                 "command set spec.name=%s spec.origin=%s from path %s",
@@ -401,6 +634,7 @@ class Actor(object):
             spec.loader.exec_module(mod)
         except ImportError as e:
             raise RuntimeError("Import of %s failed: %s" % (cname, e))
+        importTime = time.monotonic() - t0
 
         # Instantiate and save a new command handler.
         cmdSet = getattr(mod, cname)(self)
@@ -415,30 +649,130 @@ class Actor(object):
         # load the Keys and do not unload them if the validation fails.
         if hasattr(cmdSet, "keys") and cmdSet.keys:
             keys.CmdKey.addKeys(cmdSet.keys)
+
+        # A vocabulary word may name its concurrency group as a fourth part;
+        # otherwise it uses the command set's, which defaults to "serial".
+        defaultGroup = getattr(cmdSet, "concurrency", SERIAL)
         valCmds = []
+        cmdGroups = {}
+
+        # Compiled Cmds from the last time this file was attached, if still valid.
+        cachedCmds = self.grammarCache.load(module_file) if self.grammarCache else {}
+        grammar = {}
+        missed = False
         for v in cmdSet.vocab:
-            try:
+            if len(v) == 3:
                 verb, args, func = v
-            except ValueError:
-                raise RuntimeError("vocabulary word needs three parts: %s" % (v))
+                group = defaultGroup
+            elif len(v) == 4:
+                verb, args, func, group = v
+            else:
+                raise RuntimeError(
+                    "vocabulary word needs three or four parts: %s" % (v,)
+                )
 
             # Check that the function exists and get its help.
             funcDoc = inspect.getdoc(func)
-            valCmd = validation.Cmd(verb, args, help=funcDoc) >> func
+            valCmd = cachedCmds.pop((verb, args), None)
+            if valCmd is None:
+                valCmd = validation.Cmd(verb, args)
+                missed = True
+            grammar.setdefault((verb, args), valCmd)
+            valCmd.help = funcDoc
+            valCmd >> func
             valCmds.append(valCmd)
+            cmdGroups[func] = group
+
+        if self.grammarCache and (missed or cachedCmds):
+            self.grammarCache.save(module_file, grammar)
+
+        if self.commandLoop is None and any(
+            inspect.iscoroutinefunction(v[2]) for v in cmdSet.vocab
+        ):
+            self.startCommandLoop()
 
         # Got this far? Commit. Save the Cmds so that we can delete them later.
         oldCmdSet = self.commandSets.get(cname, None)
         cmdSet.validatedCmds = valCmds
+        cmdSet.commandGroups = cmdGroups
         self.commandSets[cname] = cmdSet
+        self.undeferCmdSet(cname)
 
         # Delete previous set of consumers for this named CmdSet, add new ones.
-        if oldCmdSet:
-            self.handler.removeConsumers(*oldCmdSet.validatedCmds)
-        self.handler.addConsumers(*cmdSet.validatedCmds)
-
+        # This is done on a copy of the handler, which then replaces it, so that
+        # commands being matched meanwhile see either the old or the new set.
+        with self.handlerLock:
+            handler = copy.copy(self.handler)
+            handler.consumers = {v: list(c) for v, c in self.handler.consumers.items()}
+            if oldCmdSet:
+                handler.removeConsumers(*oldCmdSet.validatedCmds)
+                for func in getattr(oldCmdSet, "commandGroups", {}):
+                    self.commandGroups.pop(func, None)
+            handler.addConsumers(*cmdSet.validatedCmds)
+            self.commandGroups.update(cmdGroups)
+            self.handler = handler
+        self.commandCache.clear()
+
+        self.cmdSetTimes[cname] = (time.monotonic() - t0, importTime)
+        self.logger.info(
+            "attached command set %s in %0.3fs (import %0.3fs)",
+            cname,
+            self.cmdSetTimes[cname][0],
+            importTime,
+        )
         self.logger.debug("handler verbs: %s" % (list(self.handler.consumers.keys())))
 
+    def loadCmdSet(self, cname, path):
+        """Attach a command set now or, with lazyCommands, when it is first used."""
+
+        if self.lazyCommands and cname not in self.commandSets:
+            if self.deferCmdSet(cname, path):
+                return
+        self.attachCmdSet(cname, path)
+
+    def deferCmdSet(self, cname, path):
+        """Register the verbs of a command set, to attach it on their first use.
+
+        The verbs are read from the source without importing it. Returns False
+        if that cannot be done, in which case the set must be attached now.
+        """
+
+        module_file = findCmdSetFile(cname, path)
+        verbs = scanVocabVerbs(module_file, cname) if module_file else None
+        if not verbs:
+            self.logger.info("cannot defer command set %s: attaching it now", cname)
+            return False
+
+        self.undeferCmdSet(cname)
+        self.deferredCmdSets[cname] = (path, verbs)
+        for verb in verbs:
+            self.deferredVerbs.setdefault(verb, []).append(cname)
+        self.logger.info("deferring command set %s, verbs: %s", cname, verbs)
+
+        return True
+
+    def undeferCmdSet(self, cname):
+        """Forget a deferred command set. Returns its path, or None."""
+
+        path, verbs = self.deferredCmdSets.pop(cname, (None, ()))
+        for verb in verbs:
+            self.deferredVerbs[verb].remove(cname)
+            if not self.deferredVerbs[verb]:
+                del self.deferredVerbs[verb]
+
+        return path
+
+    def attachDeferredCmdSets(self, verb=None):
+        """Attach the deferred command sets with the given verb, or all of them."""
+
+        if verb is None:
+            cnames = list(self.deferredCmdSets)
+        else:
+            cnames = list(self.deferredVerbs.get(verb, ()))
+
+        for cname in cnames:
+            self.attachCmdSet(cname, self.undeferCmdSet(cname))
+
     def attachAllCmdSets(self, path=None):
         """(Re-)load all command classes -- files in ./Command which end with Cmd.py."""
 
@@ -456,7 +790,7 @@ class Actor(object):
             if os.path.isdir(f) and not f.startswith("."):
                 self.attachAllCmdSets(path=f)
             if re.match(r"^[a-zA-Z][a-zA-Z0-9_-]*Cmd\.py$", f):
-                self.attachCmdSet(f[:-3], [path])
+                self.loadCmdSet(f[:-3], [path])
 
     def cmdTraceback(self, e):
         eType, eValue, eTraceback = sys.exc_info()
@@ -466,72 +800,230 @@ class Actor(object):
         return "%r at %s:%d" % (eValue, where[0], where[1])
 
     def runActorCmd(self, cmd):
+        """Validate and run a command in the calling thread."""
+
         try:
-            cmdStr = cmd.rawCmd
-            self.cmdLog.debug("raw cmd: %s" % (cmdStr))
+            validatedCmd, cmdFuncs = self.matchActorCmd(cmd)
+            if validatedCmd:
+                future = self.callActorCmd(cmd, validatedCmd, cmdFuncs)
+                if future is not None and self.commandGroup(cmdFuncs) != PARALLEL:
+                    self.holdCommandsFor(future)
+        except Exception as e:
+            self.unexpectedCmdFailure(cmd, e)
 
-            try:
-                validatedCmd, cmdFuncs = self.handler.match(cmdStr)
-            except Exception as e:
-                cmd.fail(
-                    "text=%s"
-                    % (qstr("Unmatched command: %s (exception: %s)" % (cmdStr, e)))
-                )
-                # tback('actor_loop', e)
-                return
+    def holdCommandsFor(self, future):
+        """Run no other command until the async command future is done.
 
-            if not validatedCmd:
-                cmd.fail("text=%s" % (qstr("Unrecognized command: %s" % (cmdStr))))
-                return
+        Without a commandPool every command is serial, so an async command
+        holds up the next one until it finishes, as a plain callback would.
+        actor_loop waits for it; in the reactor thread, commands are queued
+        until it is done.
+        """
 
-            self.cmdLog.info("< %s:%d %s" % (cmd.cmdr, cmd.mid, validatedCmd))
-            if len(cmdFuncs) > 1:
-                cmd.warn(
-                    "text=%s"
-                    % (
-                        qstr(
-                            "command has more than one callback (%s): %s"
-                            % (cmdFuncs, validatedCmd)
-                        )
-                    )
-                )
-            try:
-                cmd.cmd = validatedCmd
-                for func in cmdFuncs:
-                    func(cmd)
-            except Exception as e:
-                oneLiner = self.cmdTraceback(e)
-                cmd.fail("text=%s" % (qstr("command failed: %s" % (oneLiner))))
-                # tback('newCmd', e)
-                return
+        self.asyncCmd = future
+        if getattr(self, "runInReactorThread", False):
+            future.add_done_callback(
+                lambda f: reactor.callFromThread(self.dispatchQueuedCmds)
+            )
+
+    def asyncCmdRunning(self):
+        return self.asyncCmd is not None and not self.asyncCmd.done()
+
+    def waitForAsyncCmd(self):
+        """Wait for the async command in holdCommandsFor. False if shutting down."""
+
+        while self.asyncCmdRunning():
+            concurrent.futures.wait([self.asyncCmd], timeout=3)
+            if self.shuttingDown:
+                return False
+        return True
+
+    def matchActorCmd(self, cmd):
+        """Validate a command against our vocabulary.
 
+        Returns the validated command and its callbacks, or fails the command
+        and returns (None, []). Successful matches are kept in self.commandCache.
+        """
+
+        cmdStr = cmd.rawCmd
+        self.cmdLog.debug("raw cmd: %s" % (cmdStr))
+
+        cached = self.commandCache.get(cmdStr)
+        if cached:
+            return cached
+        generation = self.commandCache.generation
+
+        # The handler keeps its consumers by verb, but only looks them up after
+        # parsing the whole line: turn away unknown verbs before that.
+        words = cmdStr.split(None, 1)
+        if words and words[0] in self.deferredVerbs:
+            self.attachDeferredCmdSets(words[0])
+            generation = self.commandCache.generation
+        handler = self.handler
+        if not words or words[0] not in handler.consumers:
+            cmd.fail("text=%s" % (qstr("Unrecognized command: %s" % (cmdStr))))
+            return None, []
+
+        try:
+            validatedCmd, cmdFuncs = handler.match(cmdStr)
         except Exception as e:
             cmd.fail(
+                "text=%s"
+                % (qstr("Unmatched command: %s (exception: %s)" % (cmdStr, e)))
+            )
+            # tback('actor_loop', e)
+            return None, []
+
+        if not validatedCmd:
+            cmd.fail("text=%s" % (qstr("Unrecognized command: %s" % (cmdStr))))
+            return None, []
+
+        self.commandCache.put(cmdStr, validatedCmd, cmdFuncs, generation)
+        return validatedCmd, cmdFuncs
+
+    def callActorCmd(self, cmd, validatedCmd, cmdFuncs):
+        """Run the callbacks of a validated command.
+
+        If any callback is an async def function, the command is scheduled on
+        self.commandLoop, and this returns its concurrent.futures.Future at once.
+        The command's concurrency group is held until the future is done.
+        """
+
+        self.cmdLog.info("< %s:%d %s" % (cmd.cmdr, cmd.mid, validatedCmd))
+        if len(cmdFuncs) > 1:
+            cmd.warn(
                 "text=%s"
                 % (
                     qstr(
-                        "completely unexpected exception when "
-                        "processing a new command: %s" % (e)
+                        "command has more than one callback (%s): %s"
+                        % (cmdFuncs, validatedCmd)
                     )
                 )
             )
-            try:
-                tback("newCmdFail", e)
-            except BaseException:
-                pass
+        if any(inspect.iscoroutinefunction(func) for func in cmdFuncs):
+            cmd.cmd = validatedCmd
+            return self.commandLoop.submit(self.awaitActorCmd(cmd, cmdFuncs))
+
+        try:
+            cmd.cmd = validatedCmd
+            for func in cmdFuncs:
+                func(cmd)
+        except Exception as e:
+            self.failedActorCmd(cmd, e)
+            return
+
+    async def awaitActorCmd(self, cmd, cmdFuncs):
+        """Run the callbacks of a command with async def ones, on self.commandLoop."""
+
+        try:
+            for func in cmdFuncs:
+                ret = func(cmd)
+                if inspect.isawaitable(ret):
+                    await ret
+        except Exception as e:
+            self.failedActorCmd(cmd, e)
+
+    def failedActorCmd(self, cmd, e):
+        """Fail a command whose callback raised e. Call from the except clause."""
+
+        oneLiner = self.cmdTraceback(e)
+        cmd.fail("text=%s" % (qstr("command failed: %s" % (oneLiner))))
+        # tback('newCmd', e)
+
+    def startCommandLoop(self):
+        """Start the event loop for async def callbacks, stopped with the reactor."""
+
+        self.logger.info("starting event loop for async commands")
+        self.commandLoop = CommandLoop()
+        # We may be in the thread attaching the command sets.
+        reactor.callFromThread(
+            reactor.addSystemEventTrigger, "before", "shutdown", self.commandLoop.stop
+        )
+
+    def unexpectedCmdFailure(self, cmd, e):
+        cmd.fail(
+            "text=%s"
+            % (
+                qstr(
+                    "completely unexpected exception when "
+                    "processing a new command: %s" % (e)
+                )
+            )
+        )
+        try:
+            tback("newCmdFail", e)
+        except BaseException:
+            pass
+
+    def commandGroup(self, cmdFuncs):
+        """Return the concurrency group to run a command with these callbacks in."""
+
+        groups = set(self.commandGroups.get(func, SERIAL) for func in cmdFuncs)
+        if len(groups) == 1:
+            return groups.pop()
+        return SERIAL
+
+    def dispatchActorCmd(self, cmd):
+        """Validate a command here, and queue it on the command pool to run."""
+
+        try:
+            validatedCmd, cmdFuncs = self.matchActorCmd(cmd)
+            if not validatedCmd:
+                return
+            self.commandPool.submit(
+                self.commandGroup(cmdFuncs),
+                self._poolActorCmd,
+                cmd,
+                validatedCmd,
+                cmdFuncs,
+            )
+        except Exception as e:
+            self.unexpectedCmdFailure(cmd, e)
+
+    def _poolActorCmd(self, cmd, validatedCmd, cmdFuncs):
+        try:
+            return self.callActorCmd(cmd, validatedCmd, cmdFuncs)
+        except Exception as e:
+            self.unexpectedCmdFailure(cmd, e)
 
     def actor_loop(self):
-        """Check the command queue and dispatch commands."""
+        """Check the command queue and dispatch commands.
 
-        while True:
-            try:
-                cmd = self.commandQueue.get(block=True, timeout=3)
-            except queue.Empty:
-                if self.shuttingDown:
-                    return
+        If the actor's configuration sets commandThreads to more than one, the
+        commands are run on a CommandPool of that many threads, according to the
+        concurrency group of their vocabulary entry. Otherwise they are run here,
+        one at a time.
+        """
+
+        actorConfig = self.config.get(self.name, None) or {}
+        nThreads = int(actorConfig.get("commandThreads", 1))
+        if nThreads > 1:
+            self.logger.info("running commands on %d threads", nThreads)
+            self.commandPool = CommandPool(nThreads)
+
+        # Commands received before the command sets are attached wait here.
+        while not self.cmdSetsAttached.wait(3):
+            if self.shuttingDown:
+                return
+
+        try:
+            while True:
+                try:
+                    cmd = self.commandQueue.get(block=True, timeout=3)
+                except queue.Empty:
+                    if self.shuttingDown:
+                        return
+                    else:
+                        continue
+                if self.commandPool:
+                    self.dispatchActorCmd(cmd)
                 else:
-                    continue
-            self.runActorCmd(cmd)
+                    if not self.waitForAsyncCmd():
+                        return
+                    self.runActorCmd(cmd)
+        finally:
+            if self.commandPool:
+                self.commandPool.stop()
 
     def commandFailed(self, cmd):
         """Gets called when a command has failed."""
@@ -547,7 +1039,13 @@ class Actor(object):
             cmd.finish("")
             return None
 
-        if self.runInReactorThread:
+        if self.cmdSetsError is not None:
+            self.rejectCmd(cmd)
+            return self
+
+        # Commands wait behind those already queued, and any async command.
+        held = self.asyncCmdRunning() or not self.commandQueue.empty()
+        if self.runInReactorThread and self.dispatchReady and not held:
             self.runActorCmd(cmd)
         else:
             self.commandQueue.put(cmd)
@@ -618,7 +1116,15 @@ class SDSSActor(Actor, metaclass=abc.ABCMeta):
         location = location or os.environ.get("OBSERVATORY", None)
 
         if location is None:
-            fqdn = socket.getfqdn().split(".")
+            # Do not guess from the bare hostname if DNS is slow: the
+            # location decides which command sets are loaded.
+            fqdn = getfqdn()
+            if fqdn is None:
+                logging.getLogger("actor").warning(
+                    "waiting for the FQDN to determine the location"
+                )
+                fqdn = getfqdn(timeout=None)
+            fqdn = fqdn.split(".")
         else:
             location = location.upper()
             assert location in ["APO", "LCO", "LOCAL"], "invalid location"
@@ -649,9 +1155,16 @@ class SDSSActor(Actor, metaclass=abc.ABCMeta):
                 if re.match(
                     r"^[a-zA-Z][a-zA-Z0-9_-]*Cmd_{}\.py$".format(self.location), f
                 ):
-                    self.attachCmdSet(f[:-3], [path])
+                    self.loadCmdSet(f[:-3], [path])
 
-    def run(self, Msg=None, startThreads=True, doReactor=True, queueClass=None):
+    def run(
+        self,
+        Msg=None,
+        startThreads=True,
+        doReactor=True,
+        queueClass=None,
+        priority=False,
+    ):
         """
         Start any pre-definted threads and the twisted reactor.
 
@@ -662,15 +1175,20 @@ class SDSSActor(Actor, metaclass=abc.ABCMeta):
             queueClass (class): The Queue class to use. If None, uses Queue.Queue.
                 This is mostly intended for sopActor, which uses its own subclass
                 of Queue.
+            priority (bool): passed to startThreads.
 
         """
 
-        if not queueClass:
+        if not queueClass and not priority:
             queueClass = queue.Queue
 
         if Msg is not None:
             self.startThreads(
-                Msg, restartQueues=True, restart=False, queueClass=queueClass
+                Msg,
+                restartQueues=True,
+                restart=False,
+                queueClass=queueClass,
+                priority=priority,
             )
 
         try:
@@ -693,12 +1211,29 @@ class SDSSActor(Actor, metaclass=abc.ABCMeta):
             self.logger.info("reactor dead, cleaning up...")
             self._shutdown()
 
+    def threadRestarted(self, tid, thread):
+        """Called by the ThreadSupervisor with the thread it restarted for tid."""
+
+        self.actorState.threads[tid] = thread
+
     def startThreads(
-        self, Msg, cmd=None, restart=False, restartQueues=False, queueClass=None
+        self,
+        Msg,
+        cmd=None,
+        restart=False,
+        restartQueues=False,
+        queueClass=None,
+        priority=False,
     ):
         """
         Start or restart the worker threads (from self.threadList) and queues.
 
+        The threads run under self.threadSupervisor, which counts the messages
+        they take from their queues and restarts them if they die (unless
+        restartDeadThreads is false in the actor's configuration section). On
+        restart, all the old threads are told to exit at once, and given a
+        second between them to do so.
+
         Args:
             actorState (ActorState): container for the current state of the
                 class, to pass messages between threads, etc.
@@ -711,10 +1246,17 @@ class SDSSActor(Actor, metaclass=abc.ABCMeta):
             restartQueues (bool): Create new empty queues for each thread.
             queueClass (class): The Queue class to use. If None, uses Queue.Queue.
                 This is mostly intended for sopActor, which uses its own subclass
-                of Queue.
+                of Queue. utility.queues.InstrumentedQueue keeps statistics, which
+                the queueStatus command reports; utility.queues.BatchQueue lets a
+                thread take a burst of messages at once, with get_batch().
+            priority (bool): if queueClass is None, use MsgPriorityQueue, so that
+                higher priority Msgs overtake queued ones of lower priority.
         """
         actorState = self.actorState
 
+        if queueClass is None and priority:
+            queueClass = MsgPriorityQueue
+
         if getattr(actorState, "threads", None) is None:
             restart = False  # nothing to restart!
 
@@ -724,16 +1266,20 @@ class SDSSActor(Actor, metaclass=abc.ABCMeta):
 
             restartQueues = True
 
-        def updateName(g):
-            """re.sub callback to convert master -> master-1; master-3 -> master-4"""
-            try:
-                n = int(g.group(2))
-            except TypeError:
-                n = 0
-            return "%s-%d" % (g.group(1), n + 1)
+        if self.threadSupervisor is None:
+            actorConfig = self.config.get(self.name, None) or {}
+            self.threadSupervisor = ThreadSupervisor(
+                restartDead=actorConfig.get("restartDeadThreads", True),
+                onRestart=self.threadRestarted,
+            )
+            self.threadSupervisor.start()
+            reactor.addSystemEventTrigger(
+                "before", "shutdown", self.threadSupervisor.stop
+            )
 
         newQueues = {}
         threadsToStart = []
+        stopping = []
         for tname, tid, thread in self.threadList:
             if queueClass is None or queueClass is queue.Queue:
                 newQueues[tid] = (
@@ -757,30 +1303,36 @@ class SDSSActor(Actor, metaclass=abc.ABCMeta):
 
             if restart:
                 importlib.reload(threadModule)
+                if inspect.ismodule(thread):
+                    threadTarget = thread.main
+                else:
+                    threadTarget = getattr(threadModule, thread.__name__, thread)
 
+                # Tell every old thread to stop; they are all waited for below.
                 for t in threading.enumerate():
                     if re.search(
                         r"^%s(-\d+)?$" % tname, t.name
                     ):  # a thread of the proper type
-                        actorState.queues[tid].flush()
+                        flushQueue(actorState.queues[tid])
                         actorState.queues[tid].put(Msg(Msg.EXIT, cmd=cmd))
+                        stopping.append((tname, t))
 
-                        t.join(1.0)
-                        if t.isAlive():
-                            if cmd:
-                                cmd.inform('text="Failed to kill %s"' % tname)
+                tname = nextThreadName(actorState.threads[tid].name)
 
-                tname = re.sub(
-                    r"^([^\d]*)(?:-(\d*))?$", updateName, actorState.threads[tid].name
-                )
-
-            actorState.threads[tid] = threading.Thread(
-                target=threadTarget, name=tname, args=[actorState.actor, newQueues]
+            actorState.threads[tid] = self.threadSupervisor.makeThread(
+                tid, tname, threadTarget, (actorState.actor, newQueues), newQueues[tid]
             )
-            actorState.threads[tid].daemon = True
 
             threadsToStart.append(actorState.threads[tid])
 
+        # Wait for the old threads together, rather than for each in turn.
+        deadline = time.monotonic() + 1.0
+        for tname, t in stopping:
+            t.join(max(0.0, deadline - time.monotonic()))
+            if t.is_alive():
+                if cmd:
+                    cmd.inform('text="Failed to kill %s"' % tname)
+
         # Switch to the new queues now that we've sent EXIT to the old ones
         for tid, q in list(newQueues.items()):
             actorState.queues[tid] = q
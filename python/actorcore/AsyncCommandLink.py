@@ -0,0 +1,219 @@
+""" AsyncCommandLink.py -- an asyncio backend for the actor command port.
+
+    Serves the same CommandLink protocol as CommandLinkManager.listen, but from
+    an asyncio event loop running in its own thread instead of from the twisted
+    reactor. Select it with "backend: asyncio" in the tron configuration section.
+    uvloop is used if it is installed.
+
+    Only the incoming command connections move to asyncio: the connection we
+    make to the hub (CmdrConnection) still runs in the twisted reactor, and new
+    commands are handed to the actor in the reactor thread, as with the twisted
+    backend.
+
+"""
+
+__all__ = ["AsyncCommandLink", "AsyncCommandLinkManager", "listen"]
+
+import asyncio
+import logging
+import threading
+
+from twisted.internet import reactor
+
+from actorcore.CommandLink import CommandLink
+from actorcore.CommandLinkManager import CommandLinkManager
+
+
+actorLogger = logging.getLogger("actor")
+
+
+class AsyncioTransport(object):
+    """Give an asyncio transport the bits of the twisted ITransport CommandLink uses."""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    @property
+    def disconnecting(self):
+        return self.transport.is_closing()
+
+    def write(self, data):
+        self.transport.write(data)
+
+    def writeSequence(self, seq):
+        self.transport.writelines(seq)
+
+    def loseConnection(self):
+        self.transport.close()
+
+    def abortConnection(self):
+        self.transport.abort()
+
+    def registerProducer(self, producer, streaming):
+        """asyncio tells the protocol about flow control directly."""
+        pass
+
+    def getPeer(self):
+        return self.transport.get_extra_info("peername")
+
+
+class AsyncCommandLink(CommandLink, asyncio.Protocol):
+    """A CommandLink driven by an asyncio event loop."""
+
+    def __init__(self, brains, connID, loop, **kwargs):
+        CommandLink.__init__(self, brains, connID, **kwargs)
+        self.loop = loop
+
+    # asyncio.Protocol
+
+    def connection_made(self, transport):
+        self.transport = AsyncioTransport(transport)
+        self.connected = 1
+        self.connectionMade()
+
+    def data_received(self, data):
+        self.dataReceived(data)
+
+    def connection_lost(self, exc):
+        self.connected = 0
+        self.stopProducing()
+        self.connectionLost(exc or "connection closed")
+
+    def pause_writing(self):
+        self.pauseProducing()
+
+    def resume_writing(self):
+        self.resumeProducing()
+
+    # CommandLink threading hooks
+
+    def callFromThread(self, func, *args):
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def inIOThread(self):
+        return threading.current_thread() is self.factory.thread
+
+    def dispatchCmd(self, cmd):
+        """Hand the command to the brains in the reactor thread, like CommandLink."""
+
+        reactor.callFromThread(CommandLink.dispatchCmd, self, cmd)
+
+
+class AsyncCommandLinkManager(CommandLinkManager):
+    """A CommandLinkManager whose connections are served by an asyncio loop."""
+
+    protocol = AsyncCommandLink
+
+    def __init__(self, brains, loop, thread, **kwargs):
+        CommandLinkManager.__init__(self, brains, **kwargs)
+        self.loop = loop
+        self.thread = thread
+        self.server = None
+        self.unixServer = None
+
+    def buildProtocol(self, addr):
+        """Generate a new AsyncCommandLink instance."""
+
+        cid = self.fetchCid()
+        p = self.protocol(
+            brains=self.brains, connID=cid, loop=self.loop, **self.linkOptions
+        )
+        p.factory = self
+
+        self.activeConnections.append(p)
+
+        return p
+
+    def stopListening(self):
+        """Close our listening sockets. Existing connections stay open."""
+
+        for server in self.server, self.unixServer:
+            if server is not None:
+                self.loop.call_soon_threadsafe(server.close)
+
+    def stop(self):
+        """Stop listening, drop all connections and stop the event loop."""
+
+        def _stop():
+            for c in list(self.activeConnections):
+                c.transport.abortConnection()
+            self.loop.stop()
+
+        self.stopListening()
+        self.loop.call_soon_threadsafe(_stop)
+        self.thread.join(5)
+
+
+def newEventLoop(useUvloop=True):
+    """Return a new event loop, from uvloop if it is wanted and installed."""
+
+    if useUvloop:
+        try:
+            import uvloop
+
+            return uvloop.new_event_loop()
+        except ImportError:
+            pass
+
+    return asyncio.new_event_loop()
+
+
+def startEventLoop(loop, name="asyncioCommands"):
+    """Run loop forever in a new daemon thread, and return the thread."""
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+
+    return thread
+
+
+def listen(
+    actor,
+    port,
+    interface="",
+    socketPath=None,
+    routeReplies=True,
+    useUvloop=True,
+    **linkOptions,
+):
+    """Launch an asyncio manager listening on a given interface+port.
+
+    The arguments are the same as for CommandLinkManager.listen. Returns once the
+    sockets are listening; the event loop runs in a new thread.
+    """
+
+    # Before starting a loop we would have to stop again.
+    AsyncCommandLinkManager.protocol.checkOptions(**linkOptions)
+
+    loop = newEventLoop(useUvloop)
+    thread = startEventLoop(loop)
+
+    mgr = AsyncCommandLinkManager(
+        actor, loop, thread, routeReplies=routeReplies, **linkOptions
+    )
+
+    def factory():
+        return mgr.buildProtocol(None)
+
+    async def startServers():
+        mgr.server = await loop.create_server(factory, interface or None, port)
+        if socketPath:
+            mgr.unixServer = await loop.create_unix_server(factory, socketPath)
+
+    try:
+        asyncio.run_coroutine_threadsafe(startServers(), loop).result()
+    except Exception:
+        mgr.stop()
+        raise
+
+    actorLogger.info(
+        "listening for commands on %s with %s",
+        [s.getsockname() for s in mgr.server.sockets],
+        type(loop).__module__,
+    )
+
+    return mgr
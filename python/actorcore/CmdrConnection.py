@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import queue
 import sys
@@ -186,6 +187,29 @@ class Cmdr(object):
         self.logger.info("command %s returned " % (ret))
         return ret
 
+    async def acall(self, **argv):
+        """Send a command and wait for what call() would return, in an event loop.
+
+        For async def command handlers: the loop runs other commands while this one
+        waits for its reply.
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def setResult(ret):
+            if not future.done():
+                future.set_result(ret)
+
+        self.logger.info("queueing command %s" % (argv))
+        argv["callFunc"] = lambda ret: loop.call_soon_threadsafe(setResult, ret)
+        cmdvar = opsKeyvar.CmdVar(**argv)
+        reactor.callFromThread(self.dispatcher.executeCmd, cmdvar)
+
+        ret = await future
+        self.logger.info("command %s returned " % (ret))
+        return ret
+
     def cmdq(self, **argv):
         """Send a command and return a Queue on which the command output will be put."""
         self.logger.info("queueing command %s" % (argv))
@@ -0,0 +1,99 @@
+""" CommandCache.py -- remember recently validated command strings.
+
+    Matching a command string against the vocabulary means parsing it and
+    trying it on the verb's consumers, which costs far more than copying the
+    result. Most actor traffic repeats a few strings ("status", "ping"), so the
+    actor keeps the last few validated commands, keyed by their raw string, and
+    hands out copies of them.
+
+    The cache must be cleared whenever the vocabulary or the command keys
+    change; Actor.attachCmdSet does that.
+
+"""
+
+__all__ = ["CommandCache"]
+
+import collections
+import threading
+
+
+class CommandCache(object):
+    """A bounded LRU cache of raw command string -> (validated command, callbacks)."""
+
+    def __init__(self, maxSize=256):
+        """Keep up to maxSize commands. A maxSize of 0 disables the cache."""
+
+        self.maxSize = max(0, int(maxSize))
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+
+        # Bumped by clear(), so that a match made against the old vocabulary is
+        # not stored after the vocabulary has changed.
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cmdStr):
+        """Return a copy of the validated command and its callbacks, or None."""
+
+        if not self.maxSize:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(cmdStr)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(cmdStr)
+            self.hits += 1
+
+        validatedCmd, cmdFuncs = entry
+        return _copyCmd(validatedCmd), list(cmdFuncs)
+
+    def put(self, cmdStr, validatedCmd, cmdFuncs, generation=None):
+        """Remember a validated command.
+
+        Args:
+            cmdStr - the raw command string
+            validatedCmd - what handler.match() returned for it
+            cmdFuncs - the callbacks handler.match() returned for it
+            generation - the value of .generation when the match started. If the
+                cache has been cleared since, the command is not stored.
+        """
+
+        if not self.maxSize:
+            return
+
+        entry = (_copyCmd(validatedCmd), tuple(cmdFuncs))
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[cmdStr] = entry
+            self.entries.move_to_end(cmdStr)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every command, e.g. because the vocabulary has changed."""
+
+        with self.lock:
+            self.entries = collections.OrderedDict()
+            self.generation += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                size=len(self.entries),
+                maxSize=self.maxSize,
+                hits=self.hits,
+                misses=self.misses,
+            )
+
+
+def _copyCmd(validatedCmd):
+    """Copy a validated opscore Command, which .clone() does not quite do."""
+
+    new = validatedCmd.clone()
+    new.extra_keywords = list(getattr(validatedCmd, "extra_keywords", []))
+    return new
@@ -1,12 +1,19 @@
-__all__ = ["CommandLink"]
+__all__ = ["CommandLink", "encodeResponse", "replyKeywords"]
 
+import collections
+import fnmatch
+import heapq
+import itertools
 import logging
 import re
 import sys
 import threading
 
 from twisted.internet import reactor
+from twisted.internet.interfaces import IPushProducer
 from twisted.protocols.basic import LineReceiver
+from twisted.python.threadable import isInIOThread
+from zope.interface import implementer
 
 from opscore.utility.qstr import qstr
 from opscore.utility.tback import tback
@@ -18,6 +25,31 @@ actorLogger = logging.getLogger("actor")
 cmdLogger = logging.getLogger("cmds")
 
 
+def encodeResponse(cmd, flag, response):
+    """Log a reply line and return it encoded for the wire."""
+
+    e = "%d %d %s %s\n" % (cmd.cid, cmd.mid, flag, response)
+    cmdLogger.info("> %s", e[:-1])
+    return e.encode(sys.getdefaultencoding())
+
+
+# Matches either a whole quoted string, which we skip, or the name of a keyword
+# at the start of the reply or after a ';'.
+_keywordRe = re.compile(
+    r"""
+    "(?:[^"\\]|\\.)*" | '(?:[^'\\]|\\.)*'
+    | (?:^|;)\s*(?P<name>[a-z_][a-z0-9_]*)""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def replyKeywords(response):
+    """Return the list of keyword names in a reply string."""
+
+    return [m.group("name") for m in _keywordRe.finditer(response) if m.group("name")]
+
+
+@implementer(IPushProducer)
 class CommandLink(LineReceiver):
 
     # How we match a command...
@@ -33,16 +65,95 @@ class CommandLink(LineReceiver):
         re.IGNORECASE | re.VERBOSE,
     )
 
-    def __init__(self, brains, connID, eol=b"\n"):
-        """Receives what should be atomic commands, parses them, and passes them on."""
+    # Longest command line we accept, in bytes. Longer lines are discarded.
+    MAX_LENGTH = 16384
+
+    # Limits on output waiting for a slow reader, 0 meaning unlimited, and what
+    # to do when they are reached:
+    #    "drop"       - discard the oldest queued broadcast lines; if only
+    #                   replies are left, which are never dropped, disconnect.
+    #    "block"      - make the replying thread wait, for at most BLOCK_TIMEOUT
+    #                   seconds, then disconnect. Never blocks the reactor thread,
+    #                   which falls back to "drop".
+    #    "disconnect" - drop the connection.
+    MAX_QUEUE_LINES = 100000
+    MAX_QUEUE_BYTES = 16 * 1024 * 1024
+    QUEUE_POLICIES = ("drop", "block", "disconnect")
+    QUEUE_POLICY = "drop"
+    BLOCK_TIMEOUT = 30.0
+
+    def __init__(
+        self,
+        brains,
+        connID,
+        eol=b"\n",
+        maxLineLength=None,
+        maxQueueLines=None,
+        maxQueueBytes=None,
+        queuePolicy=None,
+    ):
+        """Receives what should be atomic commands, parses them, and passes them on.
+
+        Args:
+           brains        - the object which operates on new Commands.
+           connID        - our connection ID.
+           eol           - the command delimiter.
+           maxLineLength - if set, overrides MAX_LENGTH for this connection.
+           maxQueueLines - if not None, overrides MAX_QUEUE_LINES.
+           maxQueueBytes - if not None, overrides MAX_QUEUE_BYTES.
+           queuePolicy   - if set, overrides QUEUE_POLICY.
+        """
         # LineReceiver.__init__(self) # How can they live without?
 
         self.brains = brains
         self.connID = connID
         self.delimiter = eol
         self.delimiterChecked = False
-        self.outputQueue = []
+        if maxLineLength:
+            self.MAX_LENGTH = int(maxLineLength)
+
+        # Bytes received but not yet terminated by a delimiter, and whether we
+        # are throwing away the rest of an overlong line.
+        self.recvBuffer = bytearray()
+        self.discarding = False
+        # (seq, line) pairs waiting to be written: replies to commands, and
+        # broadcasts, which we may drop. seq restores their order on output.
+        self.outputQueue = collections.deque()
+        self.broadcastQueue = collections.deque()
+        self.outputSeq = itertools.count()
         self.outputQueueLock = threading.Lock()
+        self.outputQueueCond = threading.Condition(self.outputQueueLock)
+
+        # Set while a sendQueuedResponses() call is pending in the reactor, so that
+        # a burst of replies only costs a single wakeup and a single write.
+        self.flushPending = False
+
+        if maxQueueLines is not None:
+            self.MAX_QUEUE_LINES = int(maxQueueLines)
+        if maxQueueBytes is not None:
+            self.MAX_QUEUE_BYTES = int(maxQueueBytes)
+        self.setQueuePolicy(queuePolicy or self.QUEUE_POLICY)
+
+        # Set by the transport when its own buffer is full, and once we have
+        # given up on the connection.
+        self.writePaused = False
+        self.outputClosed = False
+
+        # Output accounting, see queueStats()
+        self.queuedBytes = 0
+        self.highWater = 0
+        self.droppedLines = 0
+        self.droppedBytes = 0
+        self.pauseCount = 0
+        # Set while we are over our limits, so that we only warn once.
+        self.overflowing = False
+
+        # If set, we also get replies to commands from other connections.
+        self.subscribeAll = False
+
+        # If set, a compiled pattern: we only get broadcasts and other
+        # connections' replies which have a keyword it matches.
+        self.keywordFilter = None
 
         self.mid = 1  # In case we need to self-assign MIDs
 
@@ -50,33 +161,79 @@ class CommandLink(LineReceiver):
         """Called when our connection has been established."""
 
         actorLogger.debug("new CommandNub")
+
+        # Have the transport tell us when the other end stops reading.
+        self.transport.registerProducer(self, True)
+
         cmdrName = "self.%d" % self.connID
         cmd = Command(self.factory, cmdrName, self.connID, 0, "")
         cmd.finish("yourUserNum=%d" % self.connID)
 
-    def dataReceived(self, cmdString):
-        """Called when a complete line has been read from the hub.
-
-        This used to be lineReceived but something changed in Twisted ...
-        Also, dealing with Unicode vs bytes.
+    def dataReceived(self, data):
+        """Called by twisted with whatever bytes arrived on the connection.
 
+        A single read can hold several pipelined commands, or only part of one,
+        so we accumulate into recvBuffer and hand every complete line to
+        lineReceived() in one pass.
         """
 
-        # Deal with unicode
-        cmdString = cmdString.decode().strip()
+        buf = self.recvBuffer
+        buf += data
+
+        delimiter = self.delimiter
+        delimLen = len(delimiter)
+        start = 0
+        while True:
+            end = buf.find(delimiter, start)
+            if end < 0:
+                break
+            if self.discarding:
+                # The tail of a line we already complained about.
+                self.discarding = False
+            elif end - start > self.MAX_LENGTH:
+                self.lineLengthExceeded(end - start)
+            else:
+                self.lineReceived(buf[start:end])
+            start = end + delimLen
+            if self.transport is not None and self.transport.disconnecting:
+                break
+
+        if start:
+            del buf[:start]
+        if len(buf) > self.MAX_LENGTH:
+            if not self.discarding:
+                self.lineLengthExceeded(len(buf))
+                self.discarding = True
+            del buf[:]
+
+    def lineLengthExceeded(self, length):
+        """Called when a command line longer than MAX_LENGTH is seen. It is dropped."""
+
+        self.brains.bcast.warn(
+            "text=%s"
+            % (
+                qstr(
+                    "command ignored: %d bytes is longer than %d"
+                    % (length, self.MAX_LENGTH)
+                )
+            )
+        )
+        cmdLogger.critical(
+            "dropping %d byte command line on connection %d", length, self.connID
+        )
+
+    def lineReceived(self, line):
+        """Called with each complete line (without its delimiter) read from the hub.
+
+        Also, dealing with Unicode vs bytes.
 
-        # NOTE: JSG - I'm commenting this since I'm not sure what's the point.
-        # It doesn't seem to deal with the delimiters for each message received;
-        # maybe something has happened with Twisted. It seems just stripping
-        # does work fine ...
+        """
 
-        # Telnet connections send back '\r\n'. Or worse, I fear. Try to make
-        # those connections work just like properly formatted ones.
-        # if not self.delimiterChecked:
-        #     while len(cmdString) > 0 and cmdString[-1] < ' ':
-        #         self.delimiter = cmdString[-1] + self.delimiter
-        #         cmdString = cmdString[:-1]
-        #     self.delimiterChecked = True
+        # Deal with unicode. Telnet connections send back '\r\n', which the
+        # strip also takes care of.
+        cmdString = line.decode().strip()
+        if not cmdString:
+            return
 
         # Parse the header...
         m = self.cmdRe.match(cmdString)
@@ -115,38 +272,285 @@ class CommandLink(LineReceiver):
             cmd = Command(
                 self.factory, cmdrName, self.connID, mid, cmdDict["cmdString"]
             )
+        except Exception as e:
+            self.cannotProcess(cmdDict["cmdString"], e)
+            return
+        self.dispatchCmd(cmd)
+
+    def dispatchCmd(self, cmd):
+        """Hand a new command to the brains, which expect it in the reactor thread."""
+
+        try:
             self.brains.newCmd(cmd)
         except Exception as e:
-            self.brains.bcast.fail(
-                "text=%s"
-                % (
-                    qstr(
-                        "cannot process command: %s (exception=%s)"
-                        % (cmdDict["cmdString"], e)
-                    )
-                )
-            )
-            cmdLogger.warn(tback("lineReceived", e))
+            self.cannotProcess(cmd.rawCmd, e)
+
+    def cannotProcess(self, cmdString, e):
+        self.brains.bcast.fail(
+            "text=%s"
+            % (qstr("cannot process command: %s (exception=%s)" % (cmdString, e)))
+        )
+        cmdLogger.warn(tback("lineReceived", e))
 
     def sendQueuedResponses(self):
         """Method for the twisted reactor to call when we tell
-        it there is output from this thread."""
+        it there is output from this thread.
 
-        cmdLogger.debug("flushing queue to all outputs...")
-        with self.outputQueueLock:
-            while len(self.outputQueue) > 0:
-                e = self.outputQueue.pop(0).encode(sys.getdefaultencoding())
-                cmdLogger.debug("flushing queue line: %s" % (e[:-1].decode()))
-                self.transport.write(e)
+        Drains everything queued since the last flush with a single write,
+        unless the transport has asked us to hold off.
+        """
+
+        with self.outputQueueCond:
+            self.flushPending = False
+            if self.writePaused or self.outputClosed or not self._queuedLines():
+                return
+            lines = [
+                line for _, line in heapq.merge(self.outputQueue, self.broadcastQueue)
+            ]
+            self._clearOutput()
+            self.outputQueueCond.notify_all()
+
+        cmdLogger.debug("flushing %d queued lines", len(lines))
+        self.transport.writeSequence(lines)
 
     def sendResponse(self, cmd, flag, response):
         """Ship a command off to the hub."""
 
-        e = "%d %d %s %s\n" % (cmd.cid, cmd.mid, flag, response)
-        cmdLogger.info("> %s" % (e[:-1]))
+        self.queueOutput(encodeResponse(cmd, flag, response), isBroadcast=cmd.cid == 0)
+
+    def queueOutput(self, line, isBroadcast=False):
+        """Queue an encoded reply line, and arrange for it to be written.
+
+        Safe to call from any thread. At most one flush is scheduled in the
+        reactor at any time; lines queued while it is pending go out with it.
+        If the queue is over its limits, apply our queue policy.
+        """
+
+        with self.outputQueueCond:
+            if self.queuePolicy == "block" and not self.inIOThread():
+                self._waitForRoom(len(line))
+            if self.outputClosed:
+                self.droppedLines += 1
+                self.droppedBytes += len(line)
+                return
+
+            queue = self.broadcastQueue if isBroadcast else self.outputQueue
+            queue.append((next(self.outputSeq), line))
+            self.queuedBytes += len(line)
+            if self._queueFull():
+                if self.queuePolicy == "disconnect":
+                    self._closeOutput("output queue overflowed")
+                    return
+                self._dropOldestBroadcasts()
+                if self.outputClosed:
+                    return
+            nLines = self._queuedLines()
+            if nLines > self.highWater:
+                self.highWater = nLines
+
+            if self.flushPending or self.writePaused:
+                return
+            self.flushPending = True
+
+        self.callFromThread(self.sendQueuedResponses)
+
+    def _queueFull(self, extraBytes=0, extraLines=0):
+        """Are we over MAX_QUEUE_LINES or MAX_QUEUE_BYTES? Call with the lock held."""
+
+        if self.MAX_QUEUE_LINES:
+            if self._queuedLines() + extraLines > self.MAX_QUEUE_LINES:
+                return True
+        if self.MAX_QUEUE_BYTES:
+            if self.queuedBytes + extraBytes > self.MAX_QUEUE_BYTES:
+                return True
+        return False
+
+    def _waitForRoom(self, nbytes):
+        """Block the calling thread until nbytes fit in the queue, or disconnect."""
+
+        if not self._queueFull(nbytes, 1):
+            return
+
+        actorLogger.debug(
+            "connection %d output queue is full, blocking %s",
+            self.connID,
+            threading.current_thread().name,
+        )
+        if not self.outputQueueCond.wait_for(
+            lambda: self.outputClosed or not self._queueFull(nbytes, 1),
+            timeout=self.BLOCK_TIMEOUT,
+        ):
+            self._closeOutput("blocked for more than %ss" % (self.BLOCK_TIMEOUT))
+
+    def _queuedLines(self):
+        return len(self.outputQueue) + len(self.broadcastQueue)
+
+    def _clearOutput(self):
+        """Forget everything queued. Call with the lock held."""
+
+        self.outputQueue.clear()
+        self.broadcastQueue.clear()
+        self.queuedBytes = 0
+        self.overflowing = False
+
+    def _dropOldestBroadcasts(self):
+        """Discard broadcast lines, oldest first, until we fit. Call with the lock held.
+
+        Replies to commands are never dropped, since a commander might be
+        waiting for them: if we are still full once all the broadcasts are
+        gone, the reader is not keeping up at all, and we drop the connection.
+        """
+
+        if not self.overflowing:
+            self.overflowing = True
+            actorLogger.warning(
+                "connection %d output queue is full, dropping broadcasts", self.connID
+            )
+
+        queue = self.broadcastQueue
+        while queue and self._queueFull():
+            _, line = queue.popleft()
+            self.queuedBytes -= len(line)
+            self.droppedLines += 1
+            self.droppedBytes += len(line)
+
+        if self._queueFull():
+            self._closeOutput("output queue overflowed with replies")
+
+    def _closeOutput(self, why):
+        """Discard our output and drop the connection. Call with the lock held."""
+
+        if self.outputClosed:
+            return
+
+        actorLogger.warning("dropping connection %d: %s", self.connID, why)
+
+        self.droppedLines += self._queuedLines()
+        self.droppedBytes += self.queuedBytes
+        self._clearOutput()
+        self.outputClosed = True
+        self.outputQueueCond.notify_all()
+
+        self.callFromThread(self.abortConnection)
+
+    def callFromThread(self, func, *args):
+        """Arrange for func to be called in the thread running our connection."""
+
+        reactor.callFromThread(func, *args)
+
+    def inIOThread(self):
+        """Are we running in the thread which runs our connection?"""
+
+        return isInIOThread()
+
+    def abortConnection(self):
+        """Drop the connection without waiting to write anything else."""
+
+        if hasattr(self.transport, "abortConnection"):
+            self.transport.abortConnection()
+        else:
+            self.transport.loseConnection()
+
+    @classmethod
+    def checkOptions(
+        cls,
+        maxLineLength=None,
+        maxQueueLines=None,
+        maxQueueBytes=None,
+        queuePolicy=None,
+    ):
+        """Raise ValueError if new connections cannot be made with these options.
+
+        The arguments are the optional ones of __init__, and the manager checks
+        them once, so that bad configuration fails at startup rather than on
+        every connection.
+        """
+
+        for name, value in (
+            ("maxLineLength", maxLineLength),
+            ("maxQueueLines", maxQueueLines),
+            ("maxQueueBytes", maxQueueBytes),
+        ):
+            if value is None:
+                continue
+            try:
+                int(value)
+            except (TypeError, ValueError):
+                raise ValueError("%s must be an integer, not %r" % (name, value))
+        if queuePolicy and queuePolicy not in cls.QUEUE_POLICIES:
+            raise ValueError("unknown output queue policy: %s" % (queuePolicy))
+
+    def setQueuePolicy(self, policy):
+        """Set what to do when our output queue fills up. See QUEUE_POLICY."""
+
+        if policy not in self.QUEUE_POLICIES:
+            raise ValueError("unknown output queue policy: %s" % (policy))
+        self.queuePolicy = policy
+
+    def setKeywordFilter(self, patterns):
+        """Only forward output from others with keywords matching one of patterns.
+
+        Args:
+           patterns - a list of case-insensitive glob patterns, e.g. ['axePos*'].
+                      Empty or None removes the filter.
+        """
+
+        if not patterns:
+            self.keywordFilter = None
+            return
+
+        self.keywordFilter = re.compile(
+            "|".join(fnmatch.translate(p) for p in patterns), re.IGNORECASE
+        )
+
+    def wantsKeywords(self, names):
+        """Does our keyword filter pass a reply with the given keyword names?"""
+
+        match = self.keywordFilter.match
+        for name in names:
+            if match(name):
+                return True
+        return False
+
+    def queueStats(self):
+        """Return a dictionary describing the state of our output queue."""
+
+        with self.outputQueueLock:
+            return dict(
+                connID=self.connID,
+                lines=self._queuedLines(),
+                bytes=self.queuedBytes,
+                highWater=self.highWater,
+                droppedLines=self.droppedLines,
+                droppedBytes=self.droppedBytes,
+                pauses=self.pauseCount,
+                paused=self.writePaused,
+                policy=self.queuePolicy,
+            )
+
+    # IPushProducer, for our transport: these pause and resume *output*.
+
+    def pauseProducing(self):
+        """Called by the transport when its write buffer is full."""
+
+        with self.outputQueueLock:
+            self.writePaused = True
+            self.pauseCount += 1
+
+    def resumeProducing(self):
+        """Called by the transport when its write buffer has drained."""
+
         with self.outputQueueLock:
-            self.outputQueue.append(e)
-        reactor.callFromThread(self.sendQueuedResponses)
+            self.writePaused = False
+        self.sendQueuedResponses()
+
+    def stopProducing(self):
+        """Called by the transport when the connection is going away."""
+
+        with self.outputQueueCond:
+            self.outputClosed = True
+            self._clearOutput()
+            self.outputQueueCond.notify_all()
 
     def shutdown(self, why="cuz"):
         """Called from above when we want to drop the connection."""
@@ -4,7 +4,7 @@ import logging
 
 from twisted.internet.protocol import Factory
 
-from actorcore.CommandLink import CommandLink
+from actorcore.CommandLink import CommandLink, encodeResponse, replyKeywords
 
 
 class CommandLinkManager(Factory):
@@ -12,24 +12,40 @@ class CommandLinkManager(Factory):
 
     protocol = CommandLink
 
-    def __init__(self, brains, protocolName="CommandLink"):
+    def __init__(
+        self, brains, protocolName="CommandLink", routeReplies=True, **linkOptions
+    ):
         """Manage a dynamic set of CommandLinks.
 
         Args:
            brains  - the object which operates on new Commands. Simply passed in to the
                      CommandLink objects.
+           routeReplies - if True, replies to a command only go to the connection
+                     it came from (and to connections subscribed to everything).
+                     Broadcasts always go to all connections.
+           linkOptions - passed to each new CommandLink: maxLineLength,
+                     maxQueueLines, maxQueueBytes, queuePolicy.
 
         We track all the protocol instances here, so that we can output replies on all active
         connections.
         """
         # Factory.__init__(self)   # snarl: twisted uses old-style classes...
 
+        # Fail now, not on each connection.
+        self.protocol.checkOptions(**linkOptions)
+
         self.brains = brains
         self.protocolName = protocolName
+        self.routeReplies = routeReplies
+        self.linkOptions = linkOptions
 
         self.activeConnections = []
         self.connID = 1
 
+        # Set by listen()
+        self.port = None
+        self.unixPort = None
+
         super().__init__()
 
     def fetchCid(self):
@@ -54,7 +70,7 @@ class CommandLinkManager(Factory):
         #    self.protocol = proto
 
         cid = self.fetchCid()
-        p = self.protocol(brains=self.brains, connID=cid)
+        p = self.protocol(brains=self.brains, connID=cid, **self.linkOptions)
         p.factory = self
 
         self.activeConnections.append(p)
@@ -69,24 +85,81 @@ class CommandLinkManager(Factory):
         except ValueError as e:
             raise e
 
-    def sendResponse(self, cmd, flag, response):
-        """Ship a response off to all connections."""
+    def getConnection(self, cid):
+        """Return the active connection with the given ID, or None."""
 
         for c in self.activeConnections:
-            try:
-                c.sendResponse(cmd, flag, response)
-            except Exception as e:
-                raise e
+            if c.connID == cid:
+                return c
+        return None
+
+    def sendResponse(self, cmd, flag, response):
+        """Ship a response off to the connections which want it.
+
+        Broadcasts (cid 0) go to all connections. If routeReplies is set, other
+        replies go to the connection the command came from, plus any connection
+        subscribed to everything. Replies to commands whose connection is gone,
+        or which never had one (commands we send ourselves), are broadcast.
+
+        Connections with a keyword filter only get the replies to their own
+        commands and other lines with a matching keyword.
+
+        The reply is formatted, logged and encoded once, and the same bytes
+        queued on every connection.
+        """
+
+        line = encodeResponse(cmd, flag, response)
+        isBroadcast = cmd.cid == 0
 
+        conns = list(self.activeConnections)
+        if self.routeReplies and not isBroadcast:
+            owner = self.getConnection(cmd.cid)
+            if owner is not None:
+                conns = [c for c in conns if c is owner or c.subscribeAll]
 
-def listen(actor, port, interface=""):
-    """Launch a manager listening on a given interface+port"""
+        names = None
+        for c in conns:
+            if c.keywordFilter is not None and c.connID != cmd.cid:
+                if names is None:
+                    names = replyKeywords(response)
+                if not c.wantsKeywords(names):
+                    continue
+            c.queueOutput(line, isBroadcast=isBroadcast)
+
+    def stopListening(self):
+        """Close our listening ports. Existing connections stay open."""
+
+        for port in self.port, self.unixPort:
+            if port is not None:
+                port.stopListening()
+
+    def queueStats(self):
+        """Return the output queue statistics of all our connections."""
+
+        return [c.queueStats() for c in self.activeConnections]
+
+
+def listen(
+    actor, port, interface="", socketPath=None, routeReplies=True, **linkOptions
+):
+    """Launch a manager listening on a given interface+port
+
+    If socketPath is set, also listen on that Unix-domain socket, for clients on
+    the same machine. Both serve the same CommandLinks.
+    """
 
     from twisted.internet import reactor
 
-    mgr = CommandLinkManager(actor)
+    mgr = CommandLinkManager(actor, routeReplies=routeReplies, **linkOptions)
     port = reactor.listenTCP(port, mgr, interface=interface)
     mgr.port = port
+
+    if socketPath:
+        # wantPID takes a lock next to the socket and removes a stale one.
+        mgr.unixPort = reactor.listenUNIX(socketPath, mgr, mode=0o660, wantPID=True)
+    else:
+        mgr.unixPort = None
+
     return mgr
 
 
@@ -0,0 +1,65 @@
+""" CommandLoop.py -- run async def command handlers on an asyncio event loop.
+
+    A vocabulary callback may be an "async def" function. Commands with such a
+    callback are not run by the thread which dispatches them: they are scheduled
+    on a CommandLoop, an asyncio event loop with its own thread, and the
+    dispatching thread moves on. Any number of commands can then wait (e.g. on
+    "await asyncio.sleep()" or Cmdr.acall()) without each needing a thread.
+
+    They still keep to their concurrency group (see CommandPool): until one
+    finishes, the commands its group would hold up wait for it, as they would
+    for a plain callback. Without a CommandPool, that is every later command.
+
+    The actor creates its CommandLoop when it first attaches an async handler,
+    and stops it when the reactor shuts down.
+
+"""
+
+__all__ = ["CommandLoop"]
+
+import asyncio
+import logging
+import threading
+
+from actorcore.AsyncCommandLink import newEventLoop, startEventLoop
+
+
+actorLogger = logging.getLogger("actor")
+
+
+class CommandLoop(object):
+    def __init__(self, name="asyncCommands", useUvloop=False):
+        """Start a new event loop, in a new thread called name."""
+
+        self.loop = newEventLoop(useUvloop)
+        self.thread = startEventLoop(self.loop, name=name)
+
+        # The futures of the coroutines which have not finished yet.
+        self.lock = threading.Lock()
+        self.pending = set()
+
+    def submit(self, coro):
+        """Schedule coro on the loop, and return its concurrent.futures.Future."""
+
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._done)
+
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.pending.discard(future)
+
+    def stop(self):
+        """Stop the loop, abandoning any coroutines still waiting."""
+
+        with self.lock:
+            if self.pending:
+                actorLogger.warning(
+                    "stopping with %d async commands still running", len(self.pending)
+                )
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
@@ -0,0 +1,142 @@
+""" CommandPool.py -- run actor commands on a pool of worker threads.
+
+    Every command runs in a concurrency group, declared by its vocabulary entry:
+
+      "serial"   - the default. Serial commands run one at a time, in order,
+                   exactly as when the actor had a single command thread.
+      "parallel" - run as soon as a worker is free, alongside anything else.
+      any other  - a named lock: commands in the same group run one at a time,
+                   but alongside commands of other groups.
+
+    Commands waiting for their group do not hold a worker: only runnable
+    commands are queued for the workers.
+
+    A command which returns a concurrent.futures.Future (one with async def
+    callbacks, running on the actor's CommandLoop) keeps its group until the
+    future is done, but gives its worker back at once.
+
+"""
+
+__all__ = ["CommandPool", "SERIAL", "PARALLEL"]
+
+import collections
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+
+
+SERIAL = "serial"
+PARALLEL = "parallel"
+
+actorLogger = logging.getLogger("actor")
+
+
+class CommandGroup(object):
+    """The state and queue-wait statistics of one concurrency group."""
+
+    def __init__(self, name):
+        self.name = name
+        self.serialized = name != PARALLEL
+
+        # Commands waiting for the group to be free, and how many are running.
+        self.pending = collections.deque()
+        self.running = 0
+
+        self.count = 0
+        self.totalWait = 0.0
+        self.maxWait = 0.0
+
+    def stats(self):
+        return dict(
+            name=self.name,
+            count=self.count,
+            running=self.running,
+            pending=len(self.pending),
+            meanWait=self.totalWait / self.count if self.count else 0.0,
+            maxWait=self.maxWait,
+        )
+
+
+class CommandPool(object):
+    def __init__(self, nThreads, name="cmdPool"):
+        """Start nThreads workers, named name-0, name-1, ..."""
+
+        self.lock = threading.Lock()
+        self.groups = {}
+        self.ready = queue.Queue()
+
+        self.threads = []
+        for i in range(nThreads):
+            t = threading.Thread(
+                target=self.worker, name="%s-%d" % (name, i), daemon=True
+            )
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, groupName, func, *args):
+        """Run func(*args) on a worker, once groupName allows it.
+
+        If func returns a concurrent.futures.Future, groupName is only released
+        once the future is done.
+        """
+
+        job = (groupName, func, args, time.monotonic())
+        with self.lock:
+            group = self.groups.get(groupName)
+            if group is None:
+                group = self.groups[groupName] = CommandGroup(groupName)
+            if group.serialized and group.running:
+                group.pending.append(job)
+                return
+            group.running += 1
+        self.ready.put(job)
+
+    def worker(self):
+        while True:
+            job = self.ready.get()
+            if job is None:
+                return
+            groupName, func, args, queuedAt = job
+            wait = time.monotonic() - queuedAt
+
+            with self.lock:
+                group = self.groups[groupName]
+                group.count += 1
+                group.totalWait += wait
+                if wait > group.maxWait:
+                    group.maxWait = wait
+
+            result = None
+            try:
+                result = func(*args)
+            except Exception as e:
+                actorLogger.error("uncaught exception in %s: %s", groupName, e)
+
+            if isinstance(result, concurrent.futures.Future):
+                result.add_done_callback(lambda f, group=group: self.release(group))
+            else:
+                self.release(group)
+
+    def release(self, group):
+        """A command of group has finished."""
+
+        with self.lock:
+            if group.serialized and group.pending:
+                # Hand the group straight to its next command.
+                self.ready.put(group.pending.popleft())
+            else:
+                group.running -= 1
+
+    def stats(self):
+        """Return a list of per-group statistics dictionaries."""
+
+        with self.lock:
+            return [g.stats() for g in self.groups.values()]
+
+    def stop(self):
+        """Stop the workers once they have finished the commands queued so far."""
+
+        for _ in self.threads:
+            self.ready.put(None)
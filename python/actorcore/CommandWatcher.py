@@ -0,0 +1,206 @@
+""" CommandWatcher.py -- re-attach command sets whose source files change.
+
+    With "watchCommands: true" in the actor's configuration section, the actor
+    watches the actorcore and product Commands directories, and re-attaches a
+    command set as soon as its file changes, instead of the developer having to
+    "reload" every command set. Only the changed set is imported again; the
+    actor swaps its consumers in one step, and commands already running carry
+    on with the old callbacks.
+
+    On Linux the directories are watched with inotify, so changes are seen at
+    once; elsewhere, or if inotify cannot be used, they are polled every
+    "watchInterval" seconds (default 1). Either way the files are compared by
+    mtime and size, so a change is only acted on once.
+
+    A file which fails to import is reported, and the old command set kept.
+
+"""
+
+__all__ = ["CommandWatcher"]
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import re
+import select
+import sys
+import threading
+import time
+
+
+actorLogger = logging.getLogger("actor")
+
+CMDSET_FILE = re.compile(r"^([a-zA-Z][a-zA-Z0-9_-]*Cmd(_[a-zA-Z0-9]+)?)\.py$")
+
+# IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+INOTIFY_MASK = 0x2 | 0x8 | 0x80 | 0x100
+
+# How long to let an editor finish writing, after the first inotify event.
+SETTLE_TIME = 0.05
+
+
+def inotifyWatch(paths):
+    """Return an inotify file descriptor watching the directories, or None."""
+
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        for path in paths:
+            if libc.inotify_add_watch(fd, os.fsencode(path), INOTIFY_MASK) < 0:
+                os.close(fd)
+                return None
+    except (OSError, AttributeError):
+        return None
+
+    return fd
+
+
+class CommandWatcher(object):
+    def __init__(self, actor, paths, interval=1.0, useInotify=True):
+        """Watch the command set files in the directories paths.
+
+        Args:
+            actor - the Actor to re-attach the command sets of.
+            paths - the directories to watch, in the order attachAllCmdSets
+                loads them: a set found in more than one comes from the last.
+            interval - how often to poll, in seconds, without inotify.
+            useInotify - use inotify if it is available.
+        """
+
+        self.actor = actor
+        self.paths = [p for p in paths if os.path.isdir(p)]
+        self.interval = interval
+
+        # cname: (seconds to re-attach, seconds from the file change to done)
+        self.reloads = {}
+
+        self.stamps = self.scan()
+        self.fd = inotifyWatch(self.paths) if useInotify else None
+        self.fdLock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name="commandWatcher", daemon=True
+        )
+
+    def start(self):
+        actorLogger.info(
+            "watching %s for command set changes, %s",
+            self.paths,
+            "with inotify" if self.fd is not None else "every %gs" % (self.interval),
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stopEvent.set()
+        if self.thread.is_alive():
+            self.thread.join(self.interval + 1)
+        # If it is still running, the thread closes the fd when it exits.
+        if not self.thread.is_alive():
+            self.closeInotify()
+
+    def closeInotify(self):
+        with self.fdLock:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+    def scan(self):
+        """Return {cname: (path, mtime_ns, size)} of the command set files."""
+
+        stamps = {}
+        for path in self.paths:
+            try:
+                names = os.listdir(path)
+            except OSError:
+                continue
+            for name in names:
+                match = CMDSET_FILE.match(name)
+                if not match:
+                    continue
+                try:
+                    st = os.stat(os.path.join(path, name))
+                except OSError:
+                    continue
+                stamps[match.group(1)] = (path, st.st_mtime_ns, st.st_size)
+
+        return stamps
+
+    def check(self):
+        """Re-attach the known command sets whose files have changed.
+
+        Returns the names of the command sets re-attached.
+        """
+
+        stamps = self.scan()
+        known = set(self.actor.commandSets) | set(self.actor.deferredCmdSets)
+        changed = [
+            cname
+            for cname, stamp in stamps.items()
+            if cname in known and stamp != self.stamps.get(cname)
+        ]
+        self.stamps = stamps
+
+        reloaded = []
+        for cname in sorted(changed):
+            path, mtime_ns, size = stamps[cname]
+            t0 = time.monotonic()
+            try:
+                # A deferred set is only scanned again, for its verbs.
+                if cname in self.actor.commandSets:
+                    self.actor.attachCmdSet(cname, [path])
+                else:
+                    self.actor.loadCmdSet(cname, [path])
+            except Exception as e:
+                actorLogger.warning(
+                    "failed to re-attach command set %s, keeping the old one: %s",
+                    cname,
+                    e,
+                )
+                continue
+
+            dt = time.monotonic() - t0
+            latency = max(time.time() - mtime_ns / 1e9, dt)
+            self.reloads[cname] = (dt, latency)
+            reloaded.append(cname)
+            actorLogger.info(
+                "re-attached command set %s in %0.3fs, %0.3fs after it changed",
+                cname,
+                dt,
+                latency,
+            )
+
+        return reloaded
+
+    def wait(self):
+        """Wait for an inotify event or the polling interval. Returns False to stop."""
+
+        if self.fd is None:
+            return not self.stopEvent.wait(self.interval)
+
+        # Still wake up now and then, to notice stop().
+        readable, _, _ = select.select([self.fd], [], [], min(self.interval, 1.0))
+        if readable:
+            time.sleep(SETTLE_TIME)
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+        return not self.stopEvent.is_set()
+
+    def run(self):
+        try:
+            while self.wait():
+                try:
+                    self.check()
+                except Exception as e:
+                    actorLogger.warning("command set watcher failed: %s", e)
+        finally:
+            self.closeInotify()
@@ -1,9 +1,8 @@
 #!/usr/bin/env python
 """ Wrap top-level ACTOR functions. """
 
-import configparser
 import importlib
-import logging
+import inspect
 import sys
 import threading
 
@@ -11,10 +10,24 @@ import opscore.protocols.keys as keys
 import opscore.protocols.types as types
 from opscore.utility.qstr import qstr
 
-import actorcore.help as help
+from actorcore.ConfigManager import formatPath
 
 
-importlib.reload(help)
+# actorcore.help, imported (or reloaded, after a "reload" of this module) the
+# first time help is asked for.
+help = None
+
+
+def loadHelp():
+    global help
+
+    if help is None:
+        if "actorcore.help" in sys.modules:
+            help = importlib.reload(sys.modules["actorcore.help"])
+        else:
+            help = importlib.import_module("actorcore.help")
+
+    return help
 
 
 class CoreCmd(object):
@@ -36,6 +49,13 @@ class CoreCmd(object):
             keys.Key("html", help="Generate HTML"),
             keys.Key("full", help="Generta full help for all commands"),
             keys.Key("pageWidth", types.Int(), help="Number of characters per line"),
+            keys.Key("all", help="Receive replies to all commands"),
+            keys.Key("own", help="Receive replies to our own commands only"),
+            keys.Key(
+                "keywords",
+                types.String() * (1, None),
+                help="Keyword names to receive; may use * and ? wildcards",
+            ),
         )
 
         self.vocab = (
@@ -44,6 +64,9 @@ class CoreCmd(object):
             ("reloadConfiguration", "", self.reloadConfiguration),
             ("version", "", self.version),
             ("coreStatus", "", self.coreStatus),
+            ("queueStatus", "", self.queueStatus),
+            ("replies", "@(all|own)", self.setReplies),
+            ("subscribe", "[<keywords>]", self.subscribe),
             ("exitexit", "", self.exitCmd),
             ("ipdb", "", self.ipdbCmd),
             ("ipython", "", self.ipythonCmd),
@@ -59,6 +82,10 @@ class CoreCmd(object):
         # First, report the actor version number.
         self.version(cmd, doFinish=False)
 
+        # We need the vocabulary of every command set.
+        self.actor.attachDeferredCmdSets()
+        help = loadHelp()
+
         if "cmds" in cmd.cmd.keywords:
             cmds = cmd.cmd.keywords["cmds"].values
             fullHelp = True
@@ -138,8 +165,136 @@ class CoreCmd(object):
         for t in threading.enumerate():
             cmd.inform('text="%s"' % t)
 
+        if self.actor.commandPool:
+            for stats in self.actor.commandPool.stats():
+                cmd.inform(
+                    "commandGroup=%s,%d,%d,%d,%0.3f,%0.3f"
+                    % (
+                        qstr(stats["name"]),
+                        stats["count"],
+                        stats["running"],
+                        stats["pending"],
+                        stats["meanWait"],
+                        stats["maxWait"],
+                    )
+                )
+
+        if self.actor.commandLoop:
+            cmd.inform("asyncCommands=%d" % (len(self.actor.commandLoop.pending)))
+
+        timer = self.actor.startupTimer
+        cmd.inform("startupTime=%0.3f" % (timer.total()))
+        if timer.readyAt is not None:
+            cmd.inform("startupReady=%0.3f" % (timer.timeToReady()))
+        for name, dt in timer.phases:
+            cmd.inform("startupPhase=%s,%0.3f" % (qstr(name), dt))
+        for name, (dt, importTime) in self.actor.cmdSetTimes.items():
+            cmd.inform("cmdSetTime=%s,%0.3f,%0.3f" % (qstr(name), dt, importTime))
+        if self.actor.threadSupervisor:
+            for t in self.actor.threadSupervisor.status():
+                cmd.inform(
+                    "threadStatus=%s,%s,%d,%d,%0.3f,%0.6f,%0.3f,%s"
+                    % (
+                        qstr(t["name"]),
+                        t["state"],
+                        t["restarts"],
+                        t["nMsgs"],
+                        t["busyTime"],
+                        t["meanMsgTime"],
+                        t["activityAge"],
+                        "T" if t["busy"] else "F",
+                    )
+                )
+
+        if self.actor.commandWatcher:
+            for name, (dt, latency) in self.actor.commandWatcher.reloads.items():
+                cmd.inform("cmdSetReload=%s,%0.3f,%0.3f" % (qstr(name), dt, latency))
+
+        cmd.inform(
+            "commandCache=%(size)d,%(maxSize)d,%(hits)d,%(misses)d"
+            % self.actor.commandCache.stats()
+        )
+
+        for stats in self.actor.commandSources.queueStats():
+            cmd.inform(
+                "outputQueue=%(connID)d,%(lines)d,%(bytes)d,%(highWater)d,"
+                "%(droppedLines)d,%(pauses)d,%(policy)s" % stats
+            )
+
         self.version(cmd, doFinish=True)
 
+    def queueStatus(self, cmd):
+        """Report the depth, traffic and waits of the command and thread queues.
+
+        Queues which keep statistics (InstrumentedQueue) are reported as
+        queueStatus=name,depth,highWater,puts,gets,wait50,wait90,wait99,rate
+        with the waits in seconds and the rate in items per second; other
+        queues only as queueDepth=name,depth.
+        """
+
+        queues = [("commands", self.actor.commandQueue)]
+        threadQueues = getattr(getattr(self.actor, "actorState", None), "queues", None)
+        for tid, q in sorted((threadQueues or {}).items(), key=lambda t: str(t[0])):
+            queues.append((str(tid), q))
+
+        for name, q in queues:
+            if hasattr(q, "stats"):
+                stats = q.stats()
+                stats["name"] = qstr(name)
+                cmd.inform(
+                    "queueStatus=%(name)s,%(depth)d,%(highWater)d,%(puts)d,%(gets)d,"
+                    "%(wait50)0.6f,%(wait90)0.6f,%(wait99)0.6f,%(rate)0.1f" % stats
+                )
+            else:
+                cmd.inform("queueDepth=%s,%d" % (qstr(name), q.qsize()))
+
+        cmd.finish()
+
+    def setReplies(self, cmd):
+        """Choose whether this connection gets replies to all commands or only its own.
+
+        Broadcasts are always sent to all connections.
+        """
+
+        link = self.actor.commandSources.getConnection(cmd.cid)
+        if link is None:
+            cmd.fail('text="this command did not come from a connection"')
+            return
+
+        link.subscribeAll = "all" in cmd.cmd.keywords
+        cmd.finish(
+            'text="connection %d gets replies to %s commands"'
+            % (link.connID, "all" if link.subscribeAll else "its own")
+        )
+
+    def subscribe(self, cmd):
+        """Only send this connection output from others with one of the given keywords.
+
+        Replies to this connection's own commands are always sent. With no
+        keywords, remove the filter and receive everything again.
+        """
+
+        link = self.actor.commandSources.getConnection(cmd.cid)
+        if link is None:
+            cmd.fail('text="this command did not come from a connection"')
+            return
+
+        if "keywords" in cmd.cmd.keywords:
+            patterns = list(cmd.cmd.keywords["keywords"].values)
+        else:
+            patterns = []
+
+        try:
+            link.setKeywordFilter(patterns)
+        except Exception as e:
+            cmd.fail("text=%s" % (qstr("bad keyword patterns: %s" % (e))))
+            return
+
+        cmd.finish(
+            "text=%s"
+            % (qstr("connection %d keywords: %s" % (link.connID, patterns or "all")))
+        )
+
     def reloadCommands(self, cmd):
         """If cmds defined, define the listed commands, otherwise reload all command sets."""
 
@@ -160,18 +315,18 @@ class CoreCmd(object):
     def reloadConfiguration(self, cmd):
         """Reload the configuration.
 
-        Note that only some configuration variables will take effect, depending on how
-        they are used. Read the Source, etc.
+        Only the parts of the actor subscribed to the configuration which changed
+        (see ConfigManager) are told about it; e.g. the logs are only reconfigured
+        if the logging section changed. Other variables will take effect or not
+        depending on how they are used. Read the Source, etc.
         """
 
         cmd.respond(
             'text="Reparsing the configuration file: %s."' % (self.actor.configFile)
         )
-        logging.warn("reading config file %s", self.actor.configFile)
 
         try:
-            newConfig = configparser.ConfigParser()
-            newConfig.read(self.actor.configFile)
+            changes = self.actor.configManager.reload(cmd)
         except Exception as e:
             cmd.fail(
                 "text=%s"
@@ -184,15 +339,26 @@ class CoreCmd(object):
             )
             return
 
-        self.actor.config = newConfig
-        self.actor.configureLogs()
-
-        try:
-            self.actor.reloadConfiguration(self, cmd)
-        except BaseException:
-            pass
+        if changes:
+            cmd.inform(
+                "configChanged=%s" % (",".join(qstr(formatPath(c)) for c in changes))
+            )
 
-        cmd.finish('text="reloaded configuration file')
+        # For actors which predate configManager.subscribe. Their hook takes
+        # (coreCmd, cmd), as it always has; one which only takes cmd also works.
+        hook = getattr(self.actor, "reloadConfiguration", None)
+        if hook is not None:
+            try:
+                try:
+                    inspect.signature(hook).bind(self, cmd)
+                except TypeError:
+                    hook(cmd)
+                else:
+                    hook(self, cmd)
+            except Exception as e:
+                cmd.warn("text=%s" % (qstr("reloadConfiguration failed: %s" % (e))))
+
+        cmd.finish('text="reloaded configuration file"')
 
     def exitCmd(self, cmd):
         """Brutal exit when all else has failed."""
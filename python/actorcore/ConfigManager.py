@@ -0,0 +1,130 @@
+""" ConfigManager.py -- reload the configuration, and only act on what changed.
+
+    The actor's configuration is the YAML file read by Actor.read_config_files.
+    Parts of the actor which depend on some of it subscribe to those parts, by
+    path ("logging", "tron.port", "myActor.thresholds"). On reload, the new
+    configuration is compared with the old one, and each subscriber is only
+    called if something at or below its path has changed. So changing a
+    threshold in the actor's own section does not reconfigure the logs.
+
+    Subscribers are called in the thread doing the reload, after actor.config
+    has been replaced, with the list of changed paths and the reloading command
+    (or None).
+
+"""
+
+__all__ = ["ConfigManager", "diffConfig", "formatPath"]
+
+import logging
+import threading
+import time
+
+from opscore.utility.qstr import qstr
+
+
+actorLogger = logging.getLogger("actor")
+
+
+def diffConfig(old, new, path=()):
+    """Return the paths, as tuples of keys, of everything which differs.
+
+    Dictionaries are compared key by key, anything else as a whole. A key
+    which was added or removed is reported with its own path.
+    """
+
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return [] if old == new else [path]
+
+    changes = []
+    for key in list(old) + [k for k in new if k not in old]:
+        if key not in old or key not in new:
+            changes.append(path + (key,))
+        else:
+            changes.extend(diffConfig(old[key], new[key], path + (key,)))
+
+    return changes
+
+
+def configPath(path):
+    """Return path, a dotted string or a tuple of keys, as a tuple."""
+
+    if isinstance(path, str):
+        return tuple(path.split(".")) if path else ()
+    return tuple(path)
+
+
+def formatPath(path):
+    return ".".join(str(k) for k in path)
+
+
+class ConfigManager(object):
+    def __init__(self, actor):
+        self.actor = actor
+        self.lock = threading.Lock()
+        self.subscribers = []
+
+    def subscribe(self, path, callback):
+        """Call callback(changes, cmd) when anything at or below path changes.
+
+        Args:
+            path - a dotted string or tuple of keys; "" for everything.
+            callback - called with the list of changed paths (tuples) at or
+                below path, or above it if a whole section was added or removed,
+                and the reloading command, which may be None.
+        """
+
+        with self.lock:
+            self.subscribers.append((configPath(path), callback))
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s[1] != callback]
+
+    def reload(self, cmd=None):
+        """Re-read the configuration file, and notify the affected subscribers.
+
+        If the file cannot be read the old configuration is kept, and the
+        exception raised. Exceptions raised by subscribers are reported and
+        do not stop the others.
+
+        Returns:
+            the list of changed paths.
+        """
+
+        t0 = time.monotonic()
+
+        oldConfig = self.actor.config
+        try:
+            self.actor.read_config_files()
+        except Exception:
+            self.actor.config = oldConfig
+            raise
+
+        changes = diffConfig(oldConfig, self.actor.config)
+
+        with self.lock:
+            subscribers = list(self.subscribers)
+
+        for subPath, callback in subscribers:
+            n = len(subPath)
+            matched = [c for c in changes if c[:n] == subPath or subPath[: len(c)] == c]
+            if not matched:
+                continue
+            try:
+                callback(matched, cmd)
+            except Exception as e:
+                errStr = "failed to apply configuration changes to %s: %s" % (
+                    formatPath(subPath) or "everything",
+                    e,
+                )
+                actorLogger.warning(errStr)
+                if cmd is not None:
+                    cmd.warn("text=%s" % (qstr(errStr)))
+
+        actorLogger.info(
+            "reloaded configuration in %0.3fs, changed: %s",
+            time.monotonic() - t0,
+            ", ".join(formatPath(c) for c in changes) or "nothing",
+        )
+
+        return changes
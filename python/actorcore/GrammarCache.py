@@ -0,0 +1,139 @@
+""" GrammarCache.py -- keep compiled command grammars on disk between runs.
+
+    attachCmdSet turns every vocabulary entry into a validation.Cmd, which
+    parses the entry's keyword format string (and, the first time, builds the
+    format parser's tables). The GrammarCache stores the compiled Cmds of each
+    command set file, without their callbacks, and hands them back on the next
+    start as long as the file, the opscore version and this cache's format are
+    unchanged. Anything missing, stale or unreadable is simply parsed again.
+
+    Keys are stored by name and looked up again when loading, so the command
+    set's keys must have been added (keys.CmdKey.addKeys) first.
+
+"""
+
+__all__ = ["GrammarCache"]
+
+import hashlib
+import io
+import logging
+import os
+import pickle
+
+import opscore.protocols.keys as keys
+import opscore.protocols.validation as validation
+
+
+actorLogger = logging.getLogger("actor")
+
+# Bump whenever what is stored changes.
+CACHE_FORMAT = 1
+
+
+def defaultCacheDir():
+    """Return the per-user directory for cached grammars."""
+
+    cacheHome = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cacheHome, "actorcore", "grammar")
+
+
+def opscoreVersion():
+    import importlib.metadata
+
+    try:
+        return importlib.metadata.version("sdss-opscore")
+    except importlib.metadata.PackageNotFoundError:
+        return "mtime:%d" % (os.stat(validation.__file__).st_mtime_ns)
+
+
+class GrammarPickler(pickle.Pickler):
+    """Store keys.Key objects by name."""
+
+    def persistent_id(self, obj):
+        if isinstance(obj, keys.Key):
+            return obj.name
+        return None
+
+
+class GrammarUnpickler(pickle.Unpickler):
+    """Look keys up by name in the currently registered command keys."""
+
+    def __init__(self, fp):
+        pickle.Unpickler.__init__(self, fp)
+        self.keys = {}
+
+    def persistent_load(self, name):
+        key = self.keys.get(name)
+        if key is None:
+            key = self.keys[name] = keys.CmdKey.getKey(name)
+        return key
+
+
+class GrammarCache(object):
+    def __init__(self, cacheDir=None):
+        self.cacheDir = cacheDir or defaultCacheDir()
+        self.version = (CACHE_FORMAT, opscoreVersion())
+
+    def cacheFile(self, sourceFile):
+        digest = hashlib.sha1(os.path.abspath(sourceFile).encode()).hexdigest()
+        return os.path.join(self.cacheDir, digest + ".pickle")
+
+    def stamp(self, sourceFile):
+        """What must not have changed for the cached grammar to be valid."""
+
+        st = os.stat(sourceFile)
+        return (os.path.abspath(sourceFile), st.st_mtime_ns, st.st_size, self.version)
+
+    def load(self, sourceFile):
+        """Return the cached {(verb, format): Cmd} of sourceFile, or {}.
+
+        The Cmds have no callbacks or help.
+        """
+
+        try:
+            with open(self.cacheFile(sourceFile), "rb") as fp:
+                stamp, states = GrammarUnpickler(fp).load()
+            if stamp != self.stamp(sourceFile):
+                return {}
+        except Exception:
+            return {}
+
+        cmds = {}
+        for vocabKey, state in states.items():
+            cmd = validation.Cmd.__new__(validation.Cmd)
+            cmd.__dict__.update(state)
+            cmds[vocabKey] = cmd
+
+        return cmds
+
+    def save(self, sourceFile, cmds):
+        """Save the {(verb, format): Cmd} of sourceFile, leaving out callbacks.
+
+        Failures are only logged.
+        """
+
+        states = {}
+        for vocabKey, cmd in cmds.items():
+            states[vocabKey] = {
+                k: v
+                for k, v in cmd.__dict__.items()
+                if k not in ("callbacks", "help", "checkpoint")
+            }
+
+        cacheFile = self.cacheFile(sourceFile)
+        tmpFile = "%s.%d" % (cacheFile, os.getpid())
+        try:
+            buf = io.BytesIO()
+            GrammarPickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump(
+                (self.stamp(sourceFile), states)
+            )
+            os.makedirs(self.cacheDir, exist_ok=True)
+            with open(tmpFile, "wb") as fp:
+                fp.write(buf.getvalue())
+            os.replace(tmpFile, cacheFile)
+        except Exception as e:
+            actorLogger.debug("could not cache grammar of %s: %s", sourceFile, e)
+            try:
+                os.unlink(tmpFile)
+            except OSError:
+                pass
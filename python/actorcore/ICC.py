@@ -8,7 +8,10 @@ instrument.
 import importlib.util
 import logging
 import os
+import queue
 import sys
+import threading
+import time
 
 from opscore.utility.qstr import qstr
 from opscore.utility.sdss3logging import makeOpsFileLogger
@@ -54,10 +57,20 @@ class ICC(actorcore.Actor.Actor):
         self.iolog = logging.getLogger("io")
         self.iolog.setLevel(int(self.config["logging"]["ioLevel"]))
         self.iolog.propagate = False
+        self.configManager.subscribe("logging.ioLevel", self.ioLevelChanged)
+
+    def ioLevelChanged(self, changes, cmd=None):
+        self.iolog.setLevel(int(self.config["logging"]["ioLevel"]))
 
     def attachController(self, name, path=None, cmd=None):
         """(Re-)load and attach a named set of commands."""
 
+        conn = self.loadController(name, path)
+        return self.startController(name, conn)
+
+    def loadController(self, name, path=None):
+        """(Re-)load and create a named controller, stopping any old one."""
+
         if path is None:
             path = [os.path.join(self.product_dir, "Controllers")]
 
@@ -105,6 +118,14 @@ class ICC(actorcore.Actor.Actor):
             self.controllers[name].stop()
             del self.controllers[name]
 
+        return conn
+
+    def startController(self, name, conn, register=True):
+        """Start a controller and, if register, add it to self.controllers.
+
+        Returns whether it started.
+        """
+
         self.logger.info("starting %s controller", name)
         try:
             conn.start()
@@ -112,25 +133,148 @@ class ICC(actorcore.Actor.Actor):
             print(sys.exc_info())
             self.logger.error("Could not connect to %s", name)
             return False
-        self.controllers[name] = conn
+        if register:
+            self.controllers[name] = conn
         return True
 
     def attachAllControllers(self, path=None):
         """(Re-)load and (re-)connect to the hardware controllers listed in
         config:"icc".controllers.
+
+        The controllers are started concurrently, on up to controllerThreads
+        (default 8) threads. One which has not started controllerTimeout seconds
+        (default 30) after its thread took it up is given up on, and stopped if
+        it does start later. Failures are reported as when attaching them one
+        by one, in the configured order.
         """
 
-        clist = self.config[self.name]["controllers"]
+        actorConfig = self.config[self.name]
+        clist = actorConfig["controllers"]
         self.logger.info("All controllers = %s", clist)
+
+        names = []
         for c in clist:
             if c not in self.allControllers:
                 self.bcast.warn(
                     "text=%s" % (qstr("cannot attach unknown controller %s" % (c)))
                 )
                 continue
-            if not self.attachController(c, path):
+            names.append(c)
+        if not names:
+            return
+
+        nThreads = min(len(names), int(actorConfig.get("controllerThreads", 8)))
+        timeout = actorConfig.get("controllerTimeout", 30)
+        results = self.startControllers(names, path, nThreads, timeout)
+
+        self.controllerStartTimes = {}
+        for c in names:
+            result, startTime = results[c]
+            self.controllerStartTimes[c] = startTime
+            # An exception is a failure, even though it is true.
+            if result is None:
+                state = "timed out"
+            elif isinstance(result, Exception) or not result:
+                state = "failed"
+            else:
+                state = "started"
+            self.logger.info("controller %s: %s after %0.2fs", c, state, startTime)
+
+        for c in names:
+            result, startTime = results[c]
+            if isinstance(result, Exception):
+                raise result
+            if not result:
                 self.bcast.warn('text="Could not connect to controller %s."' % (c))
 
+    def startControllers(self, names, path, nThreads, timeout=None):
+        """Load and start the named controllers on nThreads threads.
+
+        Returns {name: (result, seconds)}, where result is True if the controller
+        started, False if it did not, None if it was given up on after timeout
+        seconds, or the exception loadController raised.
+        """
+
+        lock = threading.Lock()
+        todo = queue.Queue()
+        done = queue.Queue()
+        startedAt = {}
+        finished = set()
+        abandoned = set()
+
+        def attach(name):
+            with lock:
+                startedAt[name] = time.monotonic()
+            conn = None
+            try:
+                conn = self.loadController(name, path)
+                result = self.startController(name, conn, register=False)
+            except Exception as e:
+                result = e
+            with lock:
+                if name not in abandoned:
+                    finished.add(name)
+                    done.put((name, result, conn))
+                    return
+            if result is True:
+                self.logger.warning("%s started after its deadline; stopping it", name)
+                conn.stop()
+
+        def worker():
+            while True:
+                try:
+                    name = todo.get_nowait()
+                except queue.Empty:
+                    return
+                attach(name)
+
+        for name in names:
+            todo.put(name)
+        # Daemon threads: one stuck in a controller we gave up on must not keep
+        # the process from exiting.
+        for i in range(min(nThreads, len(names))):
+            threading.Thread(
+                target=worker, name="controllerStart-%d" % (i), daemon=True
+            ).start()
+
+        results = {}
+        while len(results) < len(names):
+            # Wake up at the first deadline of the controllers being started;
+            # any other is taken up later, so has a later deadline.
+            waitFor = None
+            if timeout is not None:
+                now = time.monotonic()
+                with lock:
+                    deadlines = [
+                        t0 + timeout
+                        for name, t0 in startedAt.items()
+                        if name not in results
+                    ]
+                waitFor = max(0.0, min(deadlines, default=now + timeout) - now)
+
+            try:
+                name, result, conn = done.get(timeout=waitFor)
+            except queue.Empty:
+                pass
+            else:
+                if result is True:
+                    self.controllers[name] = conn
+                results[name] = (result, time.monotonic() - startedAt[name])
+
+            if timeout is None:
+                continue
+            now = time.monotonic()
+            with lock:
+                for name, t0 in startedAt.items():
+                    if name in finished or name in results:
+                        continue
+                    if now - t0 >= timeout:
+                        abandoned.add(name)
+                        results[name] = (None, now - t0)
+                        self.logger.error("%s did not start within %ss", name, timeout)
+
+        return results
+
     def stopAllControllers(self):
         for c in list(self.controllers.keys()):
             controller = self.controllers[c]
@@ -11,11 +11,12 @@ import sys
 import threading
 import time
 
-import opscore.protocols.validation as validation
 from opscore.actor import keyvar
 from opscore.protocols import keys, messages, parser
 
 from . import Actor
+from .utility.queues import InstrumentedQueue
+from .utility.startup import PhaseTimer
 
 
 call_lock = threading.RLock()
@@ -1408,6 +1409,13 @@ class Model(object):
 # ...
 
 
+class FakeCommandSources(object):
+    """Stands in for an actor's CommandLinkManager, with no connections."""
+
+    def queueStats(self):
+        return []
+
+
 class FakeActor(Actor.SDSSActor):
     """An actor that doesn't do anything important during init()."""
 
@@ -1438,8 +1446,10 @@ class FakeActor(Actor.SDSSActor):
             self.product_dir, f"etc/{self.name}.yaml"
         )
 
+        self.startupTimer = PhaseTimer()
         self.cmdLog = logging.getLogger("cmds")
         self.logger = logging.getLogger("logger")
+        self.commandSources = FakeCommandSources()
         if cmd is not None:
             self.bcast = cmd
             self.cmdr = cmd
@@ -1457,10 +1467,16 @@ class FakeActor(Actor.SDSSActor):
 
         self.version = "trunk"
 
-        self.commandSets = {}
-        self.handler = validation.CommandHandler()
+        self.initCommandHandling(dict(commandCacheSize=0, grammarCache=False))
+        self.commandQueue = InstrumentedQueue("commands")
+        self.shuttingDown = False
         if attachCmdSets:
             self.attachAllCmdSets()
+        self.cmdSetsAttached = threading.Event()
+        self.cmdSetsAttached.set()
+        self.cmdSetsError = None
+        self.dispatchReady = True
+        self.startupTimer.finish()
 
     def sendVersionKey(self, cmd):
         cmd.inform("version=FAKE!")
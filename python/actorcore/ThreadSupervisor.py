@@ -0,0 +1,283 @@
+""" ThreadSupervisor.py -- watch over the worker threads of an SDSSActor.
+
+    SDSSActor.startThreads runs each thread of its threadList under a
+    ThreadSupervisor, which keeps, for each thread:
+
+      - whether it is running, has exited (returned), or died (raised),
+      - how many messages it has taken from its own queue, and how long it
+        spent on them: a message is counted from the moment queue.get()
+        returns it until the thread next calls get(),
+      - when it was last active (called or returned from get()), which is its
+        heartbeat: a thread which is busy on one message for a long time has
+        an old last activity.
+
+    A thread which dies is restarted, with the same queues, after a backoff
+    which doubles with each quick death (from minBackoff up to maxBackoff) and
+    starts again from minBackoff once a thread has run for longer than
+    maxBackoff. Threads which simply return (e.g. on Msg.EXIT) are left alone.
+    The restarted Thread is passed to the onRestart callback, which
+    SDSSActor uses to keep actorState.threads current.
+
+    The queue instrumentation wraps the get() (and any get_batch()) method of
+    each thread's queue, so it works with any queue class.
+
+"""
+
+__all__ = ["ThreadSupervisor", "nextThreadName"]
+
+import logging
+import re
+import threading
+import time
+
+from opscore.utility.tback import tback
+
+
+actorLogger = logging.getLogger("actor")
+
+
+def nextThreadName(name):
+    """Return the name of a thread's next incarnation: master, master-1, master-2..."""
+
+    def updateName(g):
+        try:
+            n = int(g.group(2))
+        except TypeError:
+            n = 0
+        return "%s-%d" % (g.group(1), n + 1)
+
+    return re.sub(r"^([^\d]*)(?:-(\d*))?$", updateName, name)
+
+
+class ThreadStats(object):
+    """What we know about one supervised thread, across its restarts."""
+
+    def __init__(self, tid, name):
+        self.tid = tid
+        self.name = name
+        self.thread = None
+        self.target = None
+        self.args = ()
+
+        self.state = "starting"
+        self.started = time.monotonic()
+        self.lastActivity = self.started
+        self.restarts = 0
+        self.nextRestart = None
+        self.backoff = 0.0
+        self.lastError = None
+
+        self.nMsgs = 0
+        self.busyTime = 0.0
+        self.msgStart = None
+        self.nTaken = 0
+
+    def isOwner(self):
+        return self.thread is threading.current_thread()
+
+    def getting(self):
+        """The thread is asking for its next message: the last one is done."""
+
+        now = time.monotonic()
+        if self.msgStart is not None:
+            self.nMsgs += self.nTaken
+            self.busyTime += now - self.msgStart
+            self.msgStart = None
+        self.lastActivity = now
+
+    def got(self, n=1):
+        self.msgStart = self.lastActivity = time.monotonic()
+        self.nTaken = n
+
+
+class ThreadSupervisor(object):
+    def __init__(
+        self,
+        restartDead=True,
+        minBackoff=1.0,
+        maxBackoff=60.0,
+        checkInterval=1.0,
+        onRestart=None,
+    ):
+        """Supervise threads, restarting dead ones if restartDead.
+
+        onRestart, if given, is called as onRestart(tid, thread) with each
+        restarted thread, so that the owner can replace its old Thread.
+        """
+
+        self.restartDead = restartDead
+        self.minBackoff = minBackoff
+        self.maxBackoff = maxBackoff
+        self.checkInterval = checkInterval
+        self.onRestart = onRestart
+
+        self.lock = threading.Lock()
+        self.threads = {}
+
+        self.stopEvent = threading.Event()
+        self.monitor = None
+
+    def makeThread(self, tid, name, target, args, ownQueue=None):
+        """Return a new, unstarted, daemon Thread running target(*args) for tid.
+
+        Args:
+            tid - the thread's id, which stays the same across restarts.
+            name - the new thread's name.
+            target, args - what the thread runs.
+            ownQueue - the queue the thread gets its messages from, if any.
+        """
+
+        with self.lock:
+            stats = self.threads.get(tid)
+            if stats is None:
+                stats = self.threads[tid] = ThreadStats(tid, name)
+            stats.name = name
+            stats.target = target
+            stats.args = args
+            stats.state = "starting"
+            stats.started = stats.lastActivity = time.monotonic()
+            stats.msgStart = None
+            stats.nextRestart = None
+
+            thread = threading.Thread(
+                target=self.runThread, name=name, args=(stats, target, args)
+            )
+            thread.daemon = True
+            stats.thread = thread
+
+        if ownQueue is not None:
+            self.instrument(tid, ownQueue)
+
+        return thread
+
+    def instrument(self, tid, q):
+        """Count the messages the thread tid takes from its queue q."""
+
+        if getattr(q, "supervisedTid", None) == tid:
+            return
+
+        get = getattr(q, "unsupervisedGet", q.get)
+        stats = self.threads[tid]
+
+        def supervisedGet(*args, **kwargs):
+            owner = stats.isOwner()
+            if owner:
+                stats.getting()
+            msg = get(*args, **kwargs)
+            if owner:
+                stats.got()
+            return msg
+
+        q.unsupervisedGet = get
+        q.supervisedTid = tid
+        q.get = supervisedGet
+
+        # A BatchQueue's batches count as that many messages.
+        if hasattr(q, "get_batch"):
+            getBatch = getattr(q, "unsupervisedGetBatch", q.get_batch)
+
+            def supervisedGetBatch(*args, **kwargs):
+                owner = stats.isOwner()
+                if owner:
+                    stats.getting()
+                msgs = getBatch(*args, **kwargs)
+                if owner:
+                    stats.got(len(msgs))
+                return msgs
+
+            q.unsupervisedGetBatch = getBatch
+            q.get_batch = supervisedGetBatch
+
+    def runThread(self, stats, target, args):
+        if stats.isOwner():
+            stats.state = "running"
+        try:
+            target(*args)
+        except Exception as e:
+            if not stats.isOwner():
+                return
+            stats.getting()  # The message it died on was still taken.
+            now = time.monotonic()
+            if now - stats.started > self.maxBackoff:
+                stats.backoff = self.minBackoff
+            else:
+                stats.backoff = min(
+                    self.maxBackoff, max(self.minBackoff, 2 * stats.backoff)
+                )
+            stats.lastError = "%s: %s" % (type(e).__name__, e)
+            stats.state = "died"
+            stats.nextRestart = now + stats.backoff if self.restartDead else None
+            actorLogger.error(
+                "thread %s died: %s%s",
+                stats.name,
+                stats.lastError,
+                " (restarting in %gs)" % (stats.backoff) if self.restartDead else "",
+            )
+            tback(stats.name, e)
+        else:
+            if stats.isOwner():
+                stats.state = "exited"
+
+    def start(self):
+        """Start restarting dead threads, if we do."""
+
+        if self.restartDead and self.monitor is None:
+            self.monitor = threading.Thread(
+                target=self.watch, name="threadSupervisor", daemon=True
+            )
+            self.monitor.start()
+
+    def stop(self):
+        self.stopEvent.set()
+
+    def watch(self):
+        while not self.stopEvent.wait(self.checkInterval):
+            self.restartDeadThreads()
+
+    def restartDeadThreads(self):
+        """Restart the dead threads whose backoff has passed. Returns their tids."""
+
+        now = time.monotonic()
+        with self.lock:
+            due = [
+                stats
+                for stats in self.threads.values()
+                if stats.state == "died" and (stats.nextRestart or now + 1) <= now
+            ]
+
+        for stats in due:
+            stats.restarts += 1
+            name = nextThreadName(stats.name)
+            actorLogger.warning(
+                "restarting dead thread %s as %s (restart %d)",
+                stats.name,
+                name,
+                stats.restarts,
+            )
+            thread = self.makeThread(stats.tid, name, stats.target, stats.args)
+            thread.start()
+            if self.onRestart is not None:
+                self.onRestart(stats.tid, thread)
+
+        return [stats.tid for stats in due]
+
+    def status(self):
+        """Return a list of per-thread dicts, in the order the threads were added."""
+
+        now = time.monotonic()
+        with self.lock:
+            threads = list(self.threads.values())
+
+        return [
+            dict(
+                name=stats.name,
+                state=stats.state,
+                restarts=stats.restarts,
+                nMsgs=stats.nMsgs,
+                busyTime=stats.busyTime,
+                meanMsgTime=stats.busyTime / stats.nMsgs if stats.nMsgs else 0.0,
+                activityAge=now - stats.lastActivity,
+                busy=stats.msgStart is not None,
+            )
+            for stats in threads
+        ]
@@ -1,6 +1,14 @@
-from sdsstools import get_package_version
+NAME = "sdss-actorcore"
 
 
-NAME = "sdss-actorcore"
+def __getattr__(name):
+    """Look __version__ up when first asked for: sdsstools is slow to import."""
+
+    if name == "__version__":
+        from sdsstools import get_package_version
+
+        version = get_package_version(path=__file__, package_name=NAME)
+        globals()["__version__"] = version
+        return version
 
-__version__ = get_package_version(path=__file__, package_name=NAME)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: cmdsets.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import ast
+import os
+
+
+__all__ = ["findCmdSetFile", "scanVocabVerbs"]
+
+
+def findCmdSetFile(cname, path):
+    """Return the first cname.py in the list of directories path, or None."""
+
+    for p in path:
+        moduleFile = os.path.join(p, cname + ".py")
+        if os.path.exists(moduleFile):
+            return moduleFile
+
+    return None
+
+
+def scanVocabVerbs(moduleFile, cname):
+    """Return the verbs of command set cname in moduleFile, without importing it.
+
+    Looks for a literal ``self.vocab = ((verb, args, func), ...)`` in class cname.
+    Returns None if the verbs cannot be known that way: the class or the
+    assignment is missing, any verb is not a string literal, self.vocab is
+    assigned more than once, or it is used other than by reading it (e.g.
+    self.vocab.append(...), self.vocab += ..., or passing it to a function).
+    """
+
+    with open(moduleFile, "rb") as fp:
+        try:
+            tree = ast.parse(fp.read(), moduleFile)
+        except SyntaxError:
+            return None
+
+    classes = [n for n in tree.body if isinstance(n, ast.ClassDef) and n.name == cname]
+    if len(classes) != 1:
+        return None
+
+    parents = {}
+    for node in ast.walk(classes[0]):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+
+    vocabs = []
+    for node in ast.walk(classes[0]):
+        if not _isSelfVocab(node):
+            continue
+        parent = parents.get(node)
+        if isinstance(parent, ast.Assign) and node in parent.targets:
+            vocabs.append(parent.value)
+        elif not _isVocabRead(node, parent):
+            return None
+
+    if len(vocabs) != 1 or not isinstance(vocabs[0], (ast.Tuple, ast.List)):
+        return None
+
+    verbs = []
+    for entry in vocabs[0].elts:
+        if not isinstance(entry, (ast.Tuple, ast.List)) or not entry.elts:
+            return None
+        verb = entry.elts[0]
+        if not isinstance(verb, ast.Constant) or not isinstance(verb.value, str):
+            return None
+        verbs.append(verb.value)
+
+    return verbs or None
+
+
+def _isSelfVocab(target):
+    if not isinstance(target, ast.Attribute) or target.attr != "vocab":
+        return False
+    return isinstance(target.value, ast.Name) and target.value.id == "self"
+
+
+def _isVocabRead(node, parent):
+    """Is this use of self.vocab one which cannot change it?"""
+
+    if not isinstance(node.ctx, ast.Load):
+        return False  # del, +=, an annotated or unpacking assignment, ...
+    if isinstance(parent, ast.Attribute):
+        return False  # self.vocab.append(...), self.vocab.extend(...), ...
+    if isinstance(parent, ast.Subscript) and not isinstance(parent.ctx, ast.Load):
+        return False  # self.vocab[0] = ...
+    if isinstance(parent, (ast.Call, ast.keyword, ast.Starred)):
+        return False  # anything we pass it to might change it
+    return True
@@ -1,15 +1,28 @@
 import gzip
+import importlib
 import logging
+import math
 import os
 import tempfile
 import threading
 
-import astropy.io.fits as fits
-import numpy
-
 from opscore.utility.qstr import qstr
 
 
+# astropy is slow to import, and only needed once a card is made, so
+# astropy.io.fits is only imported then. numpy is still available as an
+# attribute, for old callers.
+_lazyModules = dict(fits="astropy.io.fits", numpy="numpy")
+
+
+def __getattr__(name):
+    if name in _lazyModules:
+        module = importlib.import_module(_lazyModules[name])
+        globals()[name] = module
+        return module
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
 def extendHeader(cmd, header, cards):
     """Add all the cards to the header."""
 
@@ -23,6 +36,8 @@ def extendHeader(cmd, header, cards):
 def makeCard(cmd, name, value, comment=""):
     """Creates a fits Card. Does not raise exceptions."""
 
+    import astropy.io.fits as fits
+
     try:
         return fits.Card(name, value, comment)
     except BaseException:
@@ -976,7 +991,7 @@ def _cnvPVTPosCard(pvt, atTime=None):
     try:
         return pvt.getPos()
     except BaseException:
-        return numpy.nan
+        return math.nan
 
 
 def _cnvPVTVelCard(pvt):
@@ -986,7 +1001,7 @@ def _cnvPVTVelCard(pvt):
     try:
         return pvt.getVel()
     except BaseException:
-        return numpy.nan
+        return math.nan
 
 
 def writeFits(
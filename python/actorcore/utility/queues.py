@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: queues.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Queue classes for the actor threads started by SDSSActor.startThreads.
+
+They take the thread name as their first argument, like the queues of sopActor,
+so they can be passed as startThreads(queueClass=...). All of them implement
+flush(), which startThreads uses when restarting threads; BatchQueue can also
+put and get many items at once.
+"""
+
+import collections
+import queue
+import threading
+import time
+
+
+__all__ = [
+    "FlushMixin",
+    "MsgPriorityQueue",
+    "InstrumentedQueue",
+    "BatchQueue",
+    "flushQueue",
+]
+
+
+class FlushMixin(object):
+    """Adds flush() to a queue.Queue, or to a queue which, like one, keeps its
+    items in self.queue under self.mutex, counts self.unfinished_tasks, and has
+    the all_tasks_done and not_full Conditions.
+    """
+
+    def flush(self):
+        """Discard everything in the queue."""
+
+        with self.mutex:
+            self.unfinished_tasks = max(0, self.unfinished_tasks - len(self.queue))
+            self.queue.clear()
+            if self.unfinished_tasks == 0:
+                self.all_tasks_done.notify_all()
+            self.not_full.notify_all()
+
+
+class MsgPriorityQueue(FlushMixin, queue.PriorityQueue):
+    """A queue of actorcore.Actor.Msg, highest priority (lowest value) first.
+
+    Messages of equal priority come out in the order they were put in.
+    """
+
+    def __init__(self, name=None, maxsize=0):
+        self.name = name
+        super().__init__(maxsize)
+
+
+class InstrumentedQueue(FlushMixin, queue.Queue):
+    """A FIFO queue which keeps statistics about its traffic.
+
+    Each item is timestamped when it is put, so that the time it waited can be
+    recorded when it is taken. The timestamps and counters are kept under the
+    queue's own lock; percentiles and rates are only worked out by stats().
+    """
+
+    # How many of the latest waits, and when they ended, to keep for stats().
+    nSamples = 1024
+
+    def __init__(self, name=None, maxsize=0):
+        self.name = name
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.nPuts = 0
+        self.nGets = 0
+        self.highWater = 0
+        self.samples = collections.deque(maxlen=self.nSamples)
+
+    def _put(self, item):
+        self.queue.append((time.monotonic(), item))
+        self.nPuts += 1
+        if len(self.queue) > self.highWater:
+            self.highWater = len(self.queue)
+
+    def _get(self):
+        putTime, item = self.queue.popleft()
+        now = time.monotonic()
+        self.samples.append((now, now - putTime))
+        self.nGets += 1
+        return item
+
+    def stats(self):
+        """Return a dict of the queue's depth, counters and recent waits.
+
+        wait50, wait90 and wait99 are percentiles of the time, in seconds, that
+        the latest items waited in the queue; rate is how many items per second
+        were taken over the same period.
+        """
+
+        with self.mutex:
+            samples = list(self.samples)
+            stats = dict(
+                name=self.name,
+                depth=len(self.queue),
+                highWater=self.highWater,
+                puts=self.nPuts,
+                gets=self.nGets,
+            )
+
+        waits = sorted(wait for _, wait in samples)
+        for p in 50, 90, 99:
+            stats["wait%d" % (p)] = (
+                waits[min(len(waits) - 1, len(waits) * p // 100)] if waits else 0.0
+            )
+        if len(samples) > 1 and samples[-1][0] > samples[0][0]:
+            stats["rate"] = (len(samples) - 1) / (samples[-1][0] - samples[0][0])
+        else:
+            stats["rate"] = 0.0
+
+        return stats
+
+
+class BatchQueue(FlushMixin):
+    """A FIFO queue with one lock, which can put and get many items at once.
+
+    It has the parts of the queue.Queue interface the actor threads use (put,
+    get, their _nowait forms, qsize, empty, full, task_done and join), plus
+    put_many() and get_batch(), so that a thread can take a whole burst of
+    messages in one wakeup, and flush().
+
+    Everything is done under a single lock, and with no maxsize only getters
+    wait on its Condition (join() has its own).
+    """
+
+    def __init__(self, name=None, maxsize=0):
+        self.name = name
+        self.maxsize = maxsize
+        self.queue = collections.deque()
+        self.mutex = threading.Lock()
+        self.cond = threading.Condition(self.mutex)
+        # What queue.Queue calls the Condition that put() waits on.
+        self.not_full = self.cond
+        self.all_tasks_done = threading.Condition(self.mutex)
+        self.unfinished_tasks = 0
+
+    def qsize(self):
+        return len(self.queue)
+
+    def empty(self):
+        return not self.queue
+
+    def full(self):
+        return 0 < self.maxsize <= len(self.queue)
+
+    def _waitFor(self, predicate, block, timeout, exception):
+        """Wait, holding self.cond, until predicate(); else raise exception."""
+
+        if predicate():
+            return
+        if not block:
+            raise exception
+        if timeout is None:
+            while not predicate():
+                self.cond.wait()
+        elif not self.cond.wait_for(predicate, timeout):
+            raise exception
+
+    def put(self, item, block=True, timeout=None):
+        with self.cond:
+            if self.maxsize > 0:
+                self._waitFor(
+                    lambda: len(self.queue) < self.maxsize, block, timeout, queue.Full
+                )
+            self.queue.append(item)
+            self.unfinished_tasks += 1
+            if self.maxsize > 0:
+                self.cond.notify_all()
+            else:
+                self.cond.notify()
+
+    def put_nowait(self, item):
+        return self.put(item, block=False)
+
+    def put_many(self, items):
+        """Put all of items, waking as many getters as needed. Never blocks.
+
+        With a maxsize, the queue may end up over it.
+        """
+
+        with self.cond:
+            n = len(self.queue)
+            self.queue.extend(items)
+            n = len(self.queue) - n
+            self.unfinished_tasks += n
+            if self.maxsize > 0:
+                self.cond.notify_all()
+            else:
+                self.cond.notify(n)
+
+    def get(self, block=True, timeout=None):
+        with self.cond:
+            self._waitFor(lambda: self.queue, block, timeout, queue.Empty)
+            item = self.queue.popleft()
+            if self.maxsize > 0:
+                self.cond.notify_all()
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def get_batch(self, max_n=None, timeout=None):
+        """Wait for at least one item, and return a list of up to max_n (or all).
+
+        Raises queue.Empty if nothing came within timeout seconds; a timeout of
+        0 does not wait at all.
+        """
+
+        with self.cond:
+            self._waitFor(lambda: self.queue, timeout != 0, timeout, queue.Empty)
+            if max_n is None or max_n >= len(self.queue):
+                items = list(self.queue)
+                self.queue.clear()
+            else:
+                items = [self.queue.popleft() for _ in range(max_n)]
+            if self.maxsize > 0:
+                self.cond.notify_all()
+            return items
+
+    def task_done(self):
+        with self.cond:
+            if self.unfinished_tasks <= 0:
+                raise ValueError("task_done() called too many times")
+            self.unfinished_tasks -= 1
+            if self.unfinished_tasks == 0:
+                self.all_tasks_done.notify_all()
+
+    def join(self):
+        with self.all_tasks_done:
+            while self.unfinished_tasks:
+                self.all_tasks_done.wait()
+
+
+def flushQueue(q):
+    """Discard everything in q, with its flush() if it has one."""
+
+    if hasattr(q, "flush"):
+        q.flush()
+        return
+
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            break
+        q.task_done()
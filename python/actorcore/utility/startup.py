@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# @Filename: startup.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+"""Timing of actor startup.
+
+Actor.__init__ records how long each of its phases takes in a PhaseTimer. The
+actorStartupTime script (main() below) builds an actor N times, each in a new
+process and without a hub connection, and prints the distribution of those
+times.
+
+Also getfqdn(), a cached socket.getfqdn() which can give up waiting for DNS.
+"""
+
+import importlib
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+__all__ = ["PhaseTimer", "getfqdn", "main"]
+
+actorLogger = logging.getLogger("actor")
+
+# How long getfqdn() waits for the resolver by default, in seconds.
+FQDN_TIMEOUT = 2.0
+
+_fqdn = None
+_fqdnLock = threading.Lock()
+_fqdnThread = None
+
+
+def getfqdn(timeout=FQDN_TIMEOUT):
+    """Return socket.getfqdn(), looked up once per process.
+
+    If the lookup takes longer than timeout seconds (None to wait for it),
+    log a warning and return None; the lookup carries on in the background,
+    and later calls return its result once it is known.
+    """
+
+    global _fqdnThread
+
+    def lookup():
+        global _fqdn
+        fqdn = socket.getfqdn()
+        with _fqdnLock:
+            _fqdn = fqdn
+
+    with _fqdnLock:
+        if _fqdn is not None:
+            return _fqdn
+        if _fqdnThread is None:
+            _fqdnThread = threading.Thread(target=lookup, name="getfqdn", daemon=True)
+            _fqdnThread.start()
+        thread = _fqdnThread
+
+    thread.join(timeout)
+    with _fqdnLock:
+        if _fqdn is not None:
+            return _fqdn
+
+    actorLogger.warning("looking up the FQDN of this host took over %gs", timeout)
+    return None
+
+
+class PhaseTimer(object):
+    """Durations of the named phases of a startup, in the order they ran."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.last = self.start
+        self.end = None
+        self.readyAt = None
+        self.phases = []
+
+    def mark(self, name):
+        """End phase name, which started at the previous mark (or the start)."""
+
+        now = time.monotonic()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def add(self, name, seconds):
+        """Record a phase which ran alongside the others."""
+
+        self.phases.append((name, seconds))
+
+    def finish(self):
+        self.end = time.monotonic()
+
+    def ready(self):
+        """Note that the actor can now run commands."""
+
+        self.readyAt = time.monotonic()
+
+    def total(self):
+        return (self.end or time.monotonic()) - self.start
+
+    def timeToReady(self):
+        return (self.readyAt or time.monotonic()) - self.start
+
+    def summary(self):
+        return ", ".join("%s=%0.3fs" % (name, dt) for name, dt in self.phases)
+
+
+def loadActorClass(path):
+    """Return the class named by "package.module:Class" or "package.module.Class"."""
+
+    if ":" in path:
+        modName, className = path.split(":", 1)
+    else:
+        modName, className = path.rsplit(".", 1)
+
+    return getattr(importlib.import_module(modName), className)
+
+
+def child(opts):
+    """Build one actor and print its startup times as JSON."""
+
+    t0 = time.monotonic()
+    actorClass = loadActorClass(opts.actorClass)
+    importTime = time.monotonic() - t0
+
+    logDir = tempfile.mkdtemp(prefix="actorStartup")
+
+    class TimedActor(actorClass):
+        def read_config_files(self):
+            """Log to a private directory, and listen on a free port."""
+
+            actorClass.read_config_files(self)
+            self.config["logging"]["logdir"] = logDir
+            self.config["tron"]["port"] = 0
+            self.config["tron"]["socketPath"] = None
+
+    kwargs = dict(makeCmdrConnection=False)
+    for name in "productName", "productDir", "configFile", "location":
+        if getattr(opts, name) is not None:
+            kwargs[name] = getattr(opts, name)
+
+    try:
+        actor = TimedActor(opts.name, **kwargs)
+    finally:
+        shutil.rmtree(logDir, ignore_errors=True)
+
+    # With overlappedStartup the command sets are still being attached.
+    while not actor.cmdSetsAttached.wait(0.1):
+        if actor.cmdSetsError is not None:
+            raise actor.cmdSetsError
+
+    timer = actor.startupTimer
+    phases = [("import", importTime)] + timer.phases
+    phases += [("cmdSet %s" % (n), dt[0]) for n, dt in actor.cmdSetTimes.items()]
+    print(
+        json.dumps(
+            dict(
+                total=importTime + timer.total(),
+                ready=importTime + timer.timeToReady(),
+                phases=phases,
+            )
+        )
+    )
+
+
+def main():
+    # Only the script needs these.
+    import argparse
+    import statistics
+
+    parser = argparse.ArgumentParser(
+        description="Time how long an actor takes to start, without a hub."
+    )
+    parser.add_argument("actorClass", help="e.g. myActor.myActor:MyActor")
+    parser.add_argument("name", help="the actor name")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("--productName")
+    parser.add_argument("--productDir")
+    parser.add_argument("--configFile")
+    parser.add_argument("--location")
+    parser.add_argument("--json", action="store_true", help="print each run as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    if opts.child:
+        child(opts)
+        return
+
+    cmd = [sys.executable, os.path.abspath(sys.argv[0])] + sys.argv[1:] + ["--child"]
+    runs = []
+    for _ in range(opts.runs):
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        if opts.json:
+            print(json.dumps(runs[-1]))
+
+    # Phases in the order of the first run; command sets may differ between runs.
+    names = []
+    times = {}
+    for run in runs:
+        for name, dt in run["phases"]:
+            if name not in times:
+                names.append(name)
+                times[name] = []
+            times[name].append(dt)
+    for name in "total", "ready":
+        names.append(name)
+        times[name] = [run[name] for run in runs]
+
+    print(
+        "%-32s %9s %9s %9s %9s %9s"
+        % ("phase", "mean ms", "p50 ms", "p90 ms", "min ms", "max ms")
+    )
+    for name in names:
+        dts = sorted(times[name])
+        print(
+            "%-32s %9.1f %9.1f %9.1f %9.1f %9.1f"
+            % (
+                name,
+                1e3 * statistics.mean(dts),
+                1e3 * dts[len(dts) // 2],
+                1e3 * dts[min(len(dts) - 1, int(len(dts) * 0.9))],
+                1e3 * dts[0],
+                1e3 * dts[-1],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: conftest.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import types
+
+import pytest
+
+import actorcore.Actor
+import actorcore.CommandLink
+import actorcore.CommandLinkManager
+import actorcore.TestHelper
+
+
+class FakeReactor(object):
+    """Collects callFromThread calls so tests can run them explicitly."""
+
+    def __init__(self):
+        self.calls = []
+
+    def callFromThread(self, func, *args, **kwargs):
+        self.calls.append((func, args, kwargs))
+
+    def addSystemEventTrigger(self, phase, eventType, func, *args, **kwargs):
+        pass
+
+    def runPending(self):
+        calls, self.calls = self.calls, []
+        for func, args, kwargs in calls:
+            func(*args, **kwargs)
+
+
+class FakeTransport(object):
+    def __init__(self):
+        self.writes = []
+        self.disconnecting = False
+
+    def write(self, data):
+        self.writes.append([data])
+
+    def writeSequence(self, seq):
+        self.writes.append(list(seq))
+
+    def loseConnection(self):
+        self.disconnecting = True
+
+    def abortConnection(self):
+        self.disconnecting = True
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+    @property
+    def value(self):
+        return b"".join(b"".join(w) for w in self.writes)
+
+
+class FakeBrains(object):
+    """Stands in for the actor: records new commands and broadcasts."""
+
+    def __init__(self):
+        self.cmds = []
+        self.warnings = []
+        self.bcast = types.SimpleNamespace(
+            warn=self.warnings.append, fail=self.warnings.append
+        )
+
+    def newCmd(self, cmd):
+        self.cmds.append(cmd)
+
+
+@pytest.fixture()
+def fake_reactor(monkeypatch):
+    fake = FakeReactor()
+    monkeypatch.setattr(actorcore.CommandLink, "reactor", fake)
+    yield fake
+
+
+@pytest.fixture()
+def link(fake_reactor):
+    link = actorcore.CommandLink.CommandLink(brains=FakeBrains(), connID=1)
+    link.transport = FakeTransport()
+    yield link
+
+
+@pytest.fixture()
+def cmd():
+    return types.SimpleNamespace(cid=1, mid=3)
+
+
+@pytest.fixture()
+def manager(fake_reactor):
+    mgr = actorcore.CommandLinkManager.CommandLinkManager(brains=FakeBrains())
+    for _ in range(3):
+        link = mgr.buildProtocol(None)
+        link.transport = FakeTransport()
+    yield mgr
+
+
+@pytest.fixture()
+def actor_config():
+    """Extra YAML for the actor's own configuration section."""
+
+    return ""
+
+
+@pytest.fixture()
+def actor(tmp_path, fake_reactor, actor_config, monkeypatch):
+    """A real Actor with only the core commands, not connected to a hub."""
+
+    monkeypatch.setattr(
+        actorcore.Actor, "setupRootLogger", actorcore.TestHelper.setupRootLogger
+    )
+    monkeypatch.setattr(actorcore.Actor, "reactor", fake_reactor)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    (tmp_path / "etc").mkdir()
+    (tmp_path / "Commands").mkdir()
+    (tmp_path / "etc" / "testActor.yaml").write_text(
+        f"""
+tron:
+    interface: localhost
+    port: 0
+    tronHost: localhost
+    tronCmdrPort: 6093
+logging:
+    logdir: {tmp_path / "logs"}
+    baseLevel: 20
+    cmdLevel: 20
+    consoleLevel: 30
+testActor:
+    {actor_config or "commandThreads: 1"}
+"""
+    )
+
+    actor = actorcore.Actor.Actor(
+        "testActor",
+        productName="actorcore",
+        productDir=str(tmp_path),
+        makeCmdrConnection=False,
+    )
+    actor.runInReactorThread = True
+
+    yield actor
+
+    actor.commandSources.stopListening()
+
+
+@pytest.fixture()
+def actor_link(actor):
+    """A connection to the actor, as from the hub."""
+
+    link = actor.commandSources.buildProtocol(None)
+    link.transport = FakeTransport()
+    yield link
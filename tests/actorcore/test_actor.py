@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_actor.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import threading
+
+import pytest
+
+import actorcore.Actor
+
+
+class TestCoreCommands(object):
+    def test_replies(self, actor, actor_link, fake_reactor):
+        actor_link.lineReceived(b"replies all")
+        assert actor_link.subscribeAll is True
+
+        actor_link.lineReceived(b"replies own")
+        assert actor_link.subscribeAll is False
+
+        fake_reactor.runPending()
+        assert actor_link.transport.value.count(b" : ") == 2
+
+    def test_subscribe(self, actor, actor_link, fake_reactor):
+        actor_link.lineReceived(b"subscribe keywords=guideState,axePos*")
+        assert actor_link.keywordFilter.match("axePosA")
+        assert not actor_link.keywordFilter.match("text")
+
+        actor_link.lineReceived(b"subscribe")
+        assert actor_link.keywordFilter is None
+
+
+def test_command_groups(actor, tmp_path):
+    (tmp_path / "Commands" / "groupCmd.py").write_text(
+        """
+class groupCmd(object):
+    concurrency = "ccd"
+
+    def __init__(self, actor):
+        self.keys = None
+        self.vocab = (
+            ("expose", "", self.expose),
+            ("shutterStatus", "", self.status, "parallel"),
+        )
+
+    def expose(self, cmd):
+        cmd.finish()
+
+    def status(self, cmd):
+        cmd.finish()
+"""
+    )
+    actor.attachCmdSet("groupCmd")
+    cmdSet = actor.commandSets["groupCmd"]
+
+    assert actor.commandGroup([cmdSet.expose]) == "ccd"
+    assert actor.commandGroup([cmdSet.status]) == "parallel"
+    assert actor.commandGroup([cmdSet.expose, cmdSet.status]) == "serial"
+    assert actor.commandGroup([actor.commandSets["CoreCmd"].version]) == "serial"
+
+
+def test_command_cache(actor, actor_link, tmp_path):
+    actor_link.lineReceived(b"1 version")
+    actor_link.lineReceived(b"2 version")
+    assert actor.commandCache.stats()["hits"] == 1
+
+    (tmp_path / "Commands" / "emptyCmd.py").write_text(
+        """
+class emptyCmd(object):
+    def __init__(self, actor):
+        self.keys = None
+        self.vocab = ()
+"""
+    )
+    actor.attachCmdSet("emptyCmd")
+    assert actor.commandCache.stats()["size"] == 0
+
+
+def test_unknown_verb(actor, actor_link, fake_reactor, monkeypatch):
+    def parse(line):
+        raise AssertionError("unknown verbs should not be parsed")
+
+    monkeypatch.setattr(actor.handler.parser, "parse", parse)
+    actor_link.lineReceived(b"1 nosuch time=1")
+    fake_reactor.runPending()
+
+    assert b'f text="Unrecognized command: nosuch time=1"' in (
+        actor_link.transport.value
+    )
+
+
+def runAsyncCmds(actor, fake_reactor):
+    """Run the async commands, and those they held up, until all are done."""
+
+    while actor.commandLoop.pending or fake_reactor.calls:
+        for future in list(actor.commandLoop.pending):
+            future.result(5)
+        fake_reactor.runPending()
+
+
+def test_async_handlers(actor, actor_link, fake_reactor, tmp_path):
+    (tmp_path / "Commands" / "asyncCmd.py").write_text(
+        """
+import asyncio
+
+
+class asyncCmd(object):
+    def __init__(self, actor):
+        self.keys = None
+        self.vocab = (
+            ("wait", "", self.wait),
+            ("broken", "", self.broken),
+        )
+
+    async def wait(self, cmd):
+        await asyncio.sleep(0.1)
+        cmd.finish("text=waited")
+
+    async def broken(self, cmd):
+        await asyncio.sleep(0)
+        raise ValueError("no hardware")
+"""
+    )
+    actor.attachCmdSet("asyncCmd")
+    assert actor.commandLoop is not None
+
+    try:
+        actor_link.lineReceived(b"1 wait")
+        actor_link.lineReceived(b"2 ping")
+        actor_link.lineReceived(b"3 broken")
+        # Serial commands wait for the async one, as for a plain callback.
+        assert actor.commandQueue.qsize() == 2
+        runAsyncCmds(actor, fake_reactor)
+    finally:
+        actor.commandLoop.stop()
+
+    lines = actor_link.transport.value.decode().splitlines()
+    finished = [line.split()[1] for line in lines if line.split()[2] in ":f"]
+    assert finished == ["1", "2", "3"]
+    assert "2 1 : text=waited" in lines
+    assert any(
+        line.startswith("2 3 f") and "command failed: ValueError('no hardware')" in line
+        for line in lines
+    )
+
+
+def test_lazy_command_sets(actor, actor_link, fake_reactor, tmp_path):
+    commands = tmp_path / "Commands"
+    (commands / "heavyCmd.py").write_text(
+        """
+class heavyCmd(object):
+    def __init__(self, actor):
+        self.keys = None
+        self.vocab = (
+            ("heavy", "", self.heavy),
+            ("heavier", "", self.heavy),
+        )
+
+    def heavy(self, cmd):
+        cmd.finish("text=loaded")
+"""
+    )
+    (commands / "dynamicCmd.py").write_text(
+        """
+class dynamicCmd(object):
+    def __init__(self, actor):
+        self.keys = None
+        self.vocab = [(verb, "", self.run) for verb in ("dyn1", "dyn2")]
+
+    def run(self, cmd):
+        cmd.finish()
+"""
+    )
+    actor.lazyCommands = True
+    actor.attachAllCmdSets(path=str(commands))
+
+    assert "dynamicCmd" in actor.commandSets
+    assert "heavyCmd" not in actor.commandSets
+    assert actor.deferredVerbs == {"heavy": ["heavyCmd"], "heavier": ["heavyCmd"]}
+
+    actor_link.lineReceived(b"1 heavy")
+    fake_reactor.runPending()
+
+    assert "heavyCmd" in actor.commandSets
+    assert actor.deferredCmdSets == {}
+    assert actor.deferredVerbs == {}
+    assert b" 1 : text=loaded" in actor_link.transport.value
+
+
+def test_startup_times(actor, actor_link, fake_reactor):
+    phases = [name for name, dt in actor.startupTimer.phases]
+    assert phases == [
+        "product",
+        "config",
+        "logs",
+        "listen",
+        "handler",
+        "cmdSets",
+        "cmdr",
+    ]
+    assert "CoreCmd" in actor.cmdSetTimes
+
+    actor_link.lineReceived(b"1 coreStatus")
+    fake_reactor.runPending()
+
+    output = actor_link.transport.value
+    assert b" i startupTime=" in output
+    assert b' i startupPhase="cmdSets",' in output
+    assert b' i cmdSetTime="CoreCmd",' in output
+
+
+@pytest.fixture()
+def attach_gate(monkeypatch):
+    """Hold attachAllCmdSets until the returned Event is set."""
+
+    gate = threading.Event()
+    attachAllCmdSets = actorcore.Actor.Actor.attachAllCmdSets
+
+    def gatedAttach(self, *args, **kwargs):
+        gate.wait(10)
+        return attachAllCmdSets(self, *args, **kwargs)
+
+    monkeypatch.setattr(actorcore.Actor.Actor, "attachAllCmdSets", gatedAttach)
+    yield gate
+    gate.set()
+
+
+@pytest.mark.parametrize("actor_config", ["overlappedStartup: true"])
+def test_overlapped_startup(attach_gate, actor, actor_link, fake_reactor):
+    assert not actor.cmdSetsAttached.is_set()
+    assert [name for name, dt in actor.startupTimer.phases][-1] == "cmdr"
+
+    # Queued, not run, while the command sets are still being attached.
+    actor_link.lineReceived(b"1 version")
+    fake_reactor.runPending()
+    assert actor.commandQueue.qsize() == 1
+    assert b" : " not in actor_link.transport.value
+
+    attach_gate.set()
+    for thread in threading.enumerate():
+        if thread.name == "attachCmdSets":
+            thread.join(5)
+    assert actor.cmdSetsAttached.is_set()
+    assert "cmdSets" in [name for name, dt in actor.startupTimer.phases]
+
+    fake_reactor.runPending()
+    fake_reactor.runPending()
+    assert actor.dispatchReady
+    assert actor.commandQueue.empty()
+    assert b" : version=" in actor_link.transport.value
+
+
+@pytest.fixture()
+def broken_attach(monkeypatch):
+    """Make attachAllCmdSets fail once the returned Event is set."""
+
+    gate = threading.Event()
+
+    def brokenAttach(self, *args, **kwargs):
+        gate.wait(10)
+        raise ImportError("no module named fooCmd")
+
+    monkeypatch.setattr(actorcore.Actor.Actor, "attachAllCmdSets", brokenAttach)
+    yield gate
+    gate.set()
+
+
+@pytest.mark.parametrize("actor_config", ["overlappedStartup: true"])
+def test_overlapped_startup_fails(broken_attach, actor, actor_link, fake_reactor):
+    actor_link.lineReceived(b"1 version")
+    fake_reactor.runPending()
+    assert actor.commandQueue.qsize() == 1
+
+    broken_attach.set()
+    for thread in threading.enumerate():
+        if thread.name == "attachCmdSets":
+            thread.join(5)
+    assert not actor.cmdSetsAttached.is_set()
+    assert actor.startupTimer.readyAt is None
+
+    # The queued command, and any later one, fail with the attach error.
+    fake_reactor.runPending()
+    actor_link.lineReceived(b"2 version")
+    fake_reactor.runPending()
+    assert actor.commandQueue.empty()
+    assert not actor.dispatchReady
+    output = actor_link.transport.value
+    assert (
+        b' 1 f text="command sets failed to attach: no module named fooCmd"' in output
+    )
+    assert (
+        b' 2 f text="command sets failed to attach: no module named fooCmd"' in output
+    )
+
+
+def test_reload_configuration(actor, actor_link, fake_reactor, monkeypatch):
+    reconfigured = []
+    monkeypatch.setattr(actor, "configureLogs", reconfigured.append)
+
+    changed = []
+    actor.configManager.subscribe(
+        "testActor.limit", lambda changes, cmd: changed.append(changes)
+    )
+
+    with open(actor.configFile, "a") as fp:
+        fp.write("    limit: 3.5\n")
+    actor_link.lineReceived(b"1 reloadConfiguration")
+    fake_reactor.runPending()
+
+    assert actor.config["testActor"]["limit"] == 3.5
+    assert changed == [[("testActor", "limit")]]
+    assert reconfigured == []
+    assert b' i configChanged="testActor.limit"' in actor_link.transport.value
+    assert b' : text="reloaded configuration file"' in actor_link.transport.value
+
+    with open(actor.configFile, "a") as fp:
+        fp.write("logging:\n    baseLevel: 10\n")
+    actor_link.lineReceived(b"2 reloadConfiguration")
+    assert len(reconfigured) == 1
+
+
+@pytest.mark.parametrize("withCoreCmd", [True, False])
+def test_reload_configuration_hook(actor, actor_link, withCoreCmd):
+    calls = []
+    if withCoreCmd:
+        actor.reloadConfiguration = lambda coreCmd, cmd: calls.append((coreCmd, cmd))
+    else:
+        actor.reloadConfiguration = lambda cmd: calls.append((None, cmd))
+
+    actor_link.lineReceived(b"1 reloadConfiguration")
+
+    assert len(calls) == 1
+    coreCmd, cmd = calls[0]
+    assert (coreCmd is actor.commandSets["CoreCmd"]) == withCoreCmd
+    assert cmd.rawCmd == "reloadConfiguration"
+    assert b"reloadConfiguration failed" not in actor_link.transport.value
+
+
+def test_queue_status(actor, actor_link, fake_reactor):
+    actor.commandQueue.put("x")
+    actor.commandQueue.get()
+
+    actor_link.lineReceived(b"1 queueStatus")
+    fake_reactor.runPending()
+
+    assert b' i queueStatus="commands",0,1,1,1,' in actor_link.transport.value
+    assert b" : " in actor_link.transport.value
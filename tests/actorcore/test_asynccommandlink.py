@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_asynccommandlink.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import queue
+import socket
+import threading
+import time
+
+import pytest
+
+from actorcore import AsyncCommandLink
+from actorcore.Command import Command
+
+
+class FinishingActor(object):
+    def __init__(self):
+        self.cmds = []
+
+    def newCmd(self, cmd):
+        self.cmds.append(cmd)
+        cmd.finish("x=%d" % (cmd.mid))
+
+
+class ThreadReactor(object):
+    """Runs the calls made from other threads in a thread of its own."""
+
+    def __init__(self):
+        self.calls = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="reactor", daemon=True)
+        self.thread.start()
+
+    def callFromThread(self, func, *args):
+        self.calls.put((func, args))
+
+    def run(self):
+        while True:
+            func, args = self.calls.get()
+            func(*args)
+
+
+@pytest.fixture(autouse=True)
+def thread_reactor(monkeypatch):
+    reactor = ThreadReactor()
+    monkeypatch.setattr(AsyncCommandLink, "reactor", reactor)
+    yield reactor
+
+
+@pytest.fixture()
+def async_manager(tmp_path):
+    actor = FinishingActor()
+    mgr = AsyncCommandLink.listen(
+        actor, port=0, interface="localhost", socketPath=str(tmp_path / "a.sock")
+    )
+    actor.bcast = Command(mgr, "self.0", 0, 0, None, immortal=True)
+
+    yield mgr
+
+    mgr.stop()
+
+
+def readLines(sock, n):
+    buf = b""
+    while buf.count(b"\n") < n:
+        data = sock.recv(4096)
+        assert data
+        buf += data
+    return buf.splitlines()
+
+
+def test_commands(async_manager):
+    port = async_manager.server.sockets[0].getsockname()[1]
+    with socket.create_connection(("localhost", port), timeout=5) as sock:
+        assert readLines(sock, 1) == [b"1 0 : yourUserNum=1"]
+
+        sock.sendall(b"5 ping\n6 pi")
+        sock.sendall(b"ng\n")
+        assert readLines(sock, 2) == [b"1 5 : x=5", b"1 6 : x=6"]
+
+
+def test_unix_socket(async_manager, tmp_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(str(tmp_path / "a.sock"))
+        assert readLines(sock, 1) == [b"1 0 : yourUserNum=1"]
+
+        sock.sendall(b"ping\n")
+        assert readLines(sock, 1) == [b"1 1 : x=1"]
+
+
+def test_commands_in_reactor_thread(actor, fake_reactor, monkeypatch):
+    monkeypatch.setattr(AsyncCommandLink, "reactor", fake_reactor)
+    assert actor.runInReactorThread
+
+    threads = []
+    runActorCmd = actor.runActorCmd
+
+    def recordThread(cmd):
+        threads.append(threading.current_thread())
+        runActorCmd(cmd)
+
+    monkeypatch.setattr(actor, "runActorCmd", recordThread)
+
+    mgr = AsyncCommandLink.listen(actor, port=0, interface="localhost")
+    try:
+        port = mgr.server.sockets[0].getsockname()[1]
+        with socket.create_connection(("localhost", port), timeout=5) as sock:
+            sock.sendall(b"7 version\n")
+
+            deadline = time.monotonic() + 5
+            while not fake_reactor.calls and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert threads == []
+
+            # The reactor runs the command.
+            fake_reactor.runPending()
+            assert threads == [threading.current_thread()]
+
+            buf = b""
+            while b" 7 : " not in buf:
+                data = sock.recv(4096)
+                assert data
+                buf += data
+    finally:
+        mgr.stop()
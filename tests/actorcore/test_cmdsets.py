@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_cmdsets.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import textwrap
+
+import pytest
+
+from actorcore.utility.cmdsets import scanVocabVerbs
+
+
+STATIC = """
+    self.vocab = (
+        ("expose", "<exptime>", self.expose),
+        ("dark", "", self.dark),
+    )
+    for verb in self.vocab:
+        pass
+"""
+
+
+def writeCmdSet(tmp_path, init):
+    source = tmp_path / "ExposeCmd.py"
+    body = textwrap.indent(textwrap.dedent(init), " " * 8)
+    source.write_text("class ExposeCmd:\n    def __init__(self):\n%s" % body)
+    return str(source)
+
+
+def test_static_vocab(tmp_path):
+    moduleFile = writeCmdSet(tmp_path, STATIC)
+    assert scanVocabVerbs(moduleFile, "ExposeCmd") == ["expose", "dark"]
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        'self.vocab.append(("flat", "", self.flat))',
+        'if self.hasFlats:\n    self.vocab.extend([("flat", "", self.flat)])',
+        'self.vocab += (("flat", "", self.flat),)',
+        'self.vocab[0] = ("flat", "", self.flat)',
+        "del self.vocab[0]",
+        "addFlats(self.vocab)",
+        "self.vocab: tuple = ()",
+    ],
+)
+def test_modified_vocab(tmp_path, change):
+    moduleFile = writeCmdSet(tmp_path, STATIC + change + "\n")
+    assert scanVocabVerbs(moduleFile, "ExposeCmd") is None
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_commandcache.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+from opscore.protocols import messages
+
+from actorcore.CommandCache import CommandCache
+
+
+def command(verb):
+    return messages.Command(verb, keywords=[messages.Keyword("n", ["1"])])
+
+
+def test_hit_returns_copy():
+    cache = CommandCache(4)
+    assert cache.get("ping") is None
+
+    validated = command("ping")
+    cache.put("ping", validated, [print])
+    got, funcs = cache.get("ping")
+
+    assert got is not validated
+    assert got.canonical() == validated.canonical()
+    assert got.extra_keywords == []
+    assert funcs == [print]
+    assert cache.stats() == dict(size=1, maxSize=4, hits=1, misses=1)
+
+
+def test_lru_eviction():
+    cache = CommandCache(2)
+    cache.put("a", command("a"), [])
+    cache.put("b", command("b"), [])
+    cache.get("a")
+    cache.put("c", command("c"), [])
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_clear_discards_stale_put():
+    cache = CommandCache(2)
+    generation = cache.generation
+    cache.clear()
+    cache.put("a", command("a"), [], generation)
+
+    assert cache.get("a") is None
+
+
+def test_disabled():
+    cache = CommandCache(0)
+    cache.put("a", command("a"), [])
+
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 0
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_commandlink.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import logging
+import os
+import threading
+import types
+
+import pytest
+
+import actorcore.CommandLinkManager
+
+from .conftest import FakeBrains
+
+
+class TestOutput(object):
+    def test_single_flush_per_burst(self, link, cmd, fake_reactor):
+        for ii in range(10):
+            link.sendResponse(cmd, "i", "n=%d" % ii)
+
+        assert len(fake_reactor.calls) == 1
+
+        fake_reactor.runPending()
+        assert len(link.transport.writes) == 1
+        assert link.transport.value.splitlines()[0] == b"1 3 i n=0"
+        assert len(link.transport.value.splitlines()) == 10
+
+    def test_reschedules_after_flush(self, link, cmd, fake_reactor):
+        link.sendResponse(cmd, "i", "a=1")
+        fake_reactor.runPending()
+        link.sendResponse(cmd, ":", "b=2")
+
+        assert len(fake_reactor.calls) == 1
+        fake_reactor.runPending()
+        assert link.transport.value == b"1 3 i a=1\n1 3 : b=2\n"
+
+    def test_empty_flush(self, link, fake_reactor):
+        link.sendQueuedResponses()
+        assert link.transport.writes == []
+
+
+class TestFraming(object):
+    def test_pipelined(self, link):
+        link.dataReceived(b"ping\ntron.me 7 status\n3 help\n")
+
+        cmds = link.brains.cmds
+        assert [c.rawCmd for c in cmds] == ["ping", "status", "help"]
+        assert cmds[1].cmdr == "tron.me"
+        assert cmds[1].mid == 7
+        assert cmds[2].mid == 3
+
+    def test_split(self, link):
+        link.dataReceived(b"sta")
+        assert link.brains.cmds == []
+
+        link.dataReceived(b"tus\r\npi")
+        assert [c.rawCmd for c in link.brains.cmds] == ["status"]
+
+        link.dataReceived(b"ng\n")
+        assert [c.rawCmd for c in link.brains.cmds] == ["status", "ping"]
+        assert len(link.recvBuffer) == 0
+
+    def test_blank_lines(self, link):
+        link.dataReceived(b"\n\r\n  \nping\n")
+
+        assert [c.rawCmd for c in link.brains.cmds] == ["ping"]
+        assert link.brains.warnings == []
+
+    def test_line_too_long(self, link):
+        link.MAX_LENGTH = 10
+
+        link.dataReceived(b"a" * 20 + b"\nping\n")
+        assert [c.rawCmd for c in link.brains.cmds] == ["ping"]
+        assert len(link.brains.warnings) == 1
+
+    def test_partial_line_too_long(self, link):
+        link.MAX_LENGTH = 10
+
+        link.dataReceived(b"a" * 20)
+        link.dataReceived(b"a" * 5)
+        assert len(link.recvBuffer) == 5
+        link.dataReceived(b"bcd\nping\n")
+
+        assert [c.rawCmd for c in link.brains.cmds] == ["ping"]
+        assert len(link.brains.warnings) == 1
+
+
+class TestBackpressure(object):
+    def test_paused(self, link, cmd, fake_reactor):
+        link.pauseProducing()
+        link.sendResponse(cmd, "i", "a=1")
+        link.sendResponse(cmd, "i", "a=2")
+        fake_reactor.runPending()
+
+        assert link.transport.writes == []
+        assert link.queueStats()["lines"] == 2
+        assert link.queueStats()["paused"] is True
+
+        link.resumeProducing()
+        assert link.transport.value == b"1 3 i a=1\n1 3 i a=2\n"
+        assert link.queueStats()["lines"] == 0
+
+    def test_drop_oldest_broadcast(self, link, cmd, fake_reactor):
+        bcast = types.SimpleNamespace(cid=0, mid=0)
+        link.MAX_QUEUE_LINES = 3
+        link.pauseProducing()
+
+        link.sendResponse(bcast, "i", "b=1")
+        link.sendResponse(cmd, "i", "a=1")
+        link.sendResponse(bcast, "i", "b=2")
+        link.sendResponse(bcast, "i", "b=3")
+        link.sendResponse(cmd, ":", "a=2")
+
+        stats = link.queueStats()
+        assert stats["lines"] == 3
+        assert stats["droppedLines"] == 2
+        assert stats["highWater"] == 3
+
+        link.resumeProducing()
+        assert link.transport.value == b"1 3 i a=1\n0 0 i b=3\n1 3 : a=2\n"
+
+    def test_drop_replies_overflow(self, link, cmd, fake_reactor, caplog):
+        bcast = types.SimpleNamespace(cid=0, mid=0)
+        link.MAX_QUEUE_LINES = 3
+        link.pauseProducing()
+
+        with caplog.at_level(logging.WARNING, logger="actor"):
+            link.sendResponse(bcast, "i", "b=1")
+            for ii in range(3):
+                link.sendResponse(cmd, "i", "a=%d" % ii)
+            assert not link.outputClosed
+            link.sendResponse(cmd, "i", "a=3")
+        fake_reactor.runPending()
+
+        assert link.transport.disconnecting
+        assert link.queueStats()["lines"] == 0
+        assert link.queueStats()["droppedLines"] == 5
+        assert (
+            len([r for r in caplog.records if "dropping broadcasts" in r.message]) == 1
+        )
+
+    def test_disconnect(self, link, cmd, fake_reactor):
+        link.setQueuePolicy("disconnect")
+        link.MAX_QUEUE_BYTES = 20
+        link.pauseProducing()
+
+        link.sendResponse(cmd, "i", "a=1")
+        link.sendResponse(cmd, "i", "a=2")
+        link.sendResponse(cmd, "i", "a=3")
+        fake_reactor.runPending()
+
+        assert link.transport.disconnecting
+        assert link.queueStats()["lines"] == 0
+        assert link.queueStats()["droppedLines"] == 3
+
+    def test_block(self, link, cmd, fake_reactor):
+        link.setQueuePolicy("block")
+        link.MAX_QUEUE_LINES = 1
+        link.pauseProducing()
+
+        link.sendResponse(cmd, "i", "a=1")
+        blocked = threading.Thread(target=link.sendResponse, args=(cmd, "i", "a=2"))
+        blocked.start()
+        blocked.join(0.1)
+        assert blocked.is_alive()
+
+        link.resumeProducing()
+        blocked.join(1)
+        assert not blocked.is_alive()
+
+        fake_reactor.runPending()
+        assert link.transport.value == b"1 3 i a=1\n1 3 i a=2\n"
+
+    def test_block_timeout(self, link, cmd, fake_reactor):
+        link.setQueuePolicy("block")
+        link.MAX_QUEUE_LINES = 1
+        link.BLOCK_TIMEOUT = 0.05
+        link.pauseProducing()
+
+        link.sendResponse(cmd, "i", "a=1")
+        link.sendResponse(cmd, "i", "a=2")
+        fake_reactor.runPending()
+
+        assert link.transport.disconnecting
+        assert link.queueStats()["droppedLines"] == 2
+
+    def test_bad_policy(self, link):
+        with pytest.raises(ValueError):
+            link.setQueuePolicy("ignore")
+
+    @pytest.mark.parametrize(
+        "options", [dict(queuePolicy="ignore"), dict(maxQueueLines="many")]
+    )
+    def test_bad_options_fail_at_startup(self, options):
+        with pytest.raises(ValueError):
+            actorcore.CommandLinkManager.CommandLinkManager(FakeBrains(), **options)
+
+
+class TestManager(object):
+    def test_encode_once(self, manager, fake_reactor, caplog):
+        bcast = types.SimpleNamespace(cid=0, mid=0)
+        with caplog.at_level(logging.INFO, logger="cmds"):
+            manager.sendResponse(bcast, "i", "a=1")
+
+        assert len([r for r in caplog.records if r.name == "cmds"]) == 1
+
+        lines = [link.broadcastQueue[0][1] for link in manager.activeConnections]
+        assert lines[0] == b"0 0 i a=1\n"
+        assert all(line is lines[0] for line in lines)
+
+        fake_reactor.runPending()
+        for link in manager.activeConnections:
+            assert link.transport.value == b"0 0 i a=1\n"
+
+    def test_routing(self, manager, fake_reactor):
+        link1, link2, link3 = manager.activeConnections
+        link3.subscribeAll = True
+
+        manager.sendResponse(types.SimpleNamespace(cid=link1.connID, mid=1), ":", "")
+        manager.sendResponse(types.SimpleNamespace(cid=0, mid=0), "i", "b=1")
+        manager.sendResponse(types.SimpleNamespace(cid=99, mid=1), "i", "c=1")
+        fake_reactor.runPending()
+
+        assert link1.transport.value == b"1 1 : \n0 0 i b=1\n99 1 i c=1\n"
+        assert link2.transport.value == b"0 0 i b=1\n99 1 i c=1\n"
+        assert link3.transport.value == link1.transport.value
+
+    def test_no_routing(self, manager, fake_reactor):
+        manager.routeReplies = False
+
+        manager.sendResponse(types.SimpleNamespace(cid=1, mid=1), ":", "")
+        fake_reactor.runPending()
+
+        for link in manager.activeConnections:
+            assert link.transport.value == b"1 1 : \n"
+
+    def test_keyword_filter(self, manager, fake_reactor):
+        link1, link2, link3 = manager.activeConnections
+        link1.setKeywordFilter(["guideState", "axePos*"])
+
+        manager.sendResponse(types.SimpleNamespace(cid=0, mid=0), "i", 'text="x"')
+        manager.sendResponse(types.SimpleNamespace(cid=0, mid=0), "i", "AXEPOSA=1")
+        manager.sendResponse(
+            types.SimpleNamespace(cid=0, mid=0), "i", 'text="guideState"; b=1'
+        )
+        manager.sendResponse(types.SimpleNamespace(cid=link1.connID, mid=1), ":", "")
+        fake_reactor.runPending()
+
+        assert link1.transport.value == b"0 0 i AXEPOSA=1\n1 1 : \n"
+        assert len(link2.transport.value.splitlines()) == 3
+
+        link1.setKeywordFilter([])
+        assert link1.keywordFilter is None
+
+
+def test_listen_unix(tmp_path):
+    socketPath = str(tmp_path / "actor.sock")
+    mgr = actorcore.CommandLinkManager.listen(
+        FakeBrains(), port=0, interface="localhost", socketPath=socketPath
+    )
+
+    try:
+        assert mgr.unixPort is not None
+        assert os.path.exists(socketPath)
+    finally:
+        mgr.port.stopListening()
+        mgr.unixPort.stopListening()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_commandpool.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from actorcore.CommandPool import CommandPool
+
+
+@pytest.fixture()
+def pool():
+    pool = CommandPool(3)
+    yield pool
+    pool.stop()
+
+
+def test_serial_in_order(pool):
+    done = []
+    finished = threading.Event()
+
+    def job(n):
+        time.sleep(0.01)
+        done.append(n)
+        if n == 4:
+            finished.set()
+
+    for n in range(5):
+        pool.submit("serial", job, n)
+
+    assert finished.wait(2)
+    assert done == [0, 1, 2, 3, 4]
+
+    (stats,) = pool.stats()
+    assert stats["name"] == "serial"
+    assert stats["count"] == 5
+    assert stats["running"] == 0
+    assert stats["maxWait"] > 0
+
+
+def test_parallel_not_blocked(pool):
+    release = threading.Event()
+    ran = threading.Event()
+
+    pool.submit("serial", release.wait, 2)
+    pool.submit("serial", ran.set)
+    pool.submit("parallel", ran.set)
+
+    # Only the parallel command can have run while the first serial one blocks.
+    assert ran.wait(1)
+    stats = {s["name"]: s for s in pool.stats()}
+    assert stats["serial"]["running"] == 1
+    assert stats["serial"]["pending"] == 1
+    assert stats["parallel"]["count"] == 1
+
+    release.set()
+
+
+def test_named_groups(pool):
+    release = threading.Event()
+    ran = threading.Event()
+
+    pool.submit("ccd", release.wait, 2)
+    pool.submit("ccd", ran.set)
+    pool.submit("shutter", ran.set)
+
+    assert ran.wait(1)
+    stats = {s["name"]: s for s in pool.stats()}
+    assert stats["ccd"]["pending"] == 1
+    assert stats["shutter"]["count"] == 1
+
+    release.set()
+
+
+def test_future_holds_group(pool):
+    future = concurrent.futures.Future()
+    done = []
+    finished = threading.Event()
+
+    def second():
+        done.append("second")
+        finished.set()
+
+    pool.submit("serial", lambda: future)
+    pool.submit("serial", second)
+    pool.submit("parallel", done.append, "parallel")
+
+    assert not finished.wait(0.1)
+    assert done == ["parallel"]
+
+    future.set_result(None)
+    assert finished.wait(2)
+    assert done == ["parallel", "second"]
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_commandwatcher.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import os
+import threading
+import time
+
+from actorcore.CommandWatcher import CommandWatcher
+
+
+CMDSET = """
+class fooCmd(object):
+    def __init__(self, actor):
+        self.keys = None
+        self.vocab = (("%s", "", self.run),)
+
+    def run(self, cmd):
+        cmd.finish("text=%s")
+"""
+
+
+def writeCmdSet(tmp_path, verb, text=None, mtime=None):
+    cmdFile = tmp_path / "Commands" / "fooCmd.py"
+    cmdFile.write_text(text if text is not None else CMDSET % (verb, verb))
+    # Make sure the change is seen, whatever the filesystem's mtime resolution.
+    mtime = mtime or time.time() + 10
+    os.utime(cmdFile, (mtime, mtime))
+
+
+def test_reattach_changed(actor, actor_link, fake_reactor, tmp_path):
+    writeCmdSet(tmp_path, "foo", mtime=time.time() - 10)
+    actor.attachCmdSet("fooCmd")
+
+    watcher = CommandWatcher(actor, [str(tmp_path / "Commands")], useInotify=False)
+    assert watcher.check() == []
+
+    coreCmd = actor.commandSets["CoreCmd"]
+    writeCmdSet(tmp_path, "bar")
+    assert watcher.check() == ["fooCmd"]
+    assert actor.commandSets["CoreCmd"] is coreCmd
+    assert "fooCmd" in watcher.reloads
+    assert "bar" in actor.handler.consumers
+    assert "foo" not in actor.handler.consumers
+
+    # A broken file leaves the command set as it was.
+    writeCmdSet(tmp_path, "baz", text="class fooCmd(:\n")
+    assert watcher.check() == []
+    assert "bar" in actor.handler.consumers
+
+    actor_link.lineReceived(b"1 bar")
+    fake_reactor.runPending()
+    assert b" : text=bar" in actor_link.transport.value
+
+
+def test_watch_thread(actor, tmp_path):
+    writeCmdSet(tmp_path, "foo", mtime=time.time() - 10)
+    actor.attachCmdSet("fooCmd")
+
+    watcher = CommandWatcher(actor, [str(tmp_path / "Commands")], interval=0.05)
+    watcher.start()
+    try:
+        writeCmdSet(tmp_path, "bar")
+        for _ in range(100):
+            if "fooCmd" in watcher.reloads:
+                break
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+
+    assert "bar" in actor.handler.consumers
+
+
+def test_stop_while_busy(actor, tmp_path):
+    watcher = CommandWatcher(actor, [str(tmp_path / "Commands")], interval=0.01)
+    busy = threading.Event()
+    release = threading.Event()
+
+    def check():
+        busy.set()
+        release.wait(5)
+        return []
+
+    watcher.check = check
+    watcher.start()
+    assert busy.wait(5)
+
+    watcher.interval = 0
+    watcher.stop()
+    assert watcher.thread.is_alive()
+    # The busy thread still owns the inotify fd, if any.
+    assert watcher.fd is None or os.fstat(watcher.fd)
+
+    release.set()
+    watcher.thread.join(5)
+    assert not watcher.thread.is_alive()
+    assert watcher.fd is None
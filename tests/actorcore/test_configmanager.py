@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_configmanager.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import types
+
+import pytest
+
+from actorcore.ConfigManager import ConfigManager, diffConfig
+
+
+def test_diff():
+    old = dict(tron=dict(port=1, hosts=["a"]), logging=dict(baseLevel=20), x=1)
+    new = dict(tron=dict(port=2, hosts=["a"]), logging=dict(baseLevel=20), y=dict())
+
+    assert diffConfig(old, old) == []
+    assert diffConfig(old, new) == [("tron", "port"), ("x",), ("y",)]
+
+
+class FakeConfigActor(object):
+    def __init__(self, config):
+        self.config = config
+        self.nextConfig = config
+
+    def read_config_files(self):
+        if isinstance(self.nextConfig, Exception):
+            self.config = None
+            raise self.nextConfig
+        self.config = self.nextConfig
+
+
+def test_subscriptions():
+    actor = FakeConfigActor(dict(logging=dict(baseLevel=20), me=dict(limit=1.0)))
+    manager = ConfigManager(actor)
+
+    calls = []
+    manager.subscribe("logging", lambda changes, cmd: calls.append(("log", changes)))
+    manager.subscribe("me.limit", lambda changes, cmd: calls.append(("limit", changes)))
+    manager.subscribe("me.other", lambda changes, cmd: calls.append(("other", changes)))
+
+    assert manager.reload() == []
+    assert calls == []
+
+    actor.nextConfig = dict(logging=dict(baseLevel=20), me=dict(limit=2.0))
+    assert manager.reload() == [("me", "limit")]
+    assert calls == [("limit", [("me", "limit")])]
+
+    # Removing a whole section concerns everyone below it.
+    calls.clear()
+    actor.nextConfig = dict(logging=dict(baseLevel=20))
+    manager.reload()
+    assert calls == [("limit", [("me",)]), ("other", [("me",)])]
+
+
+def test_failures():
+    actor = FakeConfigActor(dict(me=dict(limit=1.0)))
+    manager = ConfigManager(actor)
+
+    def broken(changes, cmd):
+        raise ValueError("nope")
+
+    calls = []
+    manager.subscribe("me", broken)
+    manager.subscribe("me", lambda changes, cmd: calls.append(changes))
+
+    cmd = types.SimpleNamespace(warnings=[])
+    cmd.warn = cmd.warnings.append
+    actor.nextConfig = dict(me=dict(limit=2.0))
+    manager.reload(cmd)
+    assert calls == [[("me", "limit")]]
+    assert "nope" in cmd.warnings[0]
+
+    # An unreadable file leaves the old configuration.
+    actor.nextConfig = IOError("no file")
+    with pytest.raises(IOError):
+        manager.reload()
+    assert actor.config == dict(me=dict(limit=2.0))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_grammarcache.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import os
+
+import pytest
+
+import opscore.protocols.keys as keys
+import opscore.protocols.types as types
+import opscore.protocols.validation as validation
+
+import actorcore.GrammarCache
+from actorcore.GrammarCache import GrammarCache
+
+
+@pytest.fixture()
+def source(tmp_path):
+    keys.CmdKey.addKeys(
+        keys.KeysDictionary(
+            "test_grammarcache",
+            (1, 1),
+            keys.Key("exptime", types.Float()),
+            keys.Key("dark"),
+            keys.Key("flat"),
+        )
+    )
+    source = tmp_path / "exposeCmd.py"
+    source.write_text("# vocabulary source\n")
+    yield str(source)
+
+
+def done(cmd):
+    pass
+
+
+def compile():
+    fmt = "@(dark|flat) <exptime>"
+    cmd = validation.Cmd("expose", fmt)
+    cmd >> done
+    return {("expose", fmt): cmd}
+
+
+def test_roundtrip(tmp_path, source):
+    cache = GrammarCache(str(tmp_path / "cache"))
+    assert cache.load(source) == {}
+
+    cache.save(source, compile())
+    cmds = cache.load(source)
+    cmd = cmds[("expose", "@(dark|flat) <exptime>")]
+
+    assert not hasattr(cmd, "callbacks")
+    cmd >> done
+    handler = validation.CommandHandler(cmd)
+    validated, funcs = handler.match("expose dark exptime=3")
+    assert validated.keywords["exptime"].values[0] == 3.0
+    assert funcs == [done]
+
+
+def test_stale(tmp_path, source, monkeypatch):
+    cache = GrammarCache(str(tmp_path / "cache"))
+    cache.save(source, compile())
+
+    st = os.stat(source)
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert cache.load(source) == {}
+
+    cache.save(source, compile())
+    monkeypatch.setattr(actorcore.GrammarCache, "opscoreVersion", lambda: "other")
+    assert GrammarCache(str(tmp_path / "cache")).load(source) == {}
+
+
+def test_corrupt(tmp_path, source):
+    cache = GrammarCache(str(tmp_path / "cache"))
+    cache.save(source, compile())
+    with open(cache.cacheFile(source), "wb") as fp:
+        fp.write(b"not a pickle")
+
+    assert cache.load(source) == {}
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_icc.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from actorcore.ICC import ICC
+
+
+CONTROLLER = """
+import time
+
+
+class {name}(object):
+    stopped = False
+
+    def __init__(self, actor, name):
+        self.actor = actor
+        self.name = name
+
+    def start(self):
+        # The controllers which do finish only get past this if started together.
+        if {delay} < 1:
+            self.actor.startBarrier.wait(5)
+        time.sleep({delay})
+        if {fail}:
+            raise IOError("no device")
+
+    def stop(self):
+        {name}.stopped = True
+"""
+
+
+@pytest.fixture()
+def icc(tmp_path):
+    for name, delay, fail in (
+        ("fastDev", 0.1, False),
+        ("slowDev", 0.1, False),
+        ("brokenDev", 0.1, True),
+        ("deadDev", 1.0, False),
+    ):
+        (tmp_path / (name + ".py")).write_text(
+            CONTROLLER.format(name=name, delay=delay, fail=fail)
+        )
+
+    icc = ICC.__new__(ICC)
+    icc.name = "testICC"
+    icc.logger = logging.getLogger("actor")
+    icc.config = {
+        "testICC": {
+            "controllers": ["fastDev", "nosuchDev", "brokenDev", "deadDev", "slowDev"],
+            "controllerTimeout": 0.25,
+        }
+    }
+    icc.allControllers = ["fastDev", "slowDev", "brokenDev", "deadDev"]
+    icc.controllers = {}
+    icc.warnings = []
+    icc.bcast = types.SimpleNamespace(warn=icc.warnings.append)
+    icc.startBarrier = threading.Barrier(3)
+
+    yield icc
+
+
+def test_attach_all_controllers(icc, tmp_path, caplog):
+    with caplog.at_level(logging.INFO, logger="actor"):
+        icc.attachAllControllers(path=[str(tmp_path)])
+
+    assert not icc.startBarrier.broken
+    assert sorted(icc.controllers) == ["fastDev", "slowDev"]
+    assert icc.warnings == [
+        'text="cannot attach unknown controller nosuchDev"',
+        'text="Could not connect to controller brokenDev."',
+        'text="Could not connect to controller deadDev."',
+    ]
+    assert set(icc.controllerStartTimes) == {
+        "fastDev",
+        "slowDev",
+        "brokenDev",
+        "deadDev",
+    }
+
+    assert icc.controllerStartTimes["deadDev"] < 1.0
+    assert "controller brokenDev: failed" in caplog.text
+    assert "controller fastDev: started" in caplog.text
+
+    # The dead controller is stopped when it does start, after its deadline.
+    deadline = time.monotonic() + 5
+    while not sys.modules["deadDev"].deadDev.stopped and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert type(icc.controllers["fastDev"]).stopped is False
+    assert sys.modules["deadDev"].deadDev.stopped is True
+
+
+def test_controller_import_fails(icc, tmp_path, caplog):
+    (tmp_path / "badDev.py").write_text("import nosuchmodule\n")
+    icc.allControllers = ["badDev"]
+    icc.config["testICC"]["controllers"] = ["badDev"]
+
+    with caplog.at_level(logging.INFO, logger="actor"):
+        with pytest.raises(RuntimeError):
+            icc.attachAllControllers(path=[str(tmp_path)])
+
+    assert "controller badDev: failed" in caplog.text
+    assert icc.controllers == {}
+
+
+EXIT_SCRIPT = """
+import logging
+import os
+import subprocess
+import sys
+
+from actorcore.ICC import ICC
+
+icc = ICC.__new__(ICC)
+icc.name = "testICC"
+icc.logger = logging.getLogger("actor")
+icc.controllers = {}
+icc.startBarrier = None
+results = icc.startControllers(["hungDev"], [sys.argv[1]], 2, timeout=0.2)
+assert results["hungDev"][0] is None
+"""
+
+
+def test_abandoned_start_does_not_block_exit(tmp_path):
+    (tmp_path / "hungDev.py").write_text(
+        CONTROLLER.format(name="hungDev", delay=6.0, fail=False)
+    )
+    script = tmp_path / "exit.py"
+    script.write_text(EXIT_SCRIPT)
+
+    t0 = time.monotonic()
+    subprocess.run(
+        [sys.executable, str(script), str(tmp_path)],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        check=True,
+        timeout=30,
+    )
+    assert time.monotonic() - t0 < 5.0
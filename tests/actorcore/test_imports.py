@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_imports.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import subprocess
+import sys
+
+
+def test_deferred_imports():
+    code = """
+import sys
+import actorcore.Actor, actorcore.ICC, actorcore.utility.fits
+import actorcore.Commands.CoreCmd
+print(" ".join(m for m in ("astropy", "IPython", "actorcore.help") if m in sys.modules))
+"""
+    out = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    assert out.stdout.strip() == ""
+
+
+def test_make_card():
+    import actorcore.utility.fits as fitsUtils
+
+    card = fitsUtils.makeCard(None, "EXPTIME", 10.0, "seconds")
+    assert card.keyword == "EXPTIME"
+    assert fitsUtils.fits.Card is type(card)
+
+
+def test_help(actor, actor_link, fake_reactor):
+    actor_link.lineReceived(b"1 help cmd=coreStatus")
+    fake_reactor.runPending()
+
+    assert b"coreStatus" in actor_link.transport.value
+    assert b" : " in actor_link.transport.value
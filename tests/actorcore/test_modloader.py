@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_modloader.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import sys
+import types
+
+import pytest
+
+from actorcore.Actor import ModLoader
+
+
+@pytest.fixture()
+def package(tmp_path, monkeypatch):
+    """A package mlpkg.Controllers, whose __init__s count their executions."""
+
+    counter = types.ModuleType("mlcounter")
+    counter.inits = []
+    monkeypatch.setitem(sys.modules, "mlcounter", counter)
+    monkeypatch.setattr(ModLoader, "packagePaths", {})
+    monkeypatch.setattr(ModLoader, "moduleSpecs", {})
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    pkgDir = tmp_path / "mlpkg" / "Controllers"
+    pkgDir.mkdir(parents=True)
+    for init in tmp_path / "mlpkg" / "__init__.py", pkgDir / "__init__.py":
+        init.write_text("import mlcounter\nmlcounter.inits.append(__name__)\n")
+    for name in "aCtrl", "bCtrl":
+        (pkgDir / (name + ".py")).write_text("loaded = object()\n")
+
+    yield counter
+
+    for name in "mlpkg", "mlpkg.Controllers", "aCtrl", "bCtrl":
+        sys.modules.pop(name, None)
+
+
+def test_load_once(package):
+    loader = ModLoader()
+
+    first = loader.load_module("mlpkg.Controllers.aCtrl", "aCtrl")
+    again = loader.load_module("mlpkg.Controllers.aCtrl", "aCtrl")
+    other = loader.load_module("mlpkg.Controllers.bCtrl", "bCtrl")
+
+    assert package.inits == ["mlpkg", "mlpkg.Controllers"]
+    assert first is not again and first.loaded is not again.loaded
+    assert sys.modules["aCtrl"] is again
+    assert other.__name__ == "bCtrl"
+
+    loader.load_module("mlpkg.Controllers.aCtrl", "aCtrl", reload=True)
+    assert package.inits == ["mlpkg", "mlpkg.Controllers"] * 2
+
+
+def test_missing(package):
+    with pytest.raises(ImportError):
+        ModLoader().load_module("mlpkg.Controllers.nope", "nope")
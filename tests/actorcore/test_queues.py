@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_queues.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import queue
+import threading
+
+import pytest
+
+from actorcore.Actor import Msg
+from actorcore.utility.queues import BatchQueue, InstrumentedQueue, MsgPriorityQueue
+
+
+def drain(q):
+    out = []
+    while not q.empty():
+        out.append(q.get())
+    return out
+
+
+def test_msg_ordering():
+    normal = Msg(Msg.EXIT, None)
+    critical = Msg(Msg.EXIT, None)
+    critical.priority = Msg.CRITICAL
+
+    assert critical < normal
+    assert sorted([normal, critical]) == [critical, normal]
+
+
+def test_priority_first_then_fifo():
+    q = MsgPriorityQueue("test")
+    msgs = [Msg(Msg.EXIT, None) for _ in range(6)]
+    msgs[2].priority = Msg.HIGH
+    msgs[4].priority = Msg.CRITICAL
+    msgs[5].priority = Msg.HIGH
+    for msg in msgs:
+        q.put(msg)
+
+    assert drain(q) == [msgs[4], msgs[2], msgs[5], msgs[0], msgs[1], msgs[3]]
+
+
+def test_flush():
+    q = MsgPriorityQueue("test")
+    for _ in range(3):
+        q.put(Msg(Msg.EXIT, None))
+    q.flush()
+
+    assert q.empty()
+    q.join()  # all tasks accounted for; must not block
+
+
+def test_instrumented_queue():
+    q = InstrumentedQueue("test")
+    for i in range(5):
+        q.put(i)
+    assert [q.get() for _ in range(3)] == [0, 1, 2]
+
+    stats = q.stats()
+    assert stats["name"] == "test"
+    assert (stats["depth"], stats["highWater"], stats["puts"], stats["gets"]) == (
+        2,
+        5,
+        5,
+        3,
+    )
+    assert 0 <= stats["wait50"] <= stats["wait90"] <= stats["wait99"]
+    assert stats["rate"] >= 0
+
+    q.flush()
+    assert q.empty() and q.stats()["highWater"] == 5
+
+
+def test_batch_queue():
+    q = BatchQueue("test")
+    q.put(0)
+    q.put_many(range(1, 6))
+    assert q.qsize() == 6
+
+    assert q.get() == 0
+    assert q.get_batch(2) == [1, 2]
+    assert q.get_batch() == [3, 4, 5]
+    assert q.empty()
+
+    with pytest.raises(queue.Empty):
+        q.get_batch(timeout=0)
+    with pytest.raises(queue.Empty):
+        q.get_batch(timeout=0.01)
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+
+
+def test_batch_queue_wakes_getter():
+    q = BatchQueue("test")
+    got = []
+    t = threading.Thread(target=lambda: got.extend(q.get_batch(timeout=5)))
+    t.start()
+    q.put_many([1, 2, 3])
+    t.join(5)
+
+    assert got == [1, 2, 3]
+
+
+def test_batch_queue_flush():
+    q = BatchQueue("test")
+    q.put_many([Msg(Msg.EXIT, None) for _ in range(3)])
+    q.get()
+    q.task_done()
+    q.flush()
+
+    assert q.empty()
+    q.join()  # all tasks accounted for; must not block
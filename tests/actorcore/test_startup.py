@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_startup.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import logging
+import socket
+import threading
+
+import pytest
+
+import actorcore.utility.startup as startup
+from actorcore.Actor import SDSSActor
+
+
+@pytest.fixture()
+def slow_dns(monkeypatch):
+    """Make the FQDN lookup wait until released."""
+
+    release = threading.Event()
+
+    def getfqdn():
+        release.wait(5)
+        return "host.apo.nmsu.edu"
+
+    monkeypatch.setattr(socket, "getfqdn", getfqdn)
+    monkeypatch.setattr(socket, "gethostname", lambda: "host")
+    monkeypatch.setattr(startup, "_fqdn", None)
+    monkeypatch.setattr(startup, "_fqdnThread", None)
+    monkeypatch.delenv("OBSERVATORY", raising=False)
+
+    yield release
+
+    release.set()
+
+
+def test_getfqdn_timeout(slow_dns, caplog):
+    with caplog.at_level(logging.WARNING, logger="actor"):
+        assert startup.getfqdn(timeout=0.01) is None
+    assert "looking up the FQDN" in caplog.text
+
+    slow_dns.set()
+    assert startup.getfqdn(timeout=None) == "host.apo.nmsu.edu"
+    assert startup.getfqdn(timeout=0) == "host.apo.nmsu.edu"
+
+
+def test_location_waits_for_fqdn(slow_dns, monkeypatch):
+    monkeypatch.setattr(startup.getfqdn, "__defaults__", (0.01,))
+
+    timer = threading.Timer(0.1, slow_dns.set)
+    timer.start()
+    try:
+        assert SDSSActor.determine_location() == "APO"
+    finally:
+        timer.cancel()
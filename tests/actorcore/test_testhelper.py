@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_testhelper.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import logging
+
+import pytest
+
+from actorcore import TestHelper
+
+
+@pytest.fixture()
+def fake_actor():
+    cmd = TestHelper.Cmd()
+    actor = TestHelper.FakeActor("testActor", productName="actorcore", cmd=cmd)
+    actor.runInReactorThread = True
+
+    yield actor
+
+    logging.disable(logging.NOTSET)
+
+
+def test_new_cmd(fake_actor):
+    cmd = TestHelper.Cmd()
+    cmd.rawCmd = "version"
+    fake_actor.newCmd(cmd)
+
+    assert cmd.finished and not cmd.didFail
+    assert cmd.messages == ['version="trunk"']
+
+
+def test_core_status(fake_actor):
+    cmd = TestHelper.Cmd()
+    cmd.rawCmd = "coreStatus"
+    fake_actor.newCmd(cmd)
+
+    assert cmd.finished and not cmd.didFail, cmd.messages
+    assert any(m.startswith("startupTime=") for m in cmd.messages)
+    assert any(m.startswith("commandCache=") for m in cmd.messages)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# @Filename: test_threadsupervisor.py
+# @License: BSD 3-clause (http://www.opensource.org/licenses/BSD-3-Clause)
+
+import functools
+import queue
+import sys
+import time
+import types
+
+from actorcore.Actor import Msg, SDSSActor
+from actorcore.ThreadSupervisor import ThreadSupervisor, nextThreadName
+
+
+def worker(actor, queues, tid="worker", exitDelay=0.0):
+    """Handle Msgs until EXIT; die on a Msg with cmd="die"."""
+
+    while True:
+        msg = queues[tid].get()
+        if msg.type == Msg.EXIT:
+            time.sleep(exitDelay)
+            return
+        queues[tid].task_done()
+        if msg.cmd == "die":
+            raise RuntimeError("asked to die")
+
+
+def waitFor(predicate, timeout=5):
+    t0 = time.monotonic()
+    while not predicate() and time.monotonic() - t0 < timeout:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_names():
+    assert nextThreadName("master") == "master-1"
+    assert nextThreadName("master-3") == "master-4"
+
+
+def test_stats_and_restart(monkeypatch):
+    monkeypatch.setattr("actorcore.ThreadSupervisor.tback", lambda *args: None)
+    supervisor = ThreadSupervisor(minBackoff=0.01, maxBackoff=0.1, checkInterval=0.01)
+    queues = {"worker": queue.Queue()}
+    supervisor.makeThread(
+        "worker", "worker", worker, (None, queues), queues["worker"]
+    ).start()
+    supervisor.start()
+
+    try:
+        for _ in range(3):
+            queues["worker"].put(Msg(Msg.DONE, cmd=None))
+        queues["worker"].join()
+        assert waitFor(lambda: supervisor.status()[0]["nMsgs"] == 3)
+        status = supervisor.status()[0]
+        assert status["state"] == "running"
+        assert not status["busy"]
+
+        queues["worker"].put(Msg(Msg.DONE, cmd="die"))
+        assert waitFor(lambda: supervisor.status()[0]["restarts"] == 1)
+        assert waitFor(lambda: supervisor.status()[0]["state"] == "running")
+        assert supervisor.status()[0]["name"] == "worker-1"
+
+        # The restarted thread uses the same queue, and is still counted.
+        queues["worker"].put(Msg(Msg.DONE, cmd=None))
+        queues["worker"].join()
+        assert waitFor(lambda: supervisor.status()[0]["nMsgs"] == 5)
+
+        queues["worker"].put(Msg(Msg.EXIT, cmd=None))
+        assert waitFor(lambda: supervisor.status()[0]["state"] == "exited")
+        assert supervisor.restartDeadThreads() == []
+    finally:
+        supervisor.stop()
+
+
+class ThreadActor(SDSSActor):
+    @staticmethod
+    def newActor():
+        pass
+
+
+def test_parallel_restart(monkeypatch):
+    """Old threads slow to exit are waited for together."""
+
+    threadModule = types.ModuleType("supervisedThreads")
+    threadModule.main = lambda actor, queues: None
+    monkeypatch.setitem(sys.modules, "supervisedThreads", threadModule)
+    monkeypatch.setattr("importlib.reload", lambda module: module)
+
+    actor = ThreadActor.__new__(ThreadActor)
+    actor.name = "test"
+    actor.config = {}
+    actor.threadSupervisor = None
+    actor.actorState = types.SimpleNamespace(actor=actor)
+    actor.threadList = []
+    for tid in "slowA", "slowB", "slowC":
+
+        def main(actor, queues, tid=tid):
+            worker(actor, queues, tid, exitDelay=0.5)
+
+        main.__module__ = "supervisedThreads"
+        actor.threadList.append((tid, tid, main))
+
+    actor.startThreads(Msg)
+    t0 = time.monotonic()
+    actor.startThreads(Msg, restart=True)
+    assert time.monotonic() - t0 < 1.0
+
+    names = sorted(t["name"] for t in actor.threadSupervisor.status())
+    assert names == ["slowA-1", "slowB-1", "slowC-1"]
+    for tid in actor.actorState.queues:
+        actor.actorState.queues[tid].put(Msg(Msg.EXIT, cmd=None))
+    actor.threadSupervisor.stop()
+
+
+def test_restart_after_supervisor_restart(monkeypatch):
+    """startThreads(restart=True) names threads after the supervisor's restarts."""
+
+    monkeypatch.setattr("actorcore.ThreadSupervisor.tback", lambda *args: None)
+    monkeypatch.setattr(
+        "actorcore.Actor.ThreadSupervisor",
+        functools.partial(
+            ThreadSupervisor, minBackoff=0.01, maxBackoff=0.1, checkInterval=0.01
+        ),
+    )
+    threadModule = types.ModuleType("supervisedThreads")
+    monkeypatch.setitem(sys.modules, "supervisedThreads", threadModule)
+    monkeypatch.setattr("importlib.reload", lambda module: module)
+
+    def main(actor, queues):
+        worker(actor, queues, "master")
+
+    main.__module__ = "supervisedThreads"
+
+    actor = ThreadActor.__new__(ThreadActor)
+    actor.name = "test"
+    actor.config = {}
+    actor.threadSupervisor = None
+    actor.actorState = types.SimpleNamespace(actor=actor)
+    actor.threadList = [("master", "master", main)]
+
+    actor.startThreads(Msg)
+    try:
+        actor.actorState.queues["master"].put(Msg(Msg.DONE, cmd="die"))
+        assert waitFor(lambda: actor.threadSupervisor.status()[0]["restarts"] == 1)
+        assert waitFor(lambda: actor.actorState.threads["master"].name == "master-1")
+        assert actor.actorState.threads["master"].is_alive()
+
+        actor.startThreads(Msg, restart=True)
+        assert actor.actorState.threads["master"].name == "master-2"
+        assert [t["name"] for t in actor.threadSupervisor.status()] == ["master-2"]
+    finally:
+        actor.actorState.queues["master"].put(Msg(Msg.EXIT, cmd=None))
+        actor.threadSupervisor.stop()